@@ -1,76 +1,187 @@
 import logging
-from typing import List, Dict, Any
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from openai import OpenAI
 from agent.settings import settings
-from core.database import get_supabase_client
+from core.clients import ClientRegistry, get_clients
+from core.concurrency import run_blocking
+from core.metrics import RAG_STAGE_SECONDS, VECTOR_STORE_SECONDS, timed
 from services.chunk import ChunkService
+from services.document import DocumentService
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 class AnalysingProcessor:
-    def __init__(self):
-        self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    def __init__(self, clients: Optional[ClientRegistry] = None):
+        self.clients = clients or get_clients()
+        self.openai_client = self.clients.openai
 
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        self.index_name = settings.PINECONE_INDEX_NAME
         self.embedding_model = settings.EMBEDDING_MODEL
         self.embedding_dimensions = settings.EMBEDDING_DIMENSIONS
-        self.pinecone_index = self.pc.Index(self.index_name)
+        self.vector_store = self.clients.vector_store
 
-        self.chunk_service = ChunkService(get_supabase_client())
+        self.chunk_service = ChunkService(self.clients.supabase)
+        self.document_service = DocumentService(self.clients.supabase)
+        self.embedding_cache = self.clients.embedding_cache
+        self.query_embedder = self.clients.query_embedder
+        self.bm25_index = self.clients.bm25_index
+        self.chunk_store = self.clients.chunk_store
+        self.chunk_content_source = settings.CHUNK_CONTENT_SOURCE
+        self.document_cache = self.clients.document_cache
+        self.rrf_k = settings.HYBRID_RRF_K
+        self.lexical_skip_margin = settings.HYBRID_LEXICAL_SKIP_MARGIN
+        self.lexical_skip_min_coverage = settings.HYBRID_LEXICAL_SKIP_MIN_COVERAGE
 
-    def _get_embedding(self, text: str) -> List[float]:
-        """Get embedding using OpenAI's text-embedding-3-small"""
-        response = self.openai_client.embeddings.create(
-            model=self.embedding_model,
-            input=text,
-            dimensions=self.embedding_dimensions
-        )
-        return response.data[0].embedding
+    async def embed_query(self, text: str) -> List[float]:
+        """Embed a search query, from the embedding cache when it was embedded before"""
+        if self.embedding_cache:
+            cached = await run_blocking(self.embedding_cache.get, self.embedding_model, self.embedding_dimensions, text)
+            if cached is not None:
+                return cached
+
+        embedding = await self.query_embedder.embed(text)
+
+        if self.embedding_cache:
+            await run_blocking(self.embedding_cache.put, self.embedding_model, self.embedding_dimensions, text, embedding)
+        return embedding
+
+    def _fuse(self, dense_matches: List[Dict[str, Any]], lexical_hits: List[Tuple[str, float]],
+              top_k: int) -> List[Tuple[str, float]]:
+        """Reciprocal rank fusion of dense and lexical rankings.
+
+        Returns (vector_id, similarity_score) in fused order. The similarity score
+        stays the cosine score where the chunk was found by the dense search and
+        is the BM25 score relative to the best lexical hit otherwise.
+        """
+        fused = defaultdict(float)
+        similarity = {}
+        for rank, (vector_id, score) in enumerate(lexical_hits):
+            fused[vector_id] += 1 / (self.rrf_k + rank + 1)
+            similarity[vector_id] = score / lexical_hits[0][1]
+        for rank, match in enumerate(dense_matches):
+            fused[match['id']] += 1 / (self.rrf_k + rank + 1)
+            similarity[match['id']] = match['score']
+
+        ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        return [(vector_id, similarity[vector_id]) for vector_id in ranked]
+
+    def _lexical_match_is_decisive(self, query: str, lexical_hits: List[Tuple[str, float]]) -> bool:
+        """Whether the best lexical hit is clearly the answer, so the embedding round trip can be skipped.
+
+        It has to outscore the runner-up by the skip margin and cover enough of the
+        query; a lone hit, e.g. on one rare or misspelled word, never qualifies.
+        """
+        if len(lexical_hits) < 2:
+            return False
+        lexical_margin = lexical_hits[0][1] / lexical_hits[1][1]
+        if lexical_margin < self.lexical_skip_margin:
+            return False
+        coverage = lexical_hits[0][1] / (self.bm25_index.query_weight(query) or 1.0)
+        if coverage < self.lexical_skip_min_coverage:
+            return False
+        logger.info(f"Lexical match {lexical_margin:.1f}x ahead of the next with coverage {coverage:.2f}, "
+                    f"skipping vector search")
+        return True
 
     async def search_similar_chunks(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
-        """Search for similar chunks using vector similarity"""
-        # Get query embedding
-        query_embedding = self._get_embedding(query)
+        """Search for similar chunks, fusing vector similarity with BM25 when the lexical index is enabled"""
+        lexical_hits = []
+        if self.bm25_index:
+            with timed(RAG_STAGE_SECONDS, stage="lexical_search"):
+                lexical_hits = await run_blocking(self.bm25_index.search, query, 2 * top_k)
 
-        # Search in Pinecone
-        search_results = self.pinecone_index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
+        # When one chunk outscores every other by a wide margin it literally contains what was
+        # asked for (a section number, an act name), so the embedding round trip is skipped
+        if self._lexical_match_is_decisive(query, lexical_hits):
+            dense_matches = []
+        else:
+            # Get query embedding
+            with timed(RAG_STAGE_SECONDS, stage="query_embedding"):
+                query_embedding = await self.embed_query(query)
 
-        # Get full chunk details from Supabase
-        vector_ids = [match['id'] for match in search_results['matches']]
+            # Search the vector store
+            with timed(VECTOR_STORE_SECONDS, operation="query"):
+                dense_matches = await run_blocking(
+                    self.vector_store.query, query_embedding, 2 * top_k if self.bm25_index else top_k
+                )
 
-        chunk_details = await self.chunk_service.get_chunks_by_vector_ids(vector_ids)
+        ranked = self._fuse(dense_matches, lexical_hits, top_k)
+        if not ranked:
+            return []
 
-        # Combine results
+        vector_ids = [vector_id for vector_id, _ in ranked]
+        with timed(RAG_STAGE_SECONDS, stage="resolve"):
+            chunks = await self._resolve_chunks(vector_ids, dense_matches)
+            documents = await self._resolve_documents({chunk['document_id'] for chunk in chunks.values()})
+
+        # Combine results; chunks or documents deleted since they were indexed are skipped
         results = []
-        for match in search_results['matches']:
-            # Find corresponding chunk detail
-            chunk_detail = next(
-                (chunk_doc_tuple for chunk_doc_tuple in chunk_details if chunk_doc_tuple[0].vector_id == match['id']),
-                None
-            )
-
-            if chunk_detail:
-                chunk, document = chunk_detail  # Unpack the tuple
-                results.append({
-                    'similarity_score': match['score'],
-                    'document_name': document.filename,
-                    'document_type': document.file_type,
-                    'document_filepath': document.file_path,
-                    'chunk_id': chunk.id,
-                    'chunk_index': chunk.chunk_index,
-                    'content': chunk.content,
-                    'start_char_index': chunk.start_char_index,
-                    'end_char_index': chunk.end_char_index,
-                    'vector_id': match['id']
-                })
-
-        return results
\ No newline at end of file
+        for vector_id, similarity_score in ranked:
+            chunk = chunks.get(vector_id)
+            document = documents.get(chunk['document_id']) if chunk else None
+            if document is None:
+                continue
+            results.append({
+                'similarity_score': similarity_score,
+                'document_id': chunk['document_id'],
+                'document_name': document['filename'],
+                'document_type': document['file_type'],
+                'document_filepath': document['file_path'],
+                'chunk_id': chunk['id'],
+                'chunk_index': chunk['chunk_index'],
+                'content': chunk['content'],
+                'start_char_index': chunk['start_char_index'],
+                'end_char_index': chunk['end_char_index'],
+                'vector_id': vector_id
+            })
+
+        return results
+
+    async def _resolve_chunks(self, vector_ids: List[str],
+                              dense_matches: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Chunk rows for the vector IDs keyed by vector ID, read from the configured source.
+
+        Whatever the vector metadata or the local chunk store cannot answer is
+        fetched from Supabase with only the columns retrieval needs.
+        """
+        chunks = {}
+        if self.chunk_content_source == "vector_metadata":
+            for match in dense_matches:
+                metadata = match.get('metadata') or {}
+                # Vectors written before full content was stored carry a 500 character prefix
+                if 'chunk_id' not in metadata or \
+                        len(metadata.get('content', '')) != metadata['end_char'] - metadata['start_char']:
+                    continue
+                chunks[match['id']] = {
+                    'id': metadata['chunk_id'],
+                    'vector_id': match['id'],
+                    'document_id': metadata['document_id'],
+                    'chunk_index': metadata['chunk_index'],
+                    'content': metadata['content'],
+                    'start_char_index': metadata['start_char'],
+                    'end_char_index': metadata['end_char']
+                }
+        elif self.chunk_store:
+            chunks = await run_blocking(self.chunk_store.get_many, vector_ids)
+
+        missing = [vector_id for vector_id in vector_ids if vector_id not in chunks]
+        if missing:
+            for row in await self.chunk_service.get_chunk_contexts_by_vector_ids(missing):
+                document = row.pop('documents', None)
+                if document:
+                    self.document_cache.put(row['document_id'], document)
+                chunks[row['vector_id']] = row
+        return chunks
+
+    async def _resolve_documents(self, document_ids: set) -> Dict[str, Dict[str, Any]]:
+        """Filename, type and path of each document, from a short-lived cache or Supabase"""
+        documents = self.document_cache.get_many(document_ids)
+
+        missing = [document_id for document_id in document_ids if document_id not in documents]
+        if missing:
+            for row in await self.document_service.get_documents_by_ids(missing):
+                self.document_cache.put(row['id'], row)
+                documents[row['id']] = row
+        return documents
@@ -1,11 +1,16 @@
+import asyncio
 import logging
+import weakref
 from dotenv import load_dotenv
 
+from typing import Any, AsyncIterator, Optional, Tuple
+
 from agent.reasoning_processor import ReasoningProcessor
-from core.database import get_supabase_client
+from agent.settings import settings
+from core.clients import ClientRegistry, get_clients
 from core.enums import MessageRole, MessageStatus, MessageTask
 from schemas.chat import ChatUpdate
-from schemas.message import MessageUpdate, MessageCreate
+from schemas.message import MessageUpdate, MessageCreate, MessageResponse
 from services.chat import ChatService
 from services.message import MessageService
 
@@ -14,27 +19,126 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 class ChatProcessor:
-    def __init__(self):
-        self.processor = ReasoningProcessor()
-        self.message_service = MessageService(get_supabase_client())
-        self.chat_service = ChatService(get_supabase_client())
+    def __init__(self, clients: Optional[ClientRegistry] = None):
+        self.clients = clients or get_clients()
+        self.processor = ReasoningProcessor(self.clients)
+        self.message_service = MessageService(self.clients.supabase)
+        self.chat_service = ChatService(self.clients.supabase)
+        self.claim_lease_seconds = settings.CHAT_CLAIM_LEASE_SECONDS
+        # Serialises runs per chat so answers are stored in the order the questions were asked;
+        # claiming keeps workers in other processes from answering the same message. Weak values
+        # drop a chat's lock once no run holds or waits on it
+        self.chat_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def _chat_lock(self, chat_id: str) -> asyncio.Lock:
+        lock = self.chat_locks.get(chat_id)
+        if lock is None:
+            lock = self.chat_locks[chat_id] = asyncio.Lock()
+        return lock
 
     async def process_chat(self, chat_id :str):
-        messages = await self.message_service.get_messages_by_chat_id(chat_id)
-        if len(messages) == 1:
-            preview = messages[0].content
-            title = preview[:27] + "..." if len(preview) > 27 else preview
-            self._rename_chat(chat_id, title)
-        for message in messages:
-            if message.role == MessageRole.USER and message.status == MessageStatus.PENDING:
-                result = await self.processor.answer_question(message = message)
-                await self.message_service.update_message(message.id, MessageUpdate(status=MessageStatus.COMPLETED))
-                await self.message_service.create_message(MessageCreate(chat_id=message.chat_id,
-                                                                        role=MessageRole.ASSISTANT,
-                                                                        content=result['answer'],
-                                                                        task=MessageTask.SUMMARIZE,
-                                                                        status=MessageStatus.COMPLETED))
+        async with self._chat_lock(chat_id):
+            recent_messages = await self.message_service.get_messages_by_chat_id(chat_id, limit=2)
+            if len(recent_messages) == 1:
+                preview = recent_messages[0].content
+                title = preview[:27] + "..." if len(preview) > 27 else preview
+                await self._rename_chat(chat_id, title)
+
+            # Claimed one at a time, so the chat's history is never read
+            failed = 0
+            while True:
+                message = await self.message_service.claim_next_pending_message(chat_id, self.claim_lease_seconds)
+                if message is None:
+                    break
+                if not await self._answer_message(message):
+                    failed += 1
+
+            if failed:
+                raise RuntimeError(f"Failed to answer {failed} message(s) of chat {chat_id}")
+
+    async def _answer_message(self, message: MessageResponse) -> bool:
+        """Answer a message already claimed as in progress, marking it failed if that does not work"""
+        try:
+            result = await self.processor.answer_question(message = message)
+            await self.message_service.create_message(MessageCreate(chat_id=message.chat_id,
+                                                                    role=MessageRole.ASSISTANT,
+                                                                    content=result['answer'],
+                                                                    task=MessageTask.SUMMARIZE,
+                                                                    status=MessageStatus.COMPLETED))
+            await self.message_service.update_message(message.id, MessageUpdate(status=MessageStatus.COMPLETED))
+            return True
+        except asyncio.CancelledError:
+            # Released rather than left in progress, so the next start answers it
+            # without waiting out the claim lease
+            await asyncio.shield(self._release_message(message))
+            raise
+        except Exception as e:
+            # The rest of the chat's pending messages are still answered
+            logger.error(f"Error answering message {message.id}: {e}")
+            await self.message_service.update_message(message.id, MessageUpdate(status=MessageStatus.FAILED))
+            return False
+
+    async def _release_message(self, message: MessageResponse):
+        try:
+            await self.message_service.update_message(message.id, MessageUpdate(status=MessageStatus.PENDING))
+        except Exception as e:
+            logger.error(f"Error releasing message {message.id}: {e}")
 
     async def _rename_chat(self, chat_id :str, title : str):
         await self.chat_service.update_chat(chat_id=chat_id, chat_update=ChatUpdate(title=title))
 
+    async def stream_message(self, message: MessageResponse) -> AsyncIterator[Tuple[str, Any]]:
+        """Answer a single user message, yielding sources and tokens as they arrive.
+
+        The assistant message is persisted once, after the last token. If the
+        stream fails or the client disconnects first, whatever was generated is
+        stored and the user message is marked failed.
+        """
+        answer_parts = []
+        status = MessageStatus.FAILED
+        error = None
+        try:
+            recent_messages = await self.message_service.get_messages_by_chat_id(message.chat_id, limit=2)
+            if len(recent_messages) == 1:
+                preview = message.content
+                await self._rename_chat(message.chat_id, preview[:27] + "..." if len(preview) > 27 else preview)
+
+            async for event, data in self.processor.stream_answer(message):
+                if event == 'token':
+                    answer_parts.append(data)
+                yield event, data
+            status = MessageStatus.COMPLETED
+        except (asyncio.CancelledError, GeneratorExit):
+            logger.info(f"Client disconnected while streaming the answer to message {message.id}")
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming answer for message {message.id}: {e}")
+            error = e
+        finally:
+            # Also runs when the response is closed on disconnect; shielded so the
+            # request being cancelled cannot leave the message in progress
+            answer = await asyncio.shield(self._store_streamed_answer(message, "".join(answer_parts), status))
+
+        if error is not None:
+            yield 'error', {'detail': str(error)}
+        elif answer is None:
+            yield 'error', {'detail': "Failed to store the answer"}
+        else:
+            yield 'done', answer
+
+    async def _store_streamed_answer(self, message: MessageResponse, content: str,
+                                     status: MessageStatus) -> Optional[MessageResponse]:
+        """Store the (possibly partial) answer and settle the user message with status"""
+        try:
+            answer = None
+            if content or status == MessageStatus.COMPLETED:
+                answer = await self.message_service.create_message(MessageCreate(chat_id=message.chat_id,
+                                                                                 role=MessageRole.ASSISTANT,
+                                                                                 content=content,
+                                                                                 task=MessageTask.SUMMARIZE,
+                                                                                 status=status))
+            await self.message_service.update_message(message.id, MessageUpdate(status=status))
+            return answer
+        except Exception as e:
+            logger.error(f"Error storing the streamed answer for message {message.id}: {e}")
+            return None
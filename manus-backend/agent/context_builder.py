@@ -0,0 +1,129 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import tiktoken
+
+from agent.document_parser import get_tokenizer
+
+# Chunks this close together are only separated by line breaks and are joined into one passage
+_ADJACENT_GAP = 2
+
+_PART_SEPARATOR = "\n---\n"
+
+
+@dataclass
+class _Passage:
+    """A run of overlapping or adjacent chunks from one document"""
+    document_name: str
+    start: int
+    end: int
+    text: str
+    rank: int
+    chunks: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def context_tokenizer(model: Optional[str]) -> tiktoken.Encoding:
+    """Tokenizer of the chat model, falling back to the chunker's for unknown models"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except (KeyError, TypeError):
+        return get_tokenizer()
+
+
+def _format_part(document_name: str, text: str) -> str:
+    return f"Document: {document_name}\nContent: {text}\n"
+
+
+def _merge_passages(chunks: List[Dict[str, Any]]) -> List[_Passage]:
+    """Merge chunks of the same document whose character ranges overlap or touch.
+
+    Only chunks whose content is exactly the document text between their offsets
+    are merged, since the overlap with the previous chunk is cut off by position
+    alone. Chunks stored before offsets were exact fail that check and stay
+    passages of their own. A passage ranks where its best chunk ranked in the input.
+    """
+    by_document: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for rank, chunk in enumerate(chunks):
+        by_document.setdefault(chunk['document_id'], []).append((rank, chunk))
+
+    passages = []
+    for document_chunks in by_document.values():
+        document_chunks.sort(key=lambda ranked: ranked[1]['start_char_index'])
+        passage = None
+        for rank, chunk in document_chunks:
+            start, end = chunk['start_char_index'], chunk['end_char_index']
+            if len(chunk['content']) != end - start:
+                passages.append(_Passage(chunk['document_name'], start, end, chunk['content'], rank, [chunk]))
+                continue
+            if passage is not None and start <= passage.end + _ADJACENT_GAP:
+                if end > passage.end:
+                    if start >= passage.end:
+                        passage.text += "\n" + chunk['content']
+                    else:
+                        passage.text += chunk['content'][passage.end - start:]
+                    passage.end = end
+                passage.rank = min(passage.rank, rank)
+                passage.chunks.append(chunk)
+                continue
+            passage = _Passage(chunk['document_name'], start, end, chunk['content'], rank, [chunk])
+            passages.append(passage)
+    return passages
+
+
+class ContextBuilder:
+    """Packs retrieved chunks into the LLM context under a token budget.
+
+    Chunks are expected best first. Overlapping and adjacent chunks of the
+    same document are merged so shared text is sent once, then passages are
+    added in rank order until the budget is spent. A passage that does not fit is skipped in favour of
+    smaller ones further down, except the best one, which is truncated rather
+    than leaving the context empty.
+    """
+
+    def __init__(self, max_tokens: int, tokenizer: Optional[tiktoken.Encoding] = None):
+        self.max_tokens = max_tokens
+        self.tokenizer = tokenizer or get_tokenizer()
+
+    def _count(self, text: str) -> int:
+        return len(self.tokenizer.encode_ordinary(text))
+
+    def build(self, chunks: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]], Dict[str, int]]:
+        """Return the context, the chunks it contains in context order, and token accounting"""
+        separator_tokens = self._count(_PART_SEPARATOR)
+        naive_parts = [_format_part(chunk['document_name'], chunk['content']) for chunk in chunks]
+        naive_tokens = sum(self._count(part) for part in naive_parts) + separator_tokens * max(0, len(chunks) - 1)
+
+        passages = sorted(_merge_passages(chunks), key=lambda passage: passage.rank)
+        passage_parts = [_format_part(passage.document_name, passage.text) for passage in passages]
+        passage_costs = [self._count(part) for part in passage_parts]
+        merged_tokens = sum(passage_costs) + separator_tokens * max(0, len(passages) - 1)
+
+        parts = []
+        included = []
+        used = 0
+        for passage, part, cost in zip(passages, passage_parts, passage_costs):
+            cost += separator_tokens if parts else 0
+            if used + cost > self.max_tokens:
+                if parts:
+                    continue
+                # Keep the head of the best passage rather than sending no context at all
+                header_tokens = self._count(_format_part(passage.document_name, ""))
+                tokens = self.tokenizer.encode_ordinary(passage.text)[:max(0, self.max_tokens - header_tokens)]
+                text = self.tokenizer.decode(tokens)
+                part = _format_part(passage.document_name, text)
+                cost = self._count(part)
+                passage.chunks = [chunk for chunk in passage.chunks if chunk['start_char_index'] < passage.start + len(text)]
+            parts.append(part)
+            included.extend(passage.chunks)
+            used += cost
+
+        stats = {
+            'chunks': len(chunks),
+            'passages': len(parts),
+            'chunks_dropped': len(chunks) - len(included),
+            'naive_tokens': naive_tokens,
+            'context_tokens': used,
+            'tokens_deduplicated': naive_tokens - merged_tokens,
+            'tokens_saved': naive_tokens - used
+        }
+        return _PART_SEPARATOR.join(parts), included, stats
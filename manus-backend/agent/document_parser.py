@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import deque
+from typing import List, Dict, Any, Deque, Iterable, Iterator, Optional, Tuple
+import PyPDF2
+from docx import Document
+import tiktoken
+
+# Extraction and chunking are CPU-bound, so they live at module level where
+# DocumentProcessor can hand them to a process pool.
+#
+# Everything streams: extractors yield one page or paragraph at a time, the
+# hash is updated as text goes by, and the chunker only holds the text of the
+# chunk it is building. Chunks are spilled to a JSONL file that the caller
+# reads back in windows, so memory stays bounded however large the document is.
+
+_tokenizer = None
+
+_TXT_READ_SIZE = 1024 * 1024
+
+
+def get_tokenizer() -> tiktoken.Encoding:
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = tiktoken.get_encoding("cl100k_base")
+    return _tokenizer
+
+
+def iter_text_from_file(file_path: str) -> Tuple[str, Iterator[str]]:
+    """Return the file type and a generator over the document text, piece by piece"""
+    file_extension = os.path.splitext(file_path)[1].lower()
+
+    if file_extension == '.pdf':
+        return 'pdf', _iter_pdf(file_path)
+    elif file_extension == '.docx':
+        return 'docx', _iter_docx(file_path)
+    elif file_extension == '.txt':
+        return 'txt', _iter_txt(file_path)
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+
+
+def _iter_pdf(file_path: str) -> Iterator[str]:
+    """Extract text from PDF, one page at a time"""
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page in pdf_reader.pages:
+            yield page.extract_text() + "\n"
+
+
+def _iter_docx(file_path: str) -> Iterator[str]:
+    """Extract text from DOCX, one paragraph at a time"""
+    doc = Document(file_path)
+    for paragraph in doc.paragraphs:
+        yield paragraph.text + "\n"
+
+
+def _iter_txt(file_path: str) -> Iterator[str]:
+    """Extract text from TXT in fixed-size blocks"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        while True:
+            block = file.read(_TXT_READ_SIZE)
+            if not block:
+                break
+            yield block
+
+
+def _iter_lines(pieces: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """(offset, line) for every line of the concatenated pieces, split exactly like str.split('\\n')"""
+    offset = 0
+    partial = []
+    for piece in pieces:
+        parts = piece.split('\n')
+        if len(parts) == 1:
+            partial.append(piece)
+            continue
+        parts[0] = ''.join(partial) + parts[0]
+        partial = [parts[-1]]
+        for line in parts[:-1]:
+            yield offset, line
+            offset += len(line) + 1
+    yield offset, ''.join(partial)
+
+
+def _stripped_lines(lines: Iterable[Tuple[int, str]]) -> Iterator[Tuple[int, int, str]]:
+    """(start, end, stripped) for every line, skipping the blank lines before the first content"""
+    started = False
+    for offset, line in lines:
+        stripped = line.strip()
+        if not stripped and not started:
+            continue
+        started = True
+        start = offset + len(line) - len(line.lstrip())
+        yield start, start + len(stripped), stripped
+
+
+def _merge_headings(lines: Iterable[Tuple[int, int, str]]) -> Iterator[Tuple[int, int]]:
+    """Merge headings (lines under 10 words) with the following paragraph"""
+    pending = None
+    for line in lines:
+        if pending is None:
+            pending = line
+            continue
+        start, end, stripped = pending
+        next_start, next_end, next_stripped = line
+        if next_stripped and len(stripped.split()) < 10:
+            yield (start if stripped else next_start), next_end
+            pending = None
+        else:
+            if stripped:
+                yield start, end
+            pending = line
+    if pending is not None and pending[2]:
+        yield pending[0], pending[1]
+
+
+def _slice(lines: Deque[Tuple[int, str]], start: int, end: int) -> str:
+    """text[start:end] rebuilt from the buffered lines that cover it"""
+    parts = []
+    for offset, line in lines:
+        if offset + len(line) < start:
+            continue
+        if offset >= end:
+            break
+        parts.append((line + '\n')[max(0, start - offset):end - offset])
+    return ''.join(parts)
+
+
+def _make_chunk(segment: str, offset: int, token_count: int) -> Dict[str, Any]:
+    stripped = segment.lstrip()
+    start = offset + len(segment) - len(stripped)
+    stripped = stripped.rstrip()
+    return {
+        'text': stripped,
+        'start_char': start,
+        'end_char': start + len(stripped),
+        'token_count': token_count
+    }
+
+
+def _char_offsets(tokenizer: tiktoken.Encoding, text: str, tokens: List[int], positions: List[int]) -> List[int]:
+    """Character offset in text at which each of the ascending token positions starts.
+
+    Only the requested boundaries are resolved, walking the UTF-8 bytes once. A
+    token that starts inside a multi-byte character maps to that character.
+    """
+    encoded = text.encode('utf-8')
+    offsets = []
+    token_pos = byte_pos = char_byte_pos = char_pos = 0
+    for position in positions:
+        byte_pos += len(tokenizer.decode_bytes(tokens[token_pos:position]))
+        boundary = byte_pos
+        while boundary < len(encoded) and (encoded[boundary] & 0xC0) == 0x80:
+            boundary -= 1
+        char_pos += len(encoded[char_byte_pos:boundary].decode('utf-8'))
+        offsets.append(char_pos)
+        token_pos, char_byte_pos = position, boundary
+    return offsets
+
+
+def iter_chunks(pieces: Iterable[str], max_tokens: int = 512, overlap_tokens: int = 50) -> Iterator[Dict[str, Any]]:
+    """Chunk streamed text with consideration for headings, short and long paragraphs.
+
+    Every paragraph is tokenized exactly once and offsets are tracked directly,
+    so each chunk's text is exactly text[start_char:end_char] of the full
+    document. Headings are merged into the paragraph below them. Paragraphs are
+    packed into chunks of up to max_tokens, so short paragraphs ride along with
+    their neighbours. Paragraphs longer than max_tokens are split into
+    overlapping token windows.
+    """
+    tokenizer = get_tokenizer()
+
+    # Lines from the start of the chunk being built up to the lookahead line
+    lines: Deque[Tuple[int, str]] = deque()
+
+    def buffered_lines() -> Iterator[Tuple[int, str]]:
+        for offset, line in _iter_lines(pieces):
+            lines.append((offset, line))
+            yield offset, line
+
+    current_start = current_end = None
+    current_tokens = 0
+
+    for para_start, para_end in _merge_headings(_stripped_lines(buffered_lines())):
+        para = _slice(lines, para_start, para_end)
+        para_tokens = tokenizer.encode_ordinary(para)
+        para_token_count = len(para_tokens)
+
+        if para_token_count > max_tokens:
+            # Commit what came before so chunks stay in document order
+            if current_start is not None:
+                yield _make_chunk(_slice(lines, current_start, current_end), current_start, current_tokens)
+                current_start = None
+
+            # Split the paragraph into overlapping windows, mapping token positions back to characters
+            step = max(1, max_tokens - overlap_tokens)
+            windows = []
+            for start in range(0, para_token_count, step):
+                end = min(start + max_tokens, para_token_count)
+                windows.append((start, end))
+                if end == para_token_count:
+                    break
+            positions = sorted({position for window in windows for position in window})
+            offsets = dict(zip(positions, _char_offsets(tokenizer, para, para_tokens, positions)))
+
+            for start, end in windows:
+                chunk = _make_chunk(para[offsets[start]:offsets[end]], para_start + offsets[start], end - start)
+                if chunk['text']:
+                    yield chunk
+
+        elif current_start is None:
+            current_start, current_end, current_tokens = para_start, para_end, para_token_count
+
+        else:
+            # The separator between paragraphs is usually a single newline token
+            separator_tokens = len(tokenizer.encode_ordinary(_slice(lines, current_end, para_start)))
+            if current_tokens + separator_tokens + para_token_count > max_tokens:
+                yield _make_chunk(_slice(lines, current_start, current_end), current_start, current_tokens)
+                current_start, current_end, current_tokens = para_start, para_end, para_token_count
+            else:
+                current_end = para_end
+                current_tokens += separator_tokens + para_token_count
+
+        # Release lines that end before anything still needed
+        keep_from = para_end if current_start is None else current_start
+        while lines and lines[0][0] + len(lines[0][1]) < keep_from:
+            lines.popleft()
+
+    if current_start is not None:
+        yield _make_chunk(_slice(lines, current_start, current_end), current_start, current_tokens)
+
+
+def chunk_text(text: str, max_tokens: int = 512, overlap_tokens: int = 50) -> List[Dict[str, Any]]:
+    """Chunk an in-memory text, see iter_chunks"""
+    return list(iter_chunks([text], max_tokens, overlap_tokens))
+
+
+def read_chunks(chunks_path: str, window_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Read chunks spilled by parse_document back in windows of window_size"""
+    window = []
+    with open(chunks_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            window.append(json.loads(line))
+            if len(window) >= window_size:
+                yield window
+                window = []
+    if window:
+        yield window
+
+
+def parse_document(file_path: str, max_tokens: int, overlap_tokens: int,
+                   spill_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Extract, hash and chunk a document in one streaming pass.
+
+    Chunks are written to a JSONL file whose path is returned; the caller owns
+    it and must delete it. Extraction and chunking are interleaved, so the time
+    spent pulling text out of the file is measured separately and the rest of
+    the pass counted as chunking.
+    """
+    start = time.perf_counter()
+    file_type, pieces = iter_text_from_file(file_path)
+    # Same digest as hashing the whole text at once, so existing file_hash values still match
+    file_hash = hashlib.md5()
+    extract_seconds = 0.0
+
+    def hashed(pieces: Iterable[str]) -> Iterator[str]:
+        nonlocal extract_seconds
+        while True:
+            piece_start = time.perf_counter()
+            piece = next(pieces, None)
+            extract_seconds += time.perf_counter() - piece_start
+            if piece is None:
+                return
+            file_hash.update(piece.encode())
+            yield piece
+
+    total_chunks = 0
+    fd, chunks_path = tempfile.mkstemp(prefix="chunks-", suffix=".jsonl", dir=spill_dir)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            for chunk in iter_chunks(hashed(pieces), max_tokens, overlap_tokens):
+                file.write(json.dumps(chunk) + '\n')
+                total_chunks += 1
+    except BaseException:
+        os.remove(chunks_path)
+        raise
+
+    return {
+        'file_type': file_type,
+        'file_hash': file_hash.hexdigest(),
+        'chunks_path': chunks_path,
+        'total_chunks': total_chunks,
+        'extract_seconds': extract_seconds,
+        'chunk_seconds': time.perf_counter() - start - extract_seconds
+    }
@@ -1,17 +1,28 @@
+import asyncio
 import logging
+import multiprocessing
 import os
 import hashlib
-from typing import List, Dict, Any, Tuple
-import PyPDF2
-from docx import Document
+import uuid
+from datetime import datetime, timedelta
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import tiktoken
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
-from openai import OpenAI
+from agent.document_parser import parse_document, read_chunks
 from agent.settings import settings
-from core.database import get_supabase_client
-from schemas.chunk import ChunkCreate
-from schemas.document import DocumentCreate, DocumentUpdate
+from core.clients import ClientRegistry, get_clients
+from core.concurrency import run_blocking
+from core.enums import DocumentStatus, IngestStatus
+from core.metrics import (
+    EMBEDDING_INPUTS, EMBEDDING_REQUEST_SECONDS, EMBEDDING_REQUESTS, EMBEDDING_TOKENS,
+    INGEST_CHUNKS, INGEST_DOCUMENTS, INGEST_STAGE_SECONDS, VECTOR_STORE_SECONDS, timed
+)
+from core.pagination import next_cursor
+from core.query_embedder import RETRYABLE_ERRORS, retry_delay
+from schemas.chunk import ChunkCreate, ChunkResponse
+from schemas.document import DocumentCreate, DocumentUpdate, DocumentResponse
 from services.chunk import ChunkService
 from services.document import DocumentService
 
@@ -19,281 +30,695 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-class DocumentProcessor:
-    def __init__(self):
+# Chunk rows are stamped by the database clock a little before they reach the lexical
+# index, so recovery after a crash re-indexes from this long before the last save
+_LOCAL_INDEX_RECOVERY_MARGIN = 300
 
-        self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+class DocumentProcessor:
+    def __init__(self, clients: Optional[ClientRegistry] = None):
+        self.clients = clients or get_clients()
+        self.openai_client = self.clients.openai
 
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        self.index_name = settings.PINECONE_INDEX_NAME
         self.max_tokens = settings.MAX_TOKENS_PER_CHUNK
         self.overlap_token = settings.OVERLAPPING_TOKEN
         self.embedding_model = settings.EMBEDDING_MODEL
         self.embedding_dimensions = settings.EMBEDDING_DIMENSIONS
+        self.embedding_batch_max_tokens = settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.embedding_batch_max_inputs = settings.EMBEDDING_BATCH_MAX_INPUTS
+        self.embedding_max_retries = settings.EMBEDDING_MAX_RETRIES
+        self.embedding_semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENCY)
+        self.chunk_window_size = settings.INGEST_CHUNK_WINDOW_SIZE
 
-        existing_indexes = [index.name for index in self.pc.list_indexes()]
-
-        if self.index_name not in existing_indexes:
-            self.pc.create_index(
-                name=self.index_name,
-                dimension=self.embedding_dimensions,
-                metric="cosine",
-                spec=ServerlessSpec(
-                    cloud=settings.PINECONE_CLOUD,
-                    region=settings.PINECONE_REGION
-                )
-            )
-
-        self.pinecone_index = self.pc.Index(self.index_name)
+        self.vector_store = self.clients.vector_store
 
-        self.document_service = DocumentService(get_supabase_client())
-        self.chunk_service = ChunkService(get_supabase_client())
+        self.document_service = DocumentService(self.clients.supabase)
+        self.chunk_service = ChunkService(self.clients.supabase)
 
         self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.embedding_cache = self.clients.embedding_cache
+        self.bm25_index = self.clients.bm25_index
+        self.answer_cache = self.clients.answer_cache
+        self.document_cache = self.clients.document_cache
+        self.chunk_store = self.clients.chunk_store
+        self.ingest_journal = self.clients.ingest_journal
+
+        # Extraction and chunking are CPU-bound; spawn keeps the workers clear of the
+        # event loop and watchdog threads running in this process
+        self.parse_executor = ProcessPoolExecutor(
+            max_workers=settings.INGEST_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
 
+    def close(self):
+        """Release the parsing process pool"""
+        self.parse_executor.shutdown(wait=False, cancel_futures=True)
 
-    def _calculate_file_hash(self, content: str) -> str:
-        """Calculate hash of file content to avoid duplicates"""
-        return hashlib.md5(content.encode()).hexdigest()
+    async def _parse_document(self, file_path: str) -> Dict[str, Any]:
+        """Extract, hash and chunk a document in the parsing process pool, spilling its chunks to disk"""
+        loop = asyncio.get_running_loop()
+        parsed = await loop.run_in_executor(
+            self.parse_executor, parse_document, file_path, self.max_tokens, self.overlap_token
+        )
+        file_type = parsed['file_type']
+        INGEST_STAGE_SECONDS.labels(stage="extract", file_type=file_type).observe(parsed['extract_seconds'])
+        INGEST_STAGE_SECONDS.labels(stage="chunk", file_type=file_type).observe(parsed['chunk_seconds'])
+        INGEST_CHUNKS.labels(file_type=file_type).inc(parsed['total_chunks'])
+        return parsed
 
-    def _extract_text_from_file(self, file_path: str) -> Tuple[str, str]:
-        """Extract text from various file formats"""
-        file_extension = os.path.splitext(file_path)[1].lower()
+    @staticmethod
+    def _count_document(file_path: str, outcome: str):
+        # Labelled by extension so failures before parsing are counted too
+        file_type = os.path.splitext(file_path)[1].lstrip('.').lower() or "none"
+        INGEST_DOCUMENTS.labels(file_type=file_type, outcome=outcome).inc()
 
-        if file_extension == '.pdf':
-            return self._extract_from_pdf(file_path), 'pdf'
-        elif file_extension == '.docx':
-            return self._extract_from_docx(file_path), 'docx'
-        elif file_extension == '.txt':
-            return self._extract_from_txt(file_path), 'txt'
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
-
-    def _extract_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF"""
-        text = ""
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
-
-    def _extract_from_docx(self, file_path: str) -> str:
-        """Extract text from DOCX"""
-        doc = Document(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
-
-    def _extract_from_txt(self, file_path: str) -> str:
-        """Extract text from TXT"""
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-
-    def _chunk_text(self, text: str, max_tokens: int = 512, overlap_tokens: int = 50) -> List[Dict[str, Any]]:
-        """Chunk text with consideration for headings, short and long paragraphs."""
-        paragraphs = text.strip().split('\n')
-        merged_paragraphs = []
-
-        # Merge headings with the following paragraph
-        i = 0
-        while i < len(paragraphs):
-            current = paragraphs[i].strip()
-            if i + 1 < len(paragraphs):
-                next_para = paragraphs[i + 1].strip()
-                if len(current.split()) < 10 and next_para:
-                    merged_paragraphs.append(f"{current}\n{next_para}")
-                    i += 2
-                    continue
-            if current:
-                merged_paragraphs.append(current)
-            i += 1
-
-        # Tokenize and chunk
-        chunks = []
-        current_chunk_tokens = []
-        current_chunk_text = ""
-        current_start_char = 0
-
-        for para in merged_paragraphs:
-            para_tokens = self.tokenizer.encode(para)
-            para_token_count = len(para_tokens)
-
-            if para_token_count > max_tokens:
-                # If paragraph is too long, chunk it
-                start = 0
-                while start < para_token_count:
-                    end = min(start + max_tokens, para_token_count)
-                    sub_tokens = para_tokens[start:end]
-                    sub_text = self.tokenizer.decode(sub_tokens).strip()
-
-                    if sub_text:
-                        sub_start_char = text.find(sub_text, current_start_char)
-                        if sub_start_char == -1:
-                            chars_per_token = len(text) / len(self.tokenizer.encode(text))
-                            sub_start_char = int(start * chars_per_token)
-
-                        sub_end_char = sub_start_char + len(sub_text)
-                        chunks.append({
-                            'text': sub_text,
-                            'start_char': sub_start_char,
-                            'end_char': sub_end_char,
-                            'token_count': len(sub_tokens)
-                        })
-                        current_start_char = sub_end_char
-
-                    if end == para_token_count:
-                        break
-                    start = end - overlap_tokens
-
-            elif para_token_count < 30:
-                # If paragraph is very short, accumulate it with the next
-                current_chunk_tokens += para_tokens
-                current_chunk_text += '\n' + para
-            else:
-                # Commit the current chunk if it would exceed max_tokens
-                if len(current_chunk_tokens) + para_token_count > max_tokens:
-                    if current_chunk_tokens:
-                        chunk_text = self.tokenizer.decode(current_chunk_tokens).strip()
-                        start_char = text.find(chunk_text, current_start_char)
-                        if start_char == -1:
-                            chars_per_token = len(text) / len(self.tokenizer.encode(text))
-                            start_char = int(current_start_char)
-
-                        end_char = start_char + len(chunk_text)
-                        chunks.append({
-                            'text': chunk_text,
-                            'start_char': start_char,
-                            'end_char': end_char,
-                            'token_count': len(current_chunk_tokens)
-                        })
-                        current_start_char = end_char
-                    current_chunk_tokens = para_tokens
-                    current_chunk_text = para
-                else:
-                    current_chunk_tokens += para_tokens
-                    current_chunk_text += '\n' + para
-
-        # Append any remaining chunk
-        if current_chunk_tokens:
-            chunk_text = self.tokenizer.decode(current_chunk_tokens).strip()
-            start_char = text.find(chunk_text, current_start_char)
-            if start_char == -1:
-                chars_per_token = len(text) / len(self.tokenizer.encode(text))
-                start_char = int(current_start_char)
-            end_char = start_char + len(chunk_text)
-            chunks.append({
-                'text': chunk_text,
-                'start_char': start_char,
-                'end_char': end_char,
-                'token_count': len(current_chunk_tokens)
-            })
-
-        return chunks
-
-    def _get_embedding(self, text: str) -> List[float]:
+
+    async def _get_embedding(self, text: str) -> List[float]:
         """Get embedding using OpenAI's text-embedding-3-small"""
-        response = self.openai_client.embeddings.create(
+        if self.embedding_cache:
+            cached = await run_blocking(self.embedding_cache.get, self.embedding_model, self.embedding_dimensions, text)
+            if cached is not None:
+                return cached
+
+        response = await self.openai_client.embeddings.create(
             model=self.embedding_model,
             input=text,
             dimensions=self.embedding_dimensions
         )
-        return response.data[0].embedding
+        embedding = response.data[0].embedding
+
+        if self.embedding_cache:
+            await run_blocking(self.embedding_cache.put, self.embedding_model, self.embedding_dimensions, text, embedding)
+        return embedding
+
+    async def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for a batch of texts in a single request"""
+        EMBEDDING_INPUTS.labels(source="ingest").inc(len(texts))
+        try:
+            with timed(EMBEDDING_REQUEST_SECONDS, source="ingest"):
+                response = await self.openai_client.embeddings.create(
+                    model=self.embedding_model,
+                    input=texts,
+                    dimensions=self.embedding_dimensions
+                )
+        except Exception:
+            EMBEDDING_REQUESTS.labels(source="ingest", outcome="error").inc()
+            raise
+        EMBEDDING_REQUESTS.labels(source="ingest", outcome="ok").inc()
+        if getattr(response, "usage", None):
+            EMBEDDING_TOKENS.labels(source="ingest").inc(response.usage.total_tokens)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def _batch_texts(self, texts: List[str], token_counts: Optional[List[int]] = None) -> List[List[int]]:
+        """Group text positions into batches bounded by the per-request token budget"""
+        batches = []
+        current_batch = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            token_count = token_counts[i] if token_counts else len(self.tokenizer.encode(text))
+            if current_batch and (current_tokens + token_count > self.embedding_batch_max_tokens
+                                  or len(current_batch) >= self.embedding_batch_max_inputs):
+                batches.append(current_batch)
+                current_batch = []
+                current_tokens = 0
+            current_batch.append(i)
+            current_tokens += token_count
+
+        if current_batch:
+            batches.append(current_batch)
+
+        return batches
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, retrying with backoff on rate limits and transient errors"""
+        attempt = 0
+        while True:
+            try:
+                async with self.embedding_semaphore:
+                    return await self._get_embeddings(texts)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.embedding_max_retries:
+                    raise
+                delay = retry_delay(e, attempt)
+                logger.warning(f"Embedding batch of {len(texts)} failed ({e.__class__.__name__}), "
+                               f"retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _embed_texts(self, texts: List[str], token_counts: Optional[List[int]] = None) -> List[List[float]]:
+        """Embed texts in token-budgeted batches with a bounded number of requests in flight"""
+        if self.embedding_cache:
+            embeddings = await run_blocking(
+                self.embedding_cache.get_many, self.embedding_model, self.embedding_dimensions, texts
+            )
+        else:
+            embeddings = [None] * len(texts)
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            logger.info(f"All {len(texts)} chunk embeddings served from cache")
+            return embeddings
+
+        missing_texts = [texts[i] for i in missing]
+        missing_token_counts = [token_counts[i] for i in missing] if token_counts else None
+        batches = self._batch_texts(missing_texts, missing_token_counts)
+        logger.info(f"Embedding {len(missing)} of {len(texts)} chunks in {len(batches)} batches")
+
+        results = await asyncio.gather(*(self._embed_batch([missing_texts[i] for i in batch]) for batch in batches))
+
+        for batch, batch_embeddings in zip(batches, results):
+            for i, embedding in zip(batch, batch_embeddings):
+                embeddings[missing[i]] = embedding
+
+        if self.embedding_cache:
+            await run_blocking(
+                self.embedding_cache.put_many, self.embedding_model, self.embedding_dimensions,
+                missing_texts, [embeddings[i] for i in missing]
+            )
+        return embeddings
+
+    def _chunk_content_hash(self, content: str) -> str:
+        """Hash chunk content so unchanged chunks can be matched across versions of a document"""
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _vector_id(self, document_id: str, content_hash: str, used_ids: set) -> str:
+        """Derive a vector ID from the chunk content, disambiguating repeated chunks within a document"""
+        base_id = f"{document_id}_{content_hash[:16]}"
+        vector_id = base_id
+        occurrence = 1
+        while vector_id in used_ids:
+            vector_id = f"{base_id}_{occurrence}"
+            occurrence += 1
+        used_ids.add(vector_id)
+        return vector_id
+
+    def _chunk_id(self, vector_id: str) -> str:
+        """Derive the chunk row ID from its vector ID, so vector metadata can reference the row before it exists"""
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, vector_id))
+
+    def _build_vector(self, document_id: str, chunk_index: int, chunk_data: Dict[str, Any],
+                      vector_id: str, chunk_id: str, embedding: List[float]) -> Dict[str, Any]:
+        return {
+            'id': vector_id,
+            'values': embedding,
+            'metadata': self._vector_metadata(document_id, chunk_index, chunk_data, chunk_id)
+        }
+
+    def _vector_metadata(self, document_id: str, chunk_index: int, chunk_data: Dict[str, Any], chunk_id: str) -> Dict[str, Any]:
+        if settings.CHUNK_CONTENT_SOURCE == "vector_metadata":
+            # Search reads the chunk straight from the match, so store all of it
+            content = chunk_data['text']
+        else:
+            content = chunk_data['text'][:500]  # Store first 500 chars in metadata
+        return {
+            'chunk_id': chunk_id,
+            # No filename: it would go stale when the document is moved
+            'document_id': document_id,
+            'chunk_index': chunk_index,
+            'start_char': chunk_data['start_char'],
+            'end_char': chunk_data['end_char'],
+            'content': content
+        }
+
+    def _build_chunk_record(self, document_id: str, chunk_index: int, chunk_data: Dict[str, Any],
+                            vector_id: str, chunk_id: str) -> Dict[str, Any]:
+        return {
+            'id': chunk_id,
+            'document_id': document_id,
+            'chunk_index': chunk_index,
+            'content': chunk_data['text'],
+            'token_count': chunk_data['token_count'],
+            'start_char_index': chunk_data['start_char'],
+            'end_char_index': chunk_data['end_char'],
+            'vector_id': vector_id
+        }
+
+    async def _upsert_vectors(self, vectors_to_upsert: List[Dict[str, Any]]):
+        """Upsert vectors to the vector store in concurrent batches"""
+        batch_size = 100
+
+        async def upsert(batch: List[Dict[str, Any]]):
+            with timed(VECTOR_STORE_SECONDS, operation="upsert"):
+                await run_blocking(self.vector_store.upsert, batch)
+
+        logger.info("Uploading vectors to the vector store...")
+        await asyncio.gather(*(
+            upsert(vectors_to_upsert[i:i + batch_size])
+            for i in range(0, len(vectors_to_upsert), batch_size)
+        ))
+
+    async def _store_chunk_records(self, chunk_records: List[Dict[str, Any]]):
+        logger.info("Storing chunks in Supabase...")
+        await self.chunk_service.create_chunks(
+            [ChunkCreate(**chunk) for chunk in chunk_records],
+            batch_size=settings.SUPABASE_INSERT_BATCH_SIZE
+        )
+
+        await self._index_locally(chunk_records)
+
+    async def _index_locally(self, chunk_records: List[Dict[str, Any]]):
+        """Add chunks to the lexical index and the local chunk store, when enabled"""
+        if self.bm25_index:
+            await run_blocking(self.bm25_index.add_many, [(chunk['vector_id'], chunk['content']) for chunk in chunk_records])
+        if self.chunk_store:
+            await run_blocking(self.chunk_store.put_many, chunk_records)
+
+    async def _remove_vectors(self, vector_ids: List[str]):
+        """Remove chunks from the vector store and the local indexes"""
+        with timed(VECTOR_STORE_SECONDS, operation="delete"):
+            await run_blocking(self.vector_store.delete, vector_ids)
+        if self.bm25_index:
+            await run_blocking(self.bm25_index.remove_many, vector_ids)
+        if self.chunk_store:
+            await run_blocking(self.chunk_store.delete_many, vector_ids)
+
+    def _invalidate_document(self, document_id: str):
+        """Forget the cached document row and the cached answers that cite the document"""
+        self.document_cache.invalidate([document_id])
+        if self.answer_cache:
+            dropped = self.answer_cache.invalidate_documents([document_id])
+            if dropped:
+                logger.info(f"Invalidated {dropped} cached answers citing document {document_id}")
+
+    async def backfill_local_indexes(self):
+        """Index the stored chunks the local indexes are missing; run in the background at startup.
+
+        Everything is indexed when an index is empty or the lexical index holds
+        fewer chunks than the chunks table. Otherwise only chunks created since
+        shortly before the lexical index was last saved are, since a crash loses
+        whatever was indexed after that save.
+        """
+        if not self.bm25_index and not self.chunk_store:
+            return
+        if any(index is not None and index.is_empty() for index in (self.bm25_index, self.chunk_store)):
+            return await self.rebuild_local_indexes()
+        if not self.bm25_index:
+            return
+        if self.bm25_index.stats()["chunks"] < await self.chunk_service.count_chunks():
+            return await self.rebuild_local_indexes()
+        if self.bm25_index.saved_at is not None:
+            await self.rebuild_local_indexes(
+                created_since=self.bm25_index.saved_at - timedelta(seconds=_LOCAL_INDEX_RECOVERY_MARGIN)
+            )
+
+    async def rebuild_local_indexes(self, page_size: int = 1000, created_since: Optional[datetime] = None):
+        """Index every stored chunk, or those created since created_since"""
+        if not self.bm25_index and not self.chunk_store:
+            return
+        indexed = 0
+        cursor = None
+        while True:
+            # Keyset pages stay cheap deep into the table and skip nothing when chunks are added meanwhile
+            chunks = await self.chunk_service.get_chunks(limit=page_size, cursor=cursor, created_since=created_since)
+            if chunks:
+                await self._index_locally([chunk.model_dump() for chunk in chunks])
+                indexed += len(chunks)
+            cursor = next_cursor(chunks, page_size)
+            if cursor is None:
+                break
+        logger.info(f"Local indexes rebuilt with {indexed} chunks")
+
+    def _file_state(self, file_path: str) -> Tuple[int, int]:
+        """Size and mtime of the file, taken before reading it so later edits are noticed"""
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    async def _journal(self, file_path: str, file_state: Tuple[int, int], status: IngestStatus,
+                       file_hash: Optional[str] = None, document_id: Optional[str] = None):
+        if self.ingest_journal:
+            await run_blocking(self.ingest_journal.record, file_path, *file_state, status, file_hash, document_id)
+
+    async def _journal_failed(self, file_path: str):
+        if self.ingest_journal:
+            await run_blocking(self.ingest_journal.set_status, file_path, IngestStatus.FAILED)
 
     async def process_document(self, file_path: str):
         """Process a document: extract text, chunk, vectorize, and store"""
+        parsed = None
         try:
             filename = os.path.basename(file_path)
-            text_content, file_type = self._extract_text_from_file(file_path)
-            file_hash = self._calculate_file_hash(text_content)
+            file_state = self._file_state(file_path)
+            await self._journal(file_path, file_state, IngestStatus.INGESTING)
+            parsed = await self._parse_document(file_path)
+            file_type = parsed['file_type']
+            file_hash = parsed['file_hash']
 
             existing_doc = await self.document_service.get_document_by_hash(file_hash)
 
-            if existing_doc:
+            if existing_doc and existing_doc.status == DocumentStatus.COMMITTED:
+                await self._journal(file_path, file_state, IngestStatus.DONE, file_hash, existing_doc.id)
+                self._count_document(file_path, "duplicate")
                 return f"Document {filename} already exists in the system."
 
+            if existing_doc and existing_doc.status == DocumentStatus.UPDATING:
+                # An interrupted update of a document whose stored hash this content still has
+                result = await self._apply_incremental_update(existing_doc, parsed)
+                await self._journal(file_path, file_state, IngestStatus.DONE, file_hash, existing_doc.id)
+                self._count_document(file_path, "resumed")
+                return result
+
+            if existing_doc:
+                # An earlier attempt on this content stopped part way; pick it up where it left off
+                logger.info(f"Resuming ingest of {existing_doc.filename} from {existing_doc.status.value}")
+                await self._journal(file_path, file_state, IngestStatus.INGESTING, file_hash, existing_doc.id)
+                await self._ingest(existing_doc, parsed)
+                await self._journal(file_path, file_state, IngestStatus.DONE)
+                self._count_document(file_path, "resumed")
+                return
+
+            previous_doc = await self.document_service.get_document_by_file_path(file_path)
+            if previous_doc and previous_doc.status not in (DocumentStatus.COMMITTED, DocumentStatus.UPDATING):
+                # A partial ingest of content the file no longer has, nothing worth keeping
+                logger.info(f"Discarding partial ingest of {previous_doc.filename}")
+                await self._remove_document(previous_doc)
+                previous_doc = None
+
+            if previous_doc:
+                # The file changed since it was last ingested, or an update of it was interrupted;
+                # only re-embed what differs
+                result = await self._apply_incremental_update(previous_doc, parsed)
+                await self._journal(file_path, file_state, IngestStatus.DONE, file_hash, previous_doc.id)
+                self._count_document(file_path, "updated")
+                return result
+
             doc_result = await self.document_service.create_document(
                 DocumentCreate(
                     filename=filename,
                     file_path=file_path,
                     file_type=file_type,
-                    file_hash=file_hash
+                    file_hash=file_hash,
+                    status=DocumentStatus.PENDING
                 )
             )
 
-            document_id = doc_result.id
-
-            chunks = self._chunk_text(text_content, self.max_tokens, self.overlap_token)
-            logger.info(f"Created {len(chunks)} chunks")
+            # Remember the document so an interrupted ingest resumes instead of being taken for a duplicate
+            await self._journal(file_path, file_state, IngestStatus.INGESTING, file_hash, doc_result.id)
+            logger.info(f"Created {parsed['total_chunks']} chunks")
 
-            vectors_to_upsert = []
-            chunk_records = []
+            await self._ingest(doc_result, parsed)
+            await self._journal(file_path, file_state, IngestStatus.DONE)
+            self._count_document(file_path, "created")
 
-            for i, chunk_data in enumerate(chunks):
-                logger.info(f"Processing chunk {i + 1}/{len(chunks)}")
-
-                chunk_text = chunk_data['text']
-
-                embedding = self._get_embedding(chunk_text)
-
-                vector_id = f"{document_id}_{i}"
-
-                vectors_to_upsert.append({
-                    'id': vector_id,
-                    'values': embedding,
-                    'metadata': {
-                        'document_id': document_id,
-                        'filename': filename,
-                        'chunk_index': i,
-                        'start_char': chunk_data['start_char'],
-                        'end_char': chunk_data['end_char'],
-                        'content': chunk_text[:500]  # Store first 500 chars in metadata
-                    }
-                })
-
-                chunk_records.append({
-                    'document_id': document_id,
-                    'chunk_index': i,
-                    'content': chunk_text,
-                    'token_count': chunk_data['token_count'],
-                    'start_char_index': chunk_data['start_char'],
-                    'end_char_index': chunk_data['end_char'],
-                    'vector_id': vector_id
-                })
-
-            logger.info("Uploading vectors to Pinecone...")
-            batch_size = 100
-            for i in range(0, len(vectors_to_upsert), batch_size):
-                batch = vectors_to_upsert[i:i + batch_size]
-                self.pinecone_index.upsert(vectors=batch)
-
-            logger.info("Storing chunks in Supabase...")
-            for i in range(0, len(chunk_records), batch_size):
-                batch = chunk_records[i:i + batch_size]
-                for chunk in batch:
-                    await self.chunk_service.create_chunk(ChunkCreate(**chunk))
-
-            await self.document_service.update_document(document_id, DocumentUpdate(total_chunks = len(chunks)))
-
-            logger.info(f"Successfully processed {filename}: {len(chunks)} chunks created and vectorized.")
+            logger.info(f"Successfully processed {filename}: {parsed['total_chunks']} chunks created and vectorized.")
         except Exception as e:
             logger.error(f"Error in processing document and chunks {file_path}: {e}")
+            self._count_document(file_path, "failed")
+            await self._journal_failed(file_path)
+        finally:
+            self._discard_chunks(parsed)
+
+    def _chunk_windows(self, document_id: str, parsed: Dict[str, Any]):
+        """Windows of (chunk_index, chunk_data, vector_id, chunk_id) from the spilled chunks.
+
+        IDs depend only on the document ID and chunk contents, so every pass
+        over the same parse, in this attempt or a later one, names each chunk
+        the same way.
+        """
+        used_vector_ids = set()
+        chunk_index = 0
+        for chunks in read_chunks(parsed['chunks_path'], self.chunk_window_size):
+            window = []
+            for chunk_data in chunks:
+                vector_id = self._vector_id(document_id, self._chunk_content_hash(chunk_data['text']), used_vector_ids)
+                window.append((chunk_index, chunk_data, vector_id, self._chunk_id(vector_id)))
+                chunk_index += 1
+            yield window
+
+    async def _set_status(self, document_id: str, status: DocumentStatus):
+        await self.document_service.update_document(document_id, DocumentUpdate(status=status))
+
+    async def _ingest(self, document: DocumentResponse, parsed: Dict[str, Any]):
+        """Drive a new document from its current status to committed.
+
+        pending: vectors are embedded and upserted. embedded: chunk rows and
+        local indexes are written. indexed: total_chunks is recorded and the
+        document committed. Every step is an idempotent upsert, so a step that
+        failed part way is simply run again.
+        """
+        document_id = document.id
+        status = document.status
+        file_type = document.file_type
+
+        if status == DocumentStatus.PENDING:
+            # Embed and store a window at a time so memory does not grow with the document
+            for window in self._chunk_windows(document_id, parsed):
+                with timed(INGEST_STAGE_SECONDS, stage="embed", file_type=file_type):
+                    embeddings = await self._embed_texts(
+                        [chunk_data['text'] for _, chunk_data, _, _ in window],
+                        [chunk_data['token_count'] for _, chunk_data, _, _ in window]
+                    )
+                with timed(INGEST_STAGE_SECONDS, stage="vector_upsert", file_type=file_type):
+                    await self._upsert_vectors([
+                        self._build_vector(document_id, i, chunk_data, vector_id, chunk_id, embedding)
+                        for (i, chunk_data, vector_id, chunk_id), embedding in zip(window, embeddings)
+                    ])
+            status = DocumentStatus.EMBEDDED
+            await self._set_status(document_id, status)
+
+        if status == DocumentStatus.EMBEDDED:
+            for window in self._chunk_windows(document_id, parsed):
+                with timed(INGEST_STAGE_SECONDS, stage="chunk_store", file_type=file_type):
+                    await self._store_chunk_records([
+                        self._build_chunk_record(document_id, i, chunk_data, vector_id, chunk_id)
+                        for i, chunk_data, vector_id, chunk_id in window
+                    ])
+            status = DocumentStatus.INDEXED
+            await self._set_status(document_id, status)
+
+        await self.document_service.update_document(document_id, DocumentUpdate(
+            total_chunks=parsed['total_chunks'],
+            status=DocumentStatus.COMMITTED
+        ))
+
+    async def update_document(self, file_path: str):
+        """Re-ingest a modified document, embedding and storing only the chunks that changed"""
+        parsed = None
+        try:
+            existing_doc = await self.document_service.get_document_by_file_path(file_path)
+            if not existing_doc or existing_doc.status != DocumentStatus.COMMITTED:
+                return await self.process_document(file_path)
+
+            file_state = self._file_state(file_path)
+            await self._journal(file_path, file_state, IngestStatus.INGESTING, document_id=existing_doc.id)
+            parsed = await self._parse_document(file_path)
+            file_hash = parsed['file_hash']
+
+            if file_hash == existing_doc.file_hash:
+                logger.info(f"Document {existing_doc.filename} is unchanged, skipping.")
+                await self._journal(file_path, file_state, IngestStatus.DONE, file_hash)
+                self._count_document(file_path, "unchanged")
+                return
+
+            duplicate_doc = await self.document_service.get_document_by_hash(file_hash)
+            if duplicate_doc:
+                logger.warning(f"Content of {file_path} is identical to {duplicate_doc.file_path}, skipping.")
+                await self._journal(file_path, file_state, IngestStatus.DONE, file_hash)
+                self._count_document(file_path, "duplicate")
+                return
+
+            result = await self._apply_incremental_update(existing_doc, parsed)
+            await self._journal(file_path, file_state, IngestStatus.DONE, file_hash)
+            self._count_document(file_path, "updated")
+            return result
+        except Exception as e:
+            logger.error(f"Error in updating document and chunks {file_path}: {e}")
+            self._count_document(file_path, "failed")
+            await self._journal_failed(file_path)
+        finally:
+            self._discard_chunks(parsed)
+
+    async def resume_document(self, file_path: str):
+        """Finish an ingest that was interrupted, storing only the chunks that are still missing"""
+        parsed = None
+        try:
+            existing_doc = await self.document_service.get_document_by_file_path(file_path)
+            if not existing_doc or existing_doc.status != DocumentStatus.COMMITTED:
+                # process_document resumes or discards partial ingests by their status
+                return await self.process_document(file_path)
+
+            file_state = self._file_state(file_path)
+            await self._journal(file_path, file_state, IngestStatus.INGESTING, document_id=existing_doc.id)
+            parsed = await self._parse_document(file_path)
+            logger.info(f"Resuming ingest of {existing_doc.filename}")
+            # Chunks already stored match by content hash, so the diff only adds what is missing
+            result = await self._apply_incremental_update(existing_doc, parsed)
+            await self._journal(file_path, file_state, IngestStatus.DONE, parsed['file_hash'])
+            self._count_document(file_path, "resumed")
+            return result
+        except Exception as e:
+            logger.error(f"Error in resuming document {file_path}: {e}")
+            self._count_document(file_path, "failed")
+            await self._journal_failed(file_path)
+        finally:
+            self._discard_chunks(parsed)
+
+    def _discard_chunks(self, parsed: Optional[Dict[str, Any]]):
+        """Remove the chunk spill file written by parse_document"""
+        if parsed and os.path.exists(parsed['chunks_path']):
+            os.remove(parsed['chunks_path'])
+
+    async def _apply_incremental_update(self, existing_doc: DocumentResponse, parsed: Dict[str, Any]):
+        """Diff the new chunks against the stored ones by content hash and apply only the changes.
+
+        The document is marked updating until the new file_hash is written
+        together with committed, so an update that fails part way is never
+        mistaken for a finished one and is resumed by the next attempt.
+        """
+        document_id = existing_doc.id
+        filename = existing_doc.filename
+        file_type = parsed['file_type']
+
+        if existing_doc.status != DocumentStatus.UPDATING:
+            await self._set_status(document_id, DocumentStatus.UPDATING)
+
+        existing_chunks = await self.chunk_service.get_chunks_by_document_id(document_id)
+
+        existing_by_hash = defaultdict(list)
+        for chunk in existing_chunks:
+            existing_by_hash[self._chunk_content_hash(chunk.content)].append(chunk)
+
+        # Reserve every stored ID so a new vector can never reuse one that is about to be deleted
+        used_vector_ids = {chunk.vector_id for chunk in existing_chunks}
+        kept_count = added_count = 0
+        chunk_index = 0
+
+        for chunks in read_chunks(parsed['chunks_path'], self.chunk_window_size):
+            kept = []
+            added = []
+            for chunk_data in chunks:
+                content_hash = self._chunk_content_hash(chunk_data['text'])
+                if existing_by_hash.get(content_hash):
+                    kept.append((chunk_index, chunk_data, existing_by_hash[content_hash].pop(0)))
+                else:
+                    added.append((chunk_index, chunk_data, content_hash))
+                chunk_index += 1
+            kept_count += len(kept)
+            added_count += len(added)
+
+            # Add new chunks
+            with timed(INGEST_STAGE_SECONDS, stage="embed", file_type=file_type):
+                embeddings = await self._embed_texts(
+                    [chunk_data['text'] for _, chunk_data, _ in added],
+                    [chunk_data['token_count'] for _, chunk_data, _ in added]
+                )
+
+            vectors_to_upsert = []
+            chunk_records = []
+            for (i, chunk_data, content_hash), embedding in zip(added, embeddings):
+                vector_id = self._vector_id(document_id, content_hash, used_vector_ids)
+                chunk_id = self._chunk_id(vector_id)
+                vectors_to_upsert.append(self._build_vector(document_id, i, chunk_data, vector_id, chunk_id, embedding))
+                chunk_records.append(self._build_chunk_record(document_id, i, chunk_data, vector_id, chunk_id))
+
+            with timed(INGEST_STAGE_SECONDS, stage="vector_upsert", file_type=file_type):
+                await self._upsert_vectors(vectors_to_upsert)
+            with timed(INGEST_STAGE_SECONDS, stage="chunk_store", file_type=file_type):
+                await self._store_chunk_records(chunk_records)
+
+            # Unchanged content may still have moved within the document
+            moved = [
+                (i, chunk_data, chunk) for i, chunk_data, chunk in kept
+                if (chunk.chunk_index, chunk.start_char_index, chunk.end_char_index) !=
+                   (i, chunk_data['start_char'], chunk_data['end_char'])
+            ]
+            if moved:
+                await self._relocate_chunks(document_id, moved)
+
+        # Drop chunks that no longer exist
+        removed = [chunk for matches in existing_by_hash.values() for chunk in matches]
+        logger.info(f"Updating {filename}: {kept_count} chunks unchanged, "
+                    f"{added_count} added, {len(removed)} removed")
+        if removed:
+            await self._remove_vectors([chunk.vector_id for chunk in removed])
+            await self.chunk_service.delete_chunks_by_ids([chunk.id for chunk in removed])
+
+        await self.document_service.update_document(document_id, DocumentUpdate(
+            file_type=parsed['file_type'],
+            file_hash=parsed['file_hash'],
+            total_chunks=parsed['total_chunks'],
+            status=DocumentStatus.COMMITTED
+        ))
+        self._invalidate_document(document_id)
+
+        logger.info(f"Successfully updated {filename}: {added_count} chunks embedded, {len(removed)} removed.")
+
+    async def _relocate_chunks(self, document_id: str, moved: List[Tuple[int, Dict[str, Any], ChunkResponse]]):
+        """Store the new index and offsets of chunks whose content is unchanged but has moved"""
+        chunk_records = [
+            self._build_chunk_record(document_id, i, chunk_data, chunk.vector_id, chunk.id)
+            for i, chunk_data, chunk in moved
+        ]
+        # Whole rows upserted in bulk, rather than a read and an update per chunk
+        await self.chunk_service.create_chunks(
+            [ChunkCreate(**chunk) for chunk in chunk_records],
+            batch_size=settings.SUPABASE_INSERT_BATCH_SIZE
+        )
+        if self.chunk_store:
+            await run_blocking(self.chunk_store.put_many, chunk_records)
+
+        updates = [
+            (chunk.vector_id, self._vector_metadata(document_id, i, chunk_data, chunk.id))
+            for i, chunk_data, chunk in moved
+        ]
+        batch_size = 50
+        semaphore = asyncio.Semaphore(8)
+
+        async def update(batch: List[Tuple[str, Dict[str, Any]]]):
+            async with semaphore:
+                with timed(VECTOR_STORE_SECONDS, operation="update_metadata"):
+                    await run_blocking(self.vector_store.update_metadata_many, batch)
+
+        await asyncio.gather(*(update(updates[i:i + batch_size]) for i in range(0, len(updates), batch_size)))
+
+    async def _remove_document(self, document: DocumentResponse):
+        """Delete a document with its vectors and chunks"""
+        document_id = document.id
+        deleted_document_chunks = await self.chunk_service.get_chunks_by_document_id(document_id)
+
+        await self._remove_vectors([v.vector_id for v in deleted_document_chunks])
+        if document.status != DocumentStatus.COMMITTED:
+            # Vectors of a partial ingest may have no chunk rows yet; their IDs all start with the document ID
+            await run_blocking(self.vector_store.delete_prefix, f"{document_id}_")
+        await self.chunk_service.delete_chunks_by_document_id(document_id)
+        await self.document_service.delete_document(document_id)
+        self._invalidate_document(document_id)
 
     async def delete_document(self, file_path: str):
         """Delete a document"""
         try:
-            filename = os.path.basename(file_path)
-            deleted_doc = await self.document_service.get_document_by_filename(filename)
+            deleted_doc = await self.document_service.get_document_by_file_path(file_path)
             if not deleted_doc:
                 logger.info("File not found in DB")
+                if self.ingest_journal:
+                    await run_blocking(self.ingest_journal.remove, file_path)
                 return
-            document_id = deleted_doc.id
-            deleted_document_chunks = await self.chunk_service.get_chunks_by_document_id(document_id)
-
-            self.pinecone_index.delete([v.vector_id for v in deleted_document_chunks])
-            await self.chunk_service.delete_chunks_by_document_id(document_id)
-            await self.document_service.delete_document(document_id)
+            await self._remove_document(deleted_doc)
+            if self.ingest_journal:
+                await run_blocking(self.ingest_journal.remove, file_path)
             logger.info("Document and chunks deleted successfully.")
         except Exception as e:
-            logger.error(f"Error in deleting document and chunks {file_path}: {e}")
\ No newline at end of file
+            logger.error(f"Error in deleting document and chunks {file_path}: {e}")
+
+    async def rename_document(self, src_path: str, dest_path: str):
+        """Point a document at its new path after a move, without re-reading or re-embedding it"""
+        try:
+            document = await self.document_service.get_document_by_file_path(src_path)
+            if not document:
+                return await self.process_document(dest_path)
+
+            # A move onto an existing file replaces it
+            replaced = await self.document_service.get_document_by_file_path(dest_path)
+            if replaced and replaced.id != document.id:
+                await self._remove_document(replaced)
+
+            # Search reads document names and paths from the documents table, never from vector metadata
+            await self.document_service.update_document(document.id, DocumentUpdate(
+                filename=os.path.basename(dest_path),
+                file_path=dest_path
+            ))
+            self._invalidate_document(document.id)
+            if self.ingest_journal:
+                await run_blocking(self.ingest_journal.rename, src_path, dest_path)
+            logger.info(f"Renamed {src_path} to {dest_path}")
+        except Exception as e:
+            logger.error(f"Error in renaming document {src_path} to {dest_path}: {e}")
\ No newline at end of file
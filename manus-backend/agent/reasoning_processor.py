@@ -1,13 +1,19 @@
+import asyncio
 import logging
-from typing import Dict, Any
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from openai import OpenAI
 
 from agent.analysing_processor import AnalysingProcessor
+from agent.context_builder import ContextBuilder, context_tokenizer
 from agent.settings import settings
-from core.database import get_supabase_client
+from core.clients import ClientRegistry, get_clients
+from core.concurrency import run_blocking
 from core.enums import MessageRole, MessageTask, MessageStatus
+from core.metrics import (
+    LLM_COMPLETION_SECONDS, LLM_COMPLETION_TOKENS, LLM_FIRST_TOKEN_SECONDS, LLM_PROMPT_TOKENS, RAG_STAGE_SECONDS, timed
+)
+from core.reranker import RerankTimeout
 from schemas.message import MessageCreate, MessageResponse
 from services.chunk import ChunkService
 from services.message import MessageService
@@ -16,45 +22,102 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information in the uploaded documents."
+
 class ReasoningProcessor:
-    def __init__(self):
-        self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        self.index_name = settings.PINECONE_INDEX_NAME
-        self.embedding_model = settings.EMBEDDING_MODEL
-        self.embedding_dimensions = settings.EMBEDDING_DIMENSIONS
-        self.pinecone_index = self.pc.Index(self.index_name)
+    def __init__(self, clients: Optional[ClientRegistry] = None):
+        self.clients = clients or get_clients()
+        self.openai_client = self.clients.openai
+
         self.top_k = 10
         self.openai_model = settings.OPENAI_MODEL
 
-        self.chunk_service = ChunkService(get_supabase_client())
-        self.analysing_processor = AnalysingProcessor()
-        self.message_service = MessageService(get_supabase_client())
+        self.chunk_service = ChunkService(self.clients.supabase)
+        self.analysing_processor = AnalysingProcessor(self.clients)
+        self.message_service = MessageService(self.clients.supabase)
+        self.answer_cache = self.clients.answer_cache
+        self.context_builder = ContextBuilder(settings.CONTEXT_MAX_TOKENS, context_tokenizer(self.openai_model))
+        self.reranker = self.clients.reranker
+        self.rerank_candidates = settings.RERANK_CANDIDATES
+        self.rerank_latency_budget = settings.RERANK_LATENCY_BUDGET_MS / 1000
 
-    async def answer_question(self, message: MessageResponse) -> Dict[str, Any]:
-        """Answer a question using RAG"""
-        question = message.content
+    async def _cached_answer(self, question: str) -> Optional[Dict[str, Any]]:
+        """Look the question up in the answer cache, by exact wording first and then by embedding"""
+        if not self.answer_cache:
+            return None
+        with timed(RAG_STAGE_SECONDS, stage="answer_cache"):
+            cached = self.answer_cache.get(question)
+            if cached is None and self.answer_cache.similarity_threshold:
+                embedding = await self.analysing_processor.embed_query(question)
+                cached = self.answer_cache.get_similar(embedding)
+        if cached is not None:
+            logger.info(f"Answer cache hit for: {question}")
+        return cached
+
+    async def _cache_answer(self, question: str, answer: str, sources: List[Dict[str, Any]],
+                            relevant_chunks: List[Dict[str, Any]], generation: int):
+        if not self.answer_cache:
+            return
+        embedding = None
+        if self.answer_cache.similarity_threshold:
+            # Served from the embedding cache, the lookup already embedded this question
+            embedding = await self.analysing_processor.embed_query(question)
+        self.answer_cache.put(
+            question,
+            {'answer': answer, 'sources': sources, 'total_sources_found': len(relevant_chunks)},
+            {chunk['document_id'] for chunk in relevant_chunks},
+            generation,
+            embedding
+        )
+
+    async def _retrieve(self, question: str) -> List[Dict[str, Any]]:
         logger.info(f"Searching for relevant information for: {question}")
+        with timed(RAG_STAGE_SECONDS, stage="search"):
+            candidates = await self.analysing_processor.search_similar_chunks(
+                question, self.rerank_candidates if self.reranker else self.top_k
+            )
+        if not self.reranker:
+            return candidates
 
-        # Search for relevant chunks
-        relevant_chunks = await self.analysing_processor.search_similar_chunks(question, self.top_k)
+        with timed(RAG_STAGE_SECONDS, stage="rerank"):
+            return await self._rerank(question, candidates)
 
-        if not relevant_chunks:
-            return {
-                'answer': "I couldn't find any relevant information in the uploaded documents.",
-                'sources': [],
-                'question': question
-            }
+    async def _rerank(self, question: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep the top_k candidates by rerank score, or in retrieval order if scoring overruns its budget"""
+        if len(candidates) <= 1:
+            return candidates
 
-        # Prepare context for the LLM
-        context_parts = []
-        sources = []
+        start = time.perf_counter()
+        try:
+            scores = await asyncio.wait_for(
+                run_blocking(self.reranker.score, question, candidates, time.monotonic() + self.rerank_latency_budget),
+                timeout=self.rerank_latency_budget
+            )
+        except (asyncio.TimeoutError, RerankTimeout):
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.reranker.record(len(candidates), elapsed_ms, fell_back=True)
+            logger.warning(f"Reranking {len(candidates)} candidates overran its budget after {elapsed_ms:.0f} ms, "
+                           f"keeping retrieval order")
+            return candidates[:self.top_k]
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.reranker.record(len(candidates), elapsed_ms, fell_back=False)
+        logger.info(f"Reranked {len(candidates)} candidates in {elapsed_ms:.1f} ms")
 
-        for i, chunk in enumerate(relevant_chunks):
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)[:self.top_k]
+        return [{**candidates[i], 'rerank_score': scores[i]} for i in order]
+
+    def _build_context(self, relevant_chunks: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Prepare the LLM context and the source descriptions for the chunks that fit in it"""
+        with timed(RAG_STAGE_SECONDS, stage="context_build"):
+            context, included, stats = self.context_builder.build(relevant_chunks)
+        logger.info(f"Context of {stats['context_tokens']} tokens from {stats['chunks']} chunks in "
+                    f"{stats['passages']} passages, {stats['tokens_saved']} tokens saved "
+                    f"({stats['tokens_deduplicated']} by merging overlaps), {stats['chunks_dropped']} chunks over budget")
+
+        sources = []
+        for chunk in included:
             char_range = f"characters {chunk['start_char_index']}-{chunk['end_char_index']}"
-            context_parts.append(
-                f"Document: {chunk['document_name']}\nContent: {chunk['content']}\n")
             source = {
                 'document_name': chunk['document_name'],
                 'document_type': chunk['document_type'],
@@ -70,18 +133,23 @@ class ReasoningProcessor:
             }
             sources.append(source)
 
-            new_message = MessageCreate(
+        return context, sources
+
+    async def _record_sources(self, message: MessageResponse, sources: List[Dict[str, Any]]):
+        """Persist one analysis message per source so the chat can show where the answer came from"""
+        await self.message_service.create_messages([
+            MessageCreate(
                 chat_id=message.chat_id,
-                chunk_id=chunk['chunk_id'],
+                chunk_id=source['chunk_id'],
                 role=MessageRole.ASSISTANT,
                 content=str(source),
                 task=MessageTask.ANALYSE,
                 status=MessageStatus.COMPLETED
             )
-            await self.message_service.create_message(new_message)
-
-        context = "\n---\n".join(context_parts)
+            for source in sources
+        ], batch_size=settings.SUPABASE_INSERT_BATCH_SIZE)
 
+    def _build_prompt_messages(self, context: str, question: str) -> List[Dict[str, str]]:
         # Create prompt for the LLM
         prompt = f"""You are provided with legal context extracted from one or more uploaded documents. 
         Your task is to answer the following question clearly and precisely, using only the information found in the context.
@@ -102,22 +170,101 @@ class ReasoningProcessor:
         Please provide a comprehensive answer based on the context above. In the end mention which document it comes from, 
         along with the law or law number or acts if present from the original document."""
 
+        return [
+            {"role": "system",
+             "content": "You are a helpful Law assistant that answers questions based on provided law document context. Always cite your sources by mentioning the document name when referencing information."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _record_usage(self, usage: Any):
+        if usage:
+            LLM_PROMPT_TOKENS.labels(model=self.openai_model).inc(usage.prompt_tokens)
+            LLM_COMPLETION_TOKENS.labels(model=self.openai_model).inc(usage.completion_tokens)
+
+    async def answer_question(self, message: MessageResponse) -> Dict[str, Any]:
+        """Answer a question using RAG"""
+        question = message.content
+
+        cached = await self._cached_answer(question)
+        if cached:
+            await self._record_sources(message, cached['sources'])
+            return {**cached, 'question': question}
+
+        generation = self.answer_cache.generation if self.answer_cache else 0
+
+        # Search for relevant chunks
+        relevant_chunks = await self._retrieve(question)
+
+        if not relevant_chunks:
+            return {
+                'answer': NO_CONTEXT_ANSWER,
+                'sources': [],
+                'question': question
+            }
+
+        context, sources = self._build_context(relevant_chunks)
+        await self._record_sources(message, sources)
+
         # Get answer from OpenAI
-        response = self.openai_client.chat.completions.create(
-            model=self.openai_model,
-            messages=[
-                {"role": "system",
-                 "content": "You are a helpful Law assistant that answers questions based on provided law document context. Always cite your sources by mentioning the document name when referencing information."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
+        with timed(LLM_COMPLETION_SECONDS, model=self.openai_model, mode="complete"):
+            response = await self.openai_client.chat.completions.create(
+                model=self.openai_model,
+                messages=self._build_prompt_messages(context, question),
+                temperature=0.3
+            )
+        self._record_usage(getattr(response, 'usage', None))
 
         answer = response.choices[0].message.content
+        await self._cache_answer(question, answer, sources, relevant_chunks, generation)
 
         return {
             'answer': answer,
             'sources': sources,
             'question': question,
             'total_sources_found': len(relevant_chunks)
-        }
\ No newline at end of file
+        }
+
+    async def stream_answer(self, message: MessageResponse) -> AsyncIterator[Tuple[str, Any]]:
+        """Answer a question using RAG, yielding the sources first and then the answer token by token"""
+        question = message.content
+
+        cached = await self._cached_answer(question)
+        if cached:
+            yield 'sources', cached['sources']
+            await self._record_sources(message, cached['sources'])
+            yield 'token', cached['answer']
+            return
+
+        generation = self.answer_cache.generation if self.answer_cache else 0
+
+        relevant_chunks = await self._retrieve(question)
+
+        if not relevant_chunks:
+            yield 'sources', []
+            yield 'token', NO_CONTEXT_ANSWER
+            return
+
+        context, sources = self._build_context(relevant_chunks)
+        yield 'sources', sources
+        await self._record_sources(message, sources)
+
+        start = time.perf_counter()
+        stream = await self.openai_client.chat.completions.create(
+            model=self.openai_model,
+            messages=self._build_prompt_messages(context, question),
+            temperature=0.3,
+            stream=True,
+            # The last chunk then carries the token usage, with no choices
+            stream_options={"include_usage": True}
+        )
+        tokens = []
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not tokens:
+                    LLM_FIRST_TOKEN_SECONDS.labels(model=self.openai_model).observe(time.perf_counter() - start)
+                tokens.append(chunk.choices[0].delta.content)
+                yield 'token', chunk.choices[0].delta.content
+            self._record_usage(getattr(chunk, 'usage', None))
+        LLM_COMPLETION_SECONDS.labels(model=self.openai_model, mode="stream").observe(time.perf_counter() - start)
+
+        await self._cache_answer(question, "".join(tokens), sources, relevant_chunks, generation)
@@ -11,8 +11,56 @@ class Settings:
     OVERLAPPING_TOKEN = int(os.getenv("OVERLAPPING_TOKEN"))
     EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
     EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS"))
+    EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", 100000))
+    EMBEDDING_BATCH_MAX_INPUTS = int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", 256))
+    EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4))
+    EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", 6))
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 500000))
+    QUERY_EMBEDDING_MAX_WAIT_MS = float(os.getenv("QUERY_EMBEDDING_MAX_WAIT_MS", 5))
+    QUERY_EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("QUERY_EMBEDDING_MAX_BATCH_SIZE", 64))
+    QUERY_EMBEDDING_MAX_RETRIES = int(os.getenv("QUERY_EMBEDDING_MAX_RETRIES", 3))
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2 * (os.cpu_count() or 1)))
+    INGEST_PROCESS_WORKERS = int(os.getenv("INGEST_PROCESS_WORKERS", os.cpu_count() or 1))
+    INGEST_CHUNK_WINDOW_SIZE = int(os.getenv("INGEST_CHUNK_WINDOW_SIZE", 1000))
+    INGEST_DEBOUNCE_SECONDS = float(os.getenv("INGEST_DEBOUNCE_SECONDS", 2))
+    INGEST_JOURNAL_ENABLED = os.getenv("INGEST_JOURNAL_ENABLED", "true").lower() == "true"
+    INGEST_JOURNAL_PATH = os.getenv("INGEST_JOURNAL_PATH", ".cache/ingest_journal.sqlite3")
+    BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", 32))
+    OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 100))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+    PINECONE_POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", 16))
+    SUPABASE_INSERT_BATCH_SIZE = int(os.getenv("SUPABASE_INSERT_BATCH_SIZE", 500))
+    CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", 4))
+    CHAT_QUEUE_MAX_SIZE = int(os.getenv("CHAT_QUEUE_MAX_SIZE", 100))
+    CHAT_DRAIN_TIMEOUT = float(os.getenv("CHAT_DRAIN_TIMEOUT", 30))
+    CHAT_CLAIM_LEASE_SECONDS = int(os.getenv("CHAT_CLAIM_LEASE_SECONDS", 600))
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 3600))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", 0))
+    CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 6000))
+    RERANK_BACKEND = os.getenv("RERANK_BACKEND", "none").lower()
+    RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 50))
+    RERANK_LATENCY_BUDGET_MS = float(os.getenv("RERANK_LATENCY_BUDGET_MS", 300))
+    RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", 16))
+    HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+    BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", ".cache/bm25.npz")
+    BM25_SAVE_INTERVAL = float(os.getenv("BM25_SAVE_INTERVAL", 30))
+    HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", 60))
+    HYBRID_LEXICAL_SKIP_MARGIN = float(os.getenv("HYBRID_LEXICAL_SKIP_MARGIN", 5))
+    HYBRID_LEXICAL_SKIP_MIN_COVERAGE = float(os.getenv("HYBRID_LEXICAL_SKIP_MIN_COVERAGE", 0.5))
+    CHUNK_CONTENT_SOURCE = os.getenv("CHUNK_CONTENT_SOURCE", "supabase").lower()
+    LOCAL_CHUNK_STORE_PATH = os.getenv("LOCAL_CHUNK_STORE_PATH", ".cache/chunks.sqlite3")
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone").lower()
+    LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", ".cache/vector_store")
+    LOCAL_VECTOR_STORE_IVF_LISTS = int(os.getenv("LOCAL_VECTOR_STORE_IVF_LISTS", 0))
+    LOCAL_VECTOR_STORE_IVF_PROBES = int(os.getenv("LOCAL_VECTOR_STORE_IVF_PROBES", 8))
     PINECONE_CLOUD = os.getenv("PINECONE_CLOUD")
     PINECONE_REGION = os.getenv("PINECONE_REGION")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL")
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
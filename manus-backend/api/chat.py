@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List, Optional
 from core.database import get_chat_service
+from core.pagination import NEXT_CURSOR_HEADER, next_cursor
 from schemas.chat import ChatCreate, ChatUpdate, ChatResponse
 from services.chat import ChatService
 
@@ -22,16 +23,28 @@ async def create_chat(
 
 @router.get("/", response_model=List[ChatResponse])
 async def get_chats(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     service: ChatService = Depends(get_chat_service)
 ):
-    """Get all chats with pagination."""
+    """Get all chats with pagination, newest first.
+
+    The X-Next-Cursor header, absent on the last page, is the `cursor` for the next page.
+    """
     try:
-        return await service.get_chats(skip=skip, limit=limit)
+        chats = await service.get_chats(skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch chats: {str(e)}")
 
+    cursor = next_cursor(chats, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return chats
+
 @router.get("/{chat_id}", response_model=ChatResponse)
 async def get_chat(
     chat_id: str,
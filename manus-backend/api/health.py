@@ -1,5 +1,6 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from supabase import Client
+from core.concurrency import run_blocking
 from core.database import get_supabase_client
 
 router = APIRouter()
@@ -12,7 +13,17 @@ async def root():
 async def health_check(db: Client = Depends(get_supabase_client)):
     try:
         # Test database connection
-        db.table("chat").select("count", count="exact").execute()
+        await run_blocking(db.table("chat").select("count", count="exact").execute)
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
-        raise HTTPException(status_code=503, detail="Database connection failed")
\ No newline at end of file
+        raise HTTPException(status_code=503, detail="Database connection failed")
+
+@router.get("/health/clients")
+async def client_pools(request: Request):
+    """Connection pool sizes and usage of the shared API clients."""
+    return request.app.state.clients.stats()
+
+@router.get("/health/jobs")
+async def chat_jobs(request: Request):
+    """Workers, capacity and load of the chat job queue."""
+    return request.app.state.chat_jobs.stats()
@@ -1,53 +1,169 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+import json
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import Any, AsyncIterator, List, Optional
 from agent.chat_processor import ChatProcessor
 from core.database import get_message_service
+from core.enums import MessageRole, MessageStatus, MessageTask
+from core.job_queue import ChatJobQueue, QueueFullError
+from core.pagination import NEXT_CURSOR_HEADER, next_cursor
+from schemas.job import JobResponse
 from schemas.message import MessageCreate, MessageUpdate, MessageResponse
 from services.message import MessageService
 
 router = APIRouter()
 
+def get_chat_processor(request: Request) -> ChatProcessor:
+    return request.app.state.chat_processor
+
+def get_chat_jobs(request: Request) -> ChatJobQueue:
+    return request.app.state.chat_jobs
+
 @router.post("/", response_model=MessageResponse)
 async def create_message(
     message: MessageCreate,
-    service: MessageService = Depends(get_message_service)
+    response: Response,
+    service: MessageService = Depends(get_message_service),
+    jobs: ChatJobQueue = Depends(get_chat_jobs)
 ):
-    """Create a new message."""
+    """Create a new message and queue pending user messages for answering.
+
+    The ID of the answering job is returned in the X-Job-Id header.
+    """
+    needs_answer = message.role == MessageRole.USER and message.status == MessageStatus.PENDING
+    if needs_answer and jobs.is_full():
+        raise HTTPException(status_code=429, detail="Too many pending requests, please retry later")
+
     try:
         result =  await service.create_message(message)
-        processor = ChatProcessor()
-        processor.process_chat(chat_id=result.chat_id)
-        return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+    if needs_answer:
+        try:
+            job = jobs.submit(result.chat_id)
+        except QueueFullError as e:
+            await service.update_message(result.id, MessageUpdate(status=MessageStatus.FAILED))
+            raise HTTPException(status_code=429, detail=str(e))
+        response.headers["X-Job-Id"] = job.id
+
+    return result
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    jobs: ChatJobQueue = Depends(get_chat_jobs)
+):
+    """Get the status of a chat processing job."""
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def _sse_event(event: str, data: Any) -> str:
+    if isinstance(data, BaseModel):
+        data = data.model_dump(mode="json")
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/stream")
+async def stream_message(
+    message: MessageCreate,
+    service: MessageService = Depends(get_message_service),
+    processor: ChatProcessor = Depends(get_chat_processor)
+):
+    """Create a message and stream the answer as server-sent events.
+
+    Events: `message` (the stored user message), `sources`, `token` (one per LLM delta),
+    then `done` with the stored assistant message, or `error`.
+    """
+    try:
+        # Claimed up front so the background processor never answers it as well
+        result = await service.create_message(message.model_copy(update={"status": MessageStatus.IN_PROGRESS}))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    async def event_stream() -> AsyncIterator[str]:
+        yield _sse_event("message", result)
+        async for event, data in processor.stream_message(result):
+            yield _sse_event(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/", response_model=List[MessageResponse])
 async def get_messages(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     service: MessageService = Depends(get_message_service)
 ):
-    """Get all messages with pagination."""
+    """Get all messages with pagination, newest first.
+
+    The X-Next-Cursor header, absent on the last page, is the `cursor` for the next page.
+    """
     try:
-        return await service.get_messages(skip=skip, limit=limit)
+        messages = await service.get_messages(skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch messages: {str(e)}")
 
+    cursor = next_cursor(messages, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return messages
+
 @router.get("/chat/{chat_id}", response_model=List[MessageResponse])
 async def get_messages_by_chat_id(
     chat_id: str,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    task: Optional[List[MessageTask]] = Query(None),
+    role: Optional[List[MessageRole]] = Query(None),
+    fields: Optional[List[str]] = Query(None),
     service: MessageService = Depends(get_message_service)
 ):
-    """Get all messages by chat id with pagination."""
+    """Get the messages of a chat with pagination, oldest first.
+
+    The X-Next-Cursor header, absent on the last page, is the `cursor` for the next page;
+    unlike `skip`, it costs the same however deep the page. `task` and `role` can be repeated
+    to keep only those messages, e.g. `task=chat&task=summarize` leaves out the analysis sources.
+    `fields` limits each message to those fields, plus id and created_at.
+    """
     try:
-        return await service.get_messages_by_chat_id(chat_id, skip=skip, limit=limit)
+        if fields:
+            messages = await service.get_message_fields_by_chat_id(
+                chat_id, fields, skip=skip, limit=limit, cursor=cursor, tasks=task, roles=role
+            )
+        else:
+            messages = await service.get_messages_by_chat_id(
+                chat_id, skip=skip, limit=limit, cursor=cursor, tasks=task, roles=role
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch messages: {str(e)}")
 
+    cursor = next_cursor(messages, limit)
+    if fields:
+        # Partial messages would not validate as MessageResponse, so they skip the response model
+        return JSONResponse(jsonable_encoder(messages), headers={NEXT_CURSOR_HEADER: cursor} if cursor else None)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return messages
+
 
 @router.get("/{message_id}", response_model=MessageResponse)
 async def get_message(
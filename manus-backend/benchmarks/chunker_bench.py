@@ -0,0 +1,92 @@
+"""Throughput and offset accuracy of the document chunker.
+
+Generates synthetic documents of increasing size (headings, short lines, long
+paragraphs and deliberately repeated text), chunks each one, and checks that
+every chunk is exactly text[start_char:end_char]. Time per MB should stay flat
+as the input grows if chunking is linear.
+
+    python -m benchmarks.chunker_bench --sizes-mb 1 2 5 10
+"""
+import argparse
+import json
+import random
+import time
+from typing import List
+
+from agent.document_parser import chunk_text
+
+WORDS = (
+    "agreement party shall notice period termination clause confidential information "
+    "obligations effective date payment schedule liability indemnity warranty governing "
+    "law jurisdiction amendment assignment schedule annex revenue forecast quarter"
+).split()
+
+
+def synthetic_document(size_bytes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    # A small pool of paragraphs reused throughout, so identical text appears at many offsets
+    repeated = [" ".join(rng.choices(WORDS, k=rng.randint(40, 120))) + "." for _ in range(20)]
+    parts: List[str] = []
+    size = 0
+    while size < size_bytes:
+        kind = rng.random()
+        if kind < 0.15:
+            part = f"Section {rng.randint(1, 99)}.{rng.randint(1, 9)} {rng.choice(WORDS).title()}"
+        elif kind < 0.35:
+            part = " ".join(rng.choices(WORDS, k=rng.randint(3, 12)))
+        elif kind < 0.6:
+            part = rng.choice(repeated)
+        elif kind < 0.95:
+            part = " ".join(rng.choices(WORDS, k=rng.randint(60, 250))) + "."
+        else:
+            # Occasional paragraph longer than a chunk
+            part = " ".join(rng.choices(WORDS, k=rng.randint(800, 2000))) + "."
+        parts.append(part)
+        parts.append("\n\n" if rng.random() < 0.3 else "\n")
+        size += len(part) + 1
+    return "".join(parts)
+
+
+def run(sizes_mb: List[float], max_tokens: int, overlap_tokens: int) -> dict:
+    results = []
+    for size_mb in sizes_mb:
+        text = synthetic_document(int(size_mb * 1024 * 1024))
+
+        start = time.perf_counter()
+        chunks = chunk_text(text, max_tokens, overlap_tokens)
+        elapsed = time.perf_counter() - start
+
+        mismatched = sum(1 for chunk in chunks if text[chunk['start_char']:chunk['end_char']] != chunk['text'])
+        out_of_order = sum(1 for a, b in zip(chunks, chunks[1:]) if b['start_char'] < a['start_char'])
+        results.append({
+            "size_mb": size_mb,
+            "chunks": len(chunks),
+            "seconds": round(elapsed, 3),
+            "seconds_per_mb": round(elapsed / size_mb, 3),
+            "max_chunk_tokens": max(chunk['token_count'] for chunk in chunks),
+            "offset_mismatches": mismatched,
+            "out_of_order": out_of_order
+        })
+
+    per_mb = [result["seconds_per_mb"] for result in results]
+    return {
+        "max_tokens": max_tokens,
+        "overlap_tokens": overlap_tokens,
+        "runs": results,
+        # ~1.0 means linear scaling between the smallest and largest input
+        "scaling_ratio": round(per_mb[-1] / per_mb[0], 2) if per_mb and per_mb[0] else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and offset accuracy of the document chunker")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--overlap-tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.sizes_mb, args.max_tokens, args.overlap_tokens), indent=2))
+
+
+if __name__ == "__main__":
+    main()
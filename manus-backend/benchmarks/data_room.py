@@ -0,0 +1,125 @@
+"""Synthetic data rooms of PDF, DOCX and TXT files.
+
+Text comes from chunker_bench.synthetic_document, so the documents have the
+same headings, short lines, long paragraphs and repeated passages. PDFs are
+written directly as uncompressed single-font pages, which PyPDF2 extracts
+line by line; DOCX files are written with python-docx.
+
+    python -m benchmarks.data_room --output "../Data Room (benchmark)" --files 30 --size-kb 200
+"""
+import argparse
+import json
+import os
+import random
+import textwrap
+from typing import List, Sequence
+
+from docx import Document
+
+from benchmarks.chunker_bench import WORDS, synthetic_document
+
+FILE_TYPES = ("txt", "docx", "pdf")
+
+_PDF_LINES_PER_PAGE = 60
+_PDF_LINE_WIDTH = 95
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, text: str):
+    lines = [wrapped for line in text.split("\n") for wrapped in (textwrap.wrap(line, _PDF_LINE_WIDTH) or [""])]
+    pages = [lines[i:i + _PDF_LINES_PER_PAGE] for i in range(0, len(lines), _PDF_LINES_PER_PAGE)] or [[]]
+
+    # Objects 1-3 are the catalog, the page tree and the font; each page then takes a page and a content object
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in pages:
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td\n" + "".join(f"({_pdf_escape(line)}) Tj T*\n" for line in page) + "ET"
+        data = stream.encode("latin-1", errors="replace")
+        page_id = len(objects) + 1
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (page_id + 1)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(data), data))
+        page_ids.append(page_id)
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as file:
+        file.write(out)
+
+
+def write_docx(path: str, text: str):
+    document = Document()
+    for paragraph in text.split("\n"):
+        if paragraph:
+            document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def write_txt(path: str, text: str):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text)
+
+
+_WRITERS = {"txt": write_txt, "docx": write_docx, "pdf": write_pdf}
+
+
+def write_document(path: str, size_bytes: int, seed: int):
+    """Write a synthetic document of about size_bytes of text, typed by the path's extension"""
+    file_type = os.path.splitext(path)[1].lstrip(".").lower()
+    _WRITERS[file_type](path, synthetic_document(size_bytes, seed))
+
+
+def generate_data_room(directory: str, files: int, size_bytes: int,
+                       file_types: Sequence[str] = FILE_TYPES, seed: int = 0) -> List[str]:
+    """Write files documents cycling through file_types and return their paths"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(files):
+        file_type = file_types[i % len(file_types)]
+        path = os.path.join(directory, f"document_{i:04d}.{file_type}")
+        write_document(path, size_bytes, seed + i)
+        paths.append(path)
+    return paths
+
+
+def edit_document(path: str, size_bytes: int, seed: int, edit_fraction: float = 0.1):
+    """Rewrite a generated document with a few paragraphs replaced, as an incremental edit would"""
+    rng = random.Random(seed)
+    file_type = os.path.splitext(path)[1].lstrip(".").lower()
+    paragraphs = synthetic_document(size_bytes, seed).split("\n")
+    for i in rng.sample(range(len(paragraphs)), max(1, int(len(paragraphs) * edit_fraction))):
+        paragraphs[i] = " ".join(rng.choices(WORDS, k=rng.randint(20, 80))) + " (revised)."
+    _WRITERS[file_type](path, "\n".join(paragraphs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic data room")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--size-kb", type=float, default=200)
+    parser.add_argument("--file-types", nargs="+", choices=FILE_TYPES, default=list(FILE_TYPES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_data_room(args.output, args.files, int(args.size_kb * 1024), args.file_types, args.seed)
+    print(json.dumps({"directory": args.output, "files": len(paths),
+                      "bytes": sum(os.path.getsize(path) for path in paths)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
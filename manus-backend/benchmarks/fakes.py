@@ -0,0 +1,524 @@
+"""In-process stand-ins for OpenAI, Pinecone and Supabase.
+
+They plug into ClientRegistry in place of the real clients so the ingest and
+question-answering code runs unchanged, without network access or API costs:
+
+- FakeOpenAIServer answers the OpenAI HTTP API through an httpx mock
+  transport, so requests still go through AsyncOpenAI, including response
+  parsing and 429 handling. Embeddings are deterministic feature-hashed bag of
+  words vectors, so chunks that share words with a question are retrieved for
+  it. Latency and a requests-per-second rate limit are configurable.
+- FakePinecone provides the slice of the Pinecone client PineconeVectorStore
+  uses, over an in-memory NumPy index.
+- FakeSupabase provides the slice of the supabase-py query builder the
+  services use, over in-memory tables, including embedded resources such as
+  documents(filename) on chunks, and the script.sql functions they call
+  through rpc.
+
+Latencies are sleeps: asyncio.sleep for OpenAI, time.sleep for Pinecone and
+Supabase, whose SDKs are blocking and run on the I/O thread pool.
+"""
+import asyncio
+import base64
+import copy
+import json
+import re
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+
+_WORD = re.compile(r"\w+")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token"""
+    return max(1, len(text) // 4)
+
+
+def hashed_embedding(text: str, dimensions: int) -> np.ndarray:
+    """Unit vector of hashed word counts; texts sharing words point the same way"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in _WORD.findall(text.lower()):
+        bucket = zlib.crc32(word.encode())
+        vector[bucket % dimensions] += 1.0 if bucket & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[zlib.crc32(text.encode()) % dimensions] = 1.0
+        return vector
+    return vector / norm
+
+
+class _RateLimiter:
+    """Token bucket allowing requests_per_second on average, in bursts of up to burst"""
+
+    def __init__(self, requests_per_second: float, burst: int):
+        self.rate = requests_per_second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def acquire(self) -> float:
+        """0 when the request may proceed, otherwise seconds until it could"""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FakeOpenAIServer:
+    """Embeddings and chat completions endpoints answered in process"""
+
+    def __init__(self, latency_ms: float = 50.0, latency_per_input_ms: float = 0.2,
+                 token_latency_ms: float = 5.0, requests_per_second: float = 0.0, burst: int = 10,
+                 answer_words: int = 120):
+        self.latency = latency_ms / 1000
+        self.latency_per_input = latency_per_input_ms / 1000
+        self.token_latency = token_latency_ms / 1000
+        self.limiter = _RateLimiter(requests_per_second, burst)
+        self.answer = " ".join(["According", "to", "the", "provided", "documents,"] +
+                               ["the", "clause", "applies"] * (answer_words // 3))
+        self.embedding_requests = 0
+        self.embedding_inputs = 0
+        self.completion_requests = 0
+        self.rate_limited = 0
+
+    def client(self) -> AsyncOpenAI:
+        # The application retries embeddings itself; SDK retries would hide the 429s from it
+        return AsyncOpenAI(
+            api_key="benchmark",
+            base_url="http://openai.benchmark/v1",
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        )
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        retry_after = self.limiter.acquire()
+        if retry_after:
+            self.rate_limited += 1
+            return httpx.Response(
+                429,
+                headers={"retry-after": f"{retry_after:.3f}"},
+                json={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+            )
+
+        body = json.loads(request.content)
+        if request.url.path.endswith("/embeddings"):
+            return await self._embeddings(body)
+        if request.url.path.endswith("/chat/completions"):
+            return await self._completions(body)
+        return httpx.Response(404, json={"error": {"message": f"Unknown endpoint {request.url.path}"}})
+
+    async def _embeddings(self, body: Dict[str, Any]) -> httpx.Response:
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dimensions = body.get("dimensions") or 1536
+        self.embedding_requests += 1
+        self.embedding_inputs += len(inputs)
+        await asyncio.sleep(self.latency + self.latency_per_input * len(inputs))
+
+        data = []
+        for i, text in enumerate(inputs):
+            vector = hashed_embedding(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode()
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        tokens = sum(estimate_tokens(text) for text in inputs)
+        return httpx.Response(200, json={
+            "object": "list",
+            "data": data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        })
+
+    async def _completions(self, body: Dict[str, Any]) -> httpx.Response:
+        self.completion_requests += 1
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in body["messages"])
+        words = self.answer.split(" ")
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words)}
+        base = {"id": "chatcmpl-benchmark", "created": int(time.time()), "model": body["model"]}
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.latency + self.token_latency * len(words))
+            return httpx.Response(200, json={
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.answer},
+                             "finish_reason": "stop"}],
+                "usage": usage
+            })
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        async def events():
+            await asyncio.sleep(self.latency)
+            for i, word in enumerate(words):
+                await asyncio.sleep(self.token_latency)
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [
+                    {"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}
+                ]}
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+            if include_usage:
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=events())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "embedding_requests": self.embedding_requests,
+            "embedding_inputs": self.embedding_inputs,
+            "completion_requests": self.completion_requests,
+            "rate_limited": self.rate_limited
+        }
+
+
+class FakePineconeIndex:
+    """In-memory index answering exact cosine queries"""
+
+    def __init__(self, dimensions: int, latency_ms: float):
+        self.dimensions = dimensions
+        self.latency = latency_ms / 1000
+        self.vectors: Dict[str, Tuple[np.ndarray, Dict[str, Any]]] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        self._wait()
+        with self._lock:
+            for vector in vectors:
+                values = np.asarray(vector['values'], dtype=np.float32)
+                self.vectors[vector['id']] = (values / (np.linalg.norm(values) or 1.0), vector.get('metadata') or {})
+            self._matrix = None
+
+    def query(self, vector: List[float], top_k: int, include_metadata: bool = False) -> Dict[str, Any]:
+        self._wait()
+        with self._lock:
+            if self._matrix is None:
+                self._ids = list(self.vectors)
+                self._matrix = (np.stack([self.vectors[i][0] for i in self._ids])
+                                if self._ids else np.zeros((0, self.dimensions), dtype=np.float32))
+            if not self._ids:
+                return {'matches': []}
+            query = np.asarray(vector, dtype=np.float32)
+            scores = self._matrix @ (query / (np.linalg.norm(query) or 1.0))
+            top = np.argsort(-scores)[:top_k]
+            return {'matches': [
+                {'id': self._ids[i], 'score': float(scores[i]),
+                 'metadata': self.vectors[self._ids[i]][1] if include_metadata else None}
+                for i in top
+            ]}
+
+    def fetch(self, ids: List[str]) -> SimpleNamespace:
+        self._wait()
+        with self._lock:
+            return SimpleNamespace(vectors={
+                vector_id: SimpleNamespace(id=vector_id, values=self.vectors[vector_id][0].tolist(),
+                                           metadata=dict(self.vectors[vector_id][1]))
+                for vector_id in ids if vector_id in self.vectors
+            })
+
+    def update(self, id: str, set_metadata: Dict[str, Any]):
+        self._wait()
+        with self._lock:
+            if id in self.vectors:
+                values, metadata = self.vectors[id]
+                self.vectors[id] = (values, {**metadata, **set_metadata})
+
+    def delete(self, ids: List[str]):
+        self._wait()
+        with self._lock:
+            for vector_id in ids:
+                self.vectors.pop(vector_id, None)
+            self._matrix = None
+
+    def list(self, prefix: str = "", limit: int = 100) -> Iterator[List[str]]:
+        with self._lock:
+            matching = [vector_id for vector_id in self.vectors if vector_id.startswith(prefix)]
+        for i in range(0, len(matching), limit):
+            yield matching[i:i + limit]
+
+
+class FakePinecone:
+    def __init__(self, latency_ms: float = 10.0):
+        self.latency_ms = latency_ms
+        self.indexes: Dict[str, FakePineconeIndex] = {}
+
+    def list_indexes(self) -> List[SimpleNamespace]:
+        return [SimpleNamespace(name=name) for name in self.indexes]
+
+    def create_index(self, name: str, dimension: int, metric: str = "cosine", spec: Any = None):
+        self.indexes[name] = FakePineconeIndex(dimension, self.latency_ms)
+
+    def Index(self, name: str) -> FakePineconeIndex:
+        return self.indexes[name]
+
+
+def _split_columns(columns: str) -> List[str]:
+    """Split a select list on top-level commas, keeping embedded resources whole"""
+    parts, depth, current = [], 0, ""
+    for char in columns:
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+_COMPARISONS = {
+    "lt": lambda field, value: field < value,
+    "lte": lambda field, value: field <= value,
+    "gt": lambda field, value: field > value,
+    "gte": lambda field, value: field >= value,
+}
+
+
+def _parse_logic(filters: str) -> List[Tuple[str, str, Any]]:
+    """PostgREST logic tree conditions such as a.gt.1,and(a.eq.1,b.lt.2)"""
+    conditions = []
+    for part in _split_columns(filters):
+        if part.startswith(("and(", "or(")):
+            op, inner = part[:-1].split("(", 1)
+            conditions.append((op, "", _parse_logic(inner)))
+        else:
+            column, op, value = part.split(".", 2)
+            conditions.append((op, column, value[1:-1] if value.startswith('"') else value))
+    return conditions
+
+
+def _condition_matches(row: Dict[str, Any], op: str, column: str, value: Any) -> bool:
+    if op == "and":
+        return all(_condition_matches(row, *condition) for condition in value)
+    if op == "or":
+        return any(_condition_matches(row, *condition) for condition in value)
+    field = row.get(column)
+    if op == "in":
+        return field in value
+    if op == "eq":
+        return field == value
+    if op == "neq":
+        return field != value
+    return field is not None and _COMPARISONS[op](field, value)
+
+
+class _Query:
+    """One PostgREST request being built, executed against FakeSupabase's tables"""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.payload: Any = None
+        self.count: Optional[str] = None
+        self.filters: List[Tuple[str, str, Any]] = []
+        self.ordering: List[Tuple[str, bool]] = []
+        self.offset = 0
+        self.max_rows: Optional[int] = None
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "_Query":
+        self.columns, self.count = columns, count
+        return self
+
+    def insert(self, rows: Any) -> "_Query":
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows: Any, on_conflict: str = "id") -> "_Query":
+        self.action, self.payload = "upsert", rows
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "_Query":
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self) -> "_Query":
+        self.action = "delete"
+        return self
+
+    def _filter(self, op: str, column: str, value: Any) -> "_Query":
+        self.filters.append((op, column, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "_Query":
+        return self._filter("eq", column, value)
+
+    def neq(self, column: str, value: Any) -> "_Query":
+        return self._filter("neq", column, value)
+
+    def lt(self, column: str, value: Any) -> "_Query":
+        return self._filter("lt", column, value)
+
+    def lte(self, column: str, value: Any) -> "_Query":
+        return self._filter("lte", column, value)
+
+    def gt(self, column: str, value: Any) -> "_Query":
+        return self._filter("gt", column, value)
+
+    def gte(self, column: str, value: Any) -> "_Query":
+        return self._filter("gte", column, value)
+
+    def in_(self, column: str, values: List[Any]) -> "_Query":
+        return self._filter("in", column, values)
+
+    def order(self, column: str, desc: bool = False) -> "_Query":
+        self.ordering.append((column, desc))
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        self.offset, self.max_rows = start, end - start + 1
+        return self
+
+    def limit(self, size: int) -> "_Query":
+        self.max_rows = size
+        return self
+
+    def or_(self, filters: str) -> "_Query":
+        return self._filter("or", "", _parse_logic(filters))
+
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        return all(_condition_matches(row, op, column, value) for op, column, value in self.filters)
+
+    def _project(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        projected = {}
+        for column in _split_columns(self.columns):
+            if column == "*":
+                projected.update(row)
+            elif "(" in column:
+                # Embedded resource through a <table without s>_id foreign key, e.g. documents(filename)
+                resource, inner = column[:-1].split("(", 1)
+                foreign = self.db.tables.get(resource, {}).get(row.get(f"{resource.rstrip('s')}_id"))
+                if foreign is None:
+                    projected[resource] = None
+                else:
+                    inner_columns = _split_columns(inner)
+                    projected[resource] = (dict(foreign) if inner_columns == ["*"]
+                                           else {name: foreign.get(name) for name in inner_columns})
+            elif column != "count":
+                projected[column] = row.get(column)
+        return projected
+
+    def _with_defaults(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        now = _now()
+        return {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now,
+                **self.db.defaults.get(self.table, {}), **row}
+
+    def execute(self) -> SimpleNamespace:
+        # Payloads go over the wire as JSON, so whatever would not serialize fails here too
+        payload = json.loads(json.dumps(self.payload))
+        self.db.wait()
+        with self.db.lock:
+            self.db.requests += 1
+            table = self.db.tables.setdefault(self.table, {})
+            if self.action in ("insert", "upsert"):
+                rows = payload if isinstance(payload, list) else [payload]
+                written = []
+                for row in rows:
+                    if self.action == "upsert" and row.get("id") in table:
+                        merged = {**table[row["id"]], **row}
+                    else:
+                        merged = self._with_defaults(row)
+                    table[merged["id"]] = merged
+                    written.append(copy.deepcopy(merged))
+                return SimpleNamespace(data=written, count=None)
+
+            rows = [row for row in table.values() if self._matches(row)]
+            if self.action == "update":
+                for row in rows:
+                    row.update(payload)
+                return SimpleNamespace(data=copy.deepcopy(rows), count=None)
+            if self.action == "delete":
+                for row in rows:
+                    del table[row["id"]]
+                return SimpleNamespace(data=rows, count=None)
+
+            for column, desc in reversed(self.ordering):
+                rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+            total = len(rows)
+            end = None if self.max_rows is None else self.offset + self.max_rows
+            rows = rows[self.offset:end]
+            return SimpleNamespace(data=[copy.deepcopy(self._project(row)) for row in rows],
+                                   count=total if self.count else None)
+
+
+def _claim_next_pending_message(db: "FakeSupabase", p_chat_id: str, p_lease_seconds: int = 600) -> List[Dict[str, Any]]:
+    expired = (datetime.now(timezone.utc) - timedelta(seconds=p_lease_seconds)).isoformat()
+    claimable = [row for row in db.tables.get("messages", {}).values()
+                 if row["chat_id"] == p_chat_id and row["role"] == "user"
+                 and (row["status"] == "pending" or (row["status"] == "in_progress" and row["updated_at"] < expired))]
+    if not claimable:
+        return []
+    row = min(claimable, key=lambda row: (row["created_at"], row["id"]))
+    row.update(status="in_progress", updated_at=_now())
+    return [copy.deepcopy(row)]
+
+
+class _Rpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: Dict[str, Any]):
+        self.db = db
+        self.name = name
+        self.params = json.loads(json.dumps(params))
+
+    def execute(self) -> SimpleNamespace:
+        self.db.wait()
+        # Holding the lock for the whole call makes it atomic, as the SQL function is
+        with self.db.lock:
+            self.db.requests += 1
+            return SimpleNamespace(data=self.db.functions[self.name](self.db, **self.params), count=None)
+
+
+class FakeSupabase:
+    """Supabase client stand-in keeping every table in memory"""
+
+    def __init__(self, latency_ms: float = 5.0):
+        self.latency = latency_ms / 1000
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Column defaults the schema in script.sql would fill in
+        self.defaults = {"documents": {"total_chunks": 0, "status": "committed"}}
+        self.functions = {"claim_next_pending_message": _claim_next_pending_message}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.postgrest = SimpleNamespace(session=SimpleNamespace(close=lambda: None))
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> _Rpc:
+        return _Rpc(self, name, params)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "rows": {name: len(rows) for name, rows in self.tables.items()}}
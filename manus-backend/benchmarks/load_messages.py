@@ -0,0 +1,116 @@
+"""Concurrent load test for POST /messages.
+
+Sends a burst of messages against a running server while probing /health, and
+reports latency percentiles. If requests serialize on the event loop, wall time
+approaches the sum of request latencies (overlap ~= 1) and /health stalls; when
+they run concurrently, overlap approaches the concurrency level.
+
+    python -m benchmarks.load_messages --base-url http://127.0.0.1:8000 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float]) -> dict:
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0
+    }
+
+
+async def post_message(client: httpx.AsyncClient, chat_id: str, i: int, latencies: List[float], errors: List[str]):
+    payload = {
+        "chat_id": chat_id,
+        "role": "user",
+        "content": f"Load test question {i}: what is the notice period?",
+        "task": "chat",
+        "status": "pending"
+    }
+    start = time.perf_counter()
+    try:
+        response = await client.post("/messages/", json=payload)
+        response.raise_for_status()
+    except Exception as e:
+        errors.append(str(e))
+    finally:
+        latencies.append(time.perf_counter() - start)
+
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event, latencies: List[float]):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get("/health")
+        except Exception:
+            pass
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+
+async def run(base_url: str, concurrency: int, rounds: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency + 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        chat = (await client.post("/chats/", json={"title": "Load test"})).json()
+
+        message_latencies: List[float] = []
+        health_latencies: List[float] = []
+        errors: List[str] = []
+
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe_health(client, stop, health_latencies))
+
+        start = time.perf_counter()
+        for round_number in range(rounds):
+            await asyncio.gather(*(
+                post_message(client, chat["id"], round_number * concurrency + i, message_latencies, errors)
+                for i in range(concurrency)
+            ))
+        wall = time.perf_counter() - start
+
+        stop.set()
+        await prober
+        await client.delete(f"/chats/{chat['id']}")
+
+    return {
+        "concurrency": concurrency,
+        "rounds": rounds,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(message_latencies) / wall, 2) if wall else 0.0,
+        # Sum of latencies over wall time: ~1 when serialized, ~concurrency when overlapped
+        "overlap": round(sum(message_latencies) / wall, 2) if wall else 0.0,
+        "messages": summarize(message_latencies),
+        "health": summarize(health_latencies),
+        "errors": len(errors)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for POST /messages")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args.base_url, args.concurrency, args.rounds)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
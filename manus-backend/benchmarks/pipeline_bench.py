@@ -0,0 +1,282 @@
+"""End-to-end ingest and question-answering benchmark, fully offline.
+
+Runs the real DocumentProcessor and ReasoningProcessor against the in-process
+fakes in benchmarks.fakes, over a synthetic data room from benchmarks.data_room:
+
+- cold_ingest: every file of a fresh data room through process_document
+- incremental: a fraction of the files edited, then through update_document
+- concurrent_qa: questions answered with answer_question at a fixed concurrency
+
+Each scenario reports throughput, p50/p95/p99 latency, per-stage timings from
+core.metrics and peak RSS. The report is JSON; save it as a baseline and pass it
+back with --compare to flag throughput drops or latency rises beyond --tolerance
+(the exit status is then 1).
+
+    python -m benchmarks.pipeline_bench --files 30 --size-kb 200 --output baseline.json
+    python -m benchmarks.pipeline_bench --files 30 --size-kb 200 --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.chunker_bench import WORDS
+from benchmarks.data_room import FILE_TYPES, edit_document, generate_data_room
+from benchmarks.fakes import FakeOpenAIServer, FakePinecone, FakeSupabase
+from benchmarks.load_messages import summarize
+
+
+def configure_environment(directory: str, dimensions: int):
+    """Point the settings at the fakes and keep every local cache inside directory.
+
+    Settings are read when agent.settings is imported, so this runs before any
+    application module is imported; values already in the environment win.
+    """
+    defaults = {
+        "OPENAI_MODEL": "gpt-4",
+        "EMBEDDING_MODEL": "text-embedding-3-small",
+        "EMBEDDING_DIMENSIONS": str(dimensions),
+        "MAX_TOKENS_PER_CHUNK": "512",
+        "OVERLAPPING_TOKEN": "50",
+        "VECTOR_STORE_BACKEND": "pinecone",
+        "PINECONE_INDEX_NAME": "benchmark",
+        "PINECONE_CLOUD": "aws",
+        "PINECONE_REGION": "us-east-1",
+        # Cached answers would measure the cache rather than the pipeline
+        "ANSWER_CACHE_ENABLED": "false",
+        "EMBEDDING_CACHE_PATH": os.path.join(directory, "embeddings.sqlite3"),
+        "INGEST_JOURNAL_PATH": os.path.join(directory, "ingest_journal.sqlite3"),
+        "BM25_INDEX_PATH": os.path.join(directory, "bm25.npz"),
+        "LOCAL_CHUNK_STORE_PATH": os.path.join(directory, "chunks.sqlite3"),
+        "LOCAL_VECTOR_STORE_PATH": os.path.join(directory, "vector_store"),
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its reaped children, such as the parsing pool"""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = sum(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    return round(peak * scale / (1024 * 1024), 1)
+
+
+def stage_timings(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Count and mean of each histogram child observed between two MetricFamily snapshots"""
+    timings = {}
+    for key, snapshot in after.items():
+        count = snapshot["count"] - before.get(key, {}).get("count", 0)
+        if count:
+            total = snapshot["sum"] - before.get(key, {}).get("sum", 0.0)
+            timings[key] = {"count": count, "mean_ms": round(total / count * 1000, 1)}
+    return timings
+
+
+async def run_concurrently(items: List[Any], worker, concurrency: int) -> Dict[str, Any]:
+    """Await worker(item) for every item, at most concurrency at a time, timing each call"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def timed_worker(item):
+        async with semaphore:
+            start = time.perf_counter()
+            await worker(item)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed_worker(item) for item in items))
+    wall = time.perf_counter() - start
+    return {"wall_s": round(wall, 3), "latency": summarize(latencies)}
+
+
+def question(rng: random.Random) -> str:
+    first, second, third = rng.sample(WORDS, 3)
+    return f"What does the {first} {second} clause say about {third}?"
+
+
+async def run(args: argparse.Namespace, directory: str) -> Dict[str, Any]:
+    # Imported here so configure_environment has already run
+    from agent.document_processor import DocumentProcessor
+    from agent.reasoning_processor import ReasoningProcessor
+    from core.clients import ClientRegistry
+    from core.enums import MessageRole, MessageStatus, MessageTask
+    from core.metrics import INGEST_STAGE_SECONDS, RAG_STAGE_SECONDS
+    from schemas.chat import ChatCreate
+    from schemas.message import MessageCreate
+    from services.chat import ChatService
+    from services.message import MessageService
+
+    server = FakeOpenAIServer(
+        latency_ms=args.openai_latency_ms,
+        requests_per_second=args.openai_rps,
+        burst=args.openai_burst
+    )
+    supabase = FakeSupabase(latency_ms=args.supabase_latency_ms)
+    clients = ClientRegistry(
+        openai_client=server.client(),
+        supabase_client=supabase,
+        pinecone_client=FakePinecone(latency_ms=args.pinecone_latency_ms)
+    )
+    document_processor = DocumentProcessor(clients)
+    reasoning_processor = ReasoningProcessor(clients)
+
+    size_bytes = int(args.size_kb * 1024)
+    data_room = os.path.join(directory, "Data Room")
+    paths = generate_data_room(data_room, args.files, size_bytes, args.file_types, args.seed)
+    data_room_mb = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+
+    report: Dict[str, Any] = {
+        "config": {
+            "files": args.files, "size_kb": args.size_kb, "file_types": args.file_types,
+            "data_room_mb": round(data_room_mb, 2), "ingest_concurrency": args.ingest_concurrency,
+            "questions": args.questions, "qa_concurrency": args.qa_concurrency,
+            "openai_latency_ms": args.openai_latency_ms, "openai_rps": args.openai_rps,
+            "pinecone_latency_ms": args.pinecone_latency_ms, "supabase_latency_ms": args.supabase_latency_ms
+        },
+        "scenarios": {}
+    }
+
+    try:
+        stages = INGEST_STAGE_SECONDS.snapshot()
+        openai_before = server.stats()
+        result = await run_concurrently(paths, document_processor.process_document, args.ingest_concurrency)
+        chunks = len(supabase.tables.get("chunks", {}))
+        report["scenarios"]["cold_ingest"] = {
+            **result,
+            "documents_per_s": round(len(paths) / result["wall_s"], 2),
+            "mb_per_s": round(data_room_mb / result["wall_s"], 2),
+            "chunks": chunks,
+            "chunks_per_s": round(chunks / result["wall_s"], 1),
+            "embedding_inputs": server.stats()["embedding_inputs"] - openai_before["embedding_inputs"],
+            "rate_limited": server.stats()["rate_limited"] - openai_before["rate_limited"],
+            "stages": stage_timings(stages, INGEST_STAGE_SECONDS.snapshot()),
+            "peak_rss_mb": peak_rss_mb()
+        }
+
+        rng = random.Random(args.seed)
+        edited = rng.sample(paths, max(1, int(len(paths) * args.edit_fraction)))
+        for path in edited:
+            edit_document(path, size_bytes, args.seed + paths.index(path), edit_fraction=0.1)
+        stages = INGEST_STAGE_SECONDS.snapshot()
+        openai_before = server.stats()
+        result = await run_concurrently(edited, document_processor.update_document, args.ingest_concurrency)
+        report["scenarios"]["incremental"] = {
+            **result,
+            "documents": len(edited),
+            "documents_per_s": round(len(edited) / result["wall_s"], 2),
+            "embedding_inputs": server.stats()["embedding_inputs"] - openai_before["embedding_inputs"],
+            "stages": stage_timings(stages, INGEST_STAGE_SECONDS.snapshot()),
+            "peak_rss_mb": peak_rss_mb()
+        }
+
+        chat = await ChatService(supabase).create_chat(ChatCreate(title="Benchmark"))
+        message_service = MessageService(supabase)
+        messages = [
+            await message_service.create_message(MessageCreate(
+                chat_id=chat.id,
+                role=MessageRole.USER,
+                content=question(rng),
+                task=MessageTask.CHAT,
+                status=MessageStatus.PENDING
+            ))
+            for _ in range(args.questions)
+        ]
+        stages = RAG_STAGE_SECONDS.snapshot()
+        openai_before = server.stats()
+        result = await run_concurrently(messages, reasoning_processor.answer_question, args.qa_concurrency)
+        report["scenarios"]["concurrent_qa"] = {
+            **result,
+            "questions_per_s": round(len(messages) / result["wall_s"], 2),
+            "embedding_requests": server.stats()["embedding_requests"] - openai_before["embedding_requests"],
+            "completion_requests": server.stats()["completion_requests"] - openai_before["completion_requests"],
+            "stages": stage_timings(stages, RAG_STAGE_SECONDS.snapshot()),
+            "peak_rss_mb": peak_rss_mb()
+        }
+
+        report["openai"] = server.stats()
+        report["supabase"] = supabase.stats()
+    finally:
+        document_processor.close()
+        await clients.aclose()
+
+    return report
+
+
+# Higher is better for throughput, lower for latency and memory
+_THROUGHPUT = ("documents_per_s", "mb_per_s", "chunks_per_s", "questions_per_s")
+_LATENCY = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Metrics that got worse than the baseline by more than tolerance, as a fraction"""
+    regressions = []
+
+    def check(scenario: str, metric: str, current: float, previous: float, higher_is_better: bool):
+        if not previous:
+            return
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append({"scenario": scenario, "metric": metric, "baseline": previous,
+                                "current": current, "change": round(change, 3)})
+
+    for scenario, result in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        for metric in _THROUGHPUT:
+            if metric in result and metric in previous:
+                check(scenario, metric, result[metric], previous[metric], higher_is_better=True)
+        for metric in _LATENCY:
+            check(scenario, metric, result["latency"][metric], previous["latency"][metric], higher_is_better=False)
+        check(scenario, "peak_rss_mb", result["peak_rss_mb"], previous["peak_rss_mb"], higher_is_better=False)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ingest and Q&A benchmark")
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--size-kb", type=float, default=200)
+    parser.add_argument("--file-types", nargs="+", choices=FILE_TYPES, default=list(FILE_TYPES))
+    parser.add_argument("--edit-fraction", type=float, default=0.2)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--ingest-concurrency", type=int, default=4)
+    parser.add_argument("--qa-concurrency", type=int, default=20)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--openai-latency-ms", type=float, default=50)
+    parser.add_argument("--openai-rps", type=float, default=0, help="Rate limit for the fake OpenAI, 0 for none")
+    parser.add_argument("--openai-burst", type=int, default=10)
+    parser.add_argument("--pinecone-latency-ms", type=float, default=10)
+    parser.add_argument("--supabase-latency-ms", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report here as well, e.g. to keep as a baseline")
+    parser.add_argument("--compare", help="Baseline report to check this run against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(directory, args.dimensions)
+        report = asyncio.run(run(args, directory))
+
+    if args.compare:
+        with open(args.compare) as file:
+            report["regressions"] = compare(report, json.load(file), args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Recall and latency of the local vector store.
+
+Builds a clustered synthetic corpus, computes exact top-k with NumPy as ground
+truth, and queries LocalVectorStore in brute-force and IVF modes. Reports
+recall@k and p50/p99 query latency as JSON.
+
+    python -m benchmarks.vector_store_bench --vectors 100000 --dimensions 1536 --ivf-lists 256 --ivf-probes 8 16 32
+"""
+import argparse
+import json
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from core.local_vector_store import LocalVectorStore
+
+
+def synthetic_corpus(rng: np.random.Generator, count: int, dimensions: int, clusters: int) -> np.ndarray:
+    """Unit vectors drawn around random topic centres, which is closer to real embeddings than uniform noise"""
+    centres = rng.standard_normal((clusters, dimensions), dtype=np.float32)
+    labels = rng.integers(0, clusters, count)
+    vectors = centres[labels] + 0.6 * rng.standard_normal((count, dimensions), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, top_k: int) -> List[set]:
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    return [set(row.tolist()) for row in top]
+
+
+def measure(store: LocalVectorStore, queries: np.ndarray, truth: List[set], top_k: int) -> dict:
+    # Warm-up so first-query costs, e.g. building the inverted lists, are not counted as latency
+    store.query(queries[0].tolist(), top_k)
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = store.query(query.tolist(), top_k)
+        latencies.append(time.perf_counter() - start)
+        hits += len({int(result['id']) for result in results} & expected)
+
+    return {
+        "recall_at_k": round(hits / (len(queries) * top_k), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 3)
+    }
+
+
+def load(store: LocalVectorStore, corpus: np.ndarray, batch_size: int = 1000) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(corpus), batch_size):
+        store.upsert([
+            {'id': str(j), 'values': corpus[j].tolist(), 'metadata': {}}
+            for j in range(i, min(i + batch_size, len(corpus)))
+        ])
+    return time.perf_counter() - start
+
+
+def run(vectors: int, dimensions: int, queries: int, top_k: int, ivf_lists: int, ivf_probes: List[int]) -> dict:
+    rng = np.random.default_rng(42)
+    corpus = synthetic_corpus(rng, vectors, dimensions, clusters=max(1, vectors // 500))
+    query_vectors = synthetic_corpus(rng, queries, dimensions, clusters=max(1, queries // 10))
+    truth = exact_top_k(corpus, query_vectors, top_k)
+
+    report = {"vectors": vectors, "dimensions": dimensions, "queries": queries, "top_k": top_k}
+
+    with tempfile.TemporaryDirectory() as path:
+        store = LocalVectorStore(path, dimensions)
+        report["load_s"] = round(load(store, corpus), 3)
+        report["brute_force"] = measure(store, query_vectors, truth, top_k)
+        store.close()
+
+        for probes in ivf_probes if ivf_lists else []:
+            # Reopening exercises persistence: the slots and vectors come back from disk, and the IVF
+            # index trained when the store is first reopened with ivf_lists is loaded by the others
+            store = LocalVectorStore(path, dimensions, ivf_lists=ivf_lists, ivf_probes=probes)
+            report[f"ivf_{ivf_lists}_probes_{probes}"] = measure(store, query_vectors, truth, top_k)
+            store.close()
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and latency of the local vector store")
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--ivf-lists", type=int, default=128)
+    parser.add_argument("--ivf-probes", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.vectors, args.dimensions, args.queries, args.top_k, args.ivf_lists, args.ivf_probes), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from agent.settings import settings
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a question"""
+    return _WHITESPACE.sub(" ", _NON_WORD.sub(" ", question.lower())).strip()
+
+
+@dataclass
+class _Entry:
+    value: Dict[str, Any]
+    document_ids: Set[str]
+    expires_at: float
+    embedding: Optional[np.ndarray] = None
+
+
+class AnswerCache:
+    """In-process TTL + LRU cache of answers keyed on the normalized question.
+
+    With a similarity threshold, a miss on the exact key can still be served by
+    the cached question whose embedding is closest, if it is close enough. Each
+    entry remembers the documents its sources came from, so modifying or
+    deleting one of them drops every answer built on it.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, similarity_threshold: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_document: Dict[str, Set[str]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        """Changes on every invalidation; answers computed across one are not cached"""
+        return self._generation
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for document_id in entry.document_ids:
+            keys = self._by_document.get(document_id)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_document[document_id]
+
+    def _live(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, question: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._live(normalize_question(question))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.value
+
+    def get_similar(self, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """Best cached answer whose question embedding has cosine similarity above the threshold"""
+        if not self.similarity_threshold:
+            return None
+        with self._lock:
+            # Expired entries must not win the scoring and hide a live answer that is nearly as close
+            now = time.monotonic()
+            for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+                self._drop(key)
+            keys = [key for key, entry in self._entries.items() if entry.embedding is not None]
+            if not keys:
+                return None
+            query = np.asarray(embedding, dtype=np.float32)
+            query /= np.linalg.norm(query) or 1.0
+            scores = np.stack([self._entries[key].embedding for key in keys]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                return None
+            entry = self._live(keys[best])
+            if entry is None:
+                return None
+            self.similar_hits += 1
+            return entry.value
+
+    def put(self, question: str, value: Dict[str, Any], document_ids: Iterable[str], generation: int,
+            embedding: Optional[List[float]] = None):
+        """Cache an answer unless a document was invalidated since generation was read"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            key = normalize_question(question)
+            self._drop(key)
+
+            vector = None
+            if embedding is not None and self.similarity_threshold:
+                vector = np.asarray(embedding, dtype=np.float32)
+                vector /= np.linalg.norm(vector) or 1.0
+
+            entry = _Entry(value, set(document_ids), time.monotonic() + self.ttl, vector)
+            self._entries[key] = entry
+            for document_id in entry.document_ids:
+                self._by_document.setdefault(document_id, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_documents(self, document_ids: Iterable[str]) -> int:
+        """Drop every answer with a source in one of the documents"""
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for document_id in document_ids:
+                keys |= self._by_document.get(document_id, set())
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> dict:
+        # A similar hit follows an exact-key miss, so lookups are hits + misses
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.hits + self.similar_hits) / total, 4) if total else 0.0
+        }
+
+
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Return the process-wide answer cache, or None when caching is disabled"""
+    global _answer_cache
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache(
+                settings.ANSWER_CACHE_MAX_ENTRIES,
+                settings.ANSWER_CACHE_TTL,
+                settings.ANSWER_CACHE_SIMILARITY_THRESHOLD
+            )
+        return _answer_cache
@@ -0,0 +1,288 @@
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from agent.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Words, numbers and dotted/hyphenated identifiers such as "12.3", "s.47" or "covid-19"
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[./\-][a-z0-9]+)*")
+_TOKEN_PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Rebuild postings once this share of indexed chunks has been deleted
+_COMPACT_RATIO = 0.25
+
+# Terms and vector IDs never contain a newline, so each list is saved as one newline-joined UTF-8 buffer
+_SEPARATOR = "\n"
+
+
+def _pack_strings(strings: List[str]) -> np.ndarray:
+    return np.frombuffer(_SEPARATOR.join(strings).encode(), dtype=np.uint8)
+
+
+def _unpack_strings(packed: np.ndarray, count: int) -> List[str]:
+    return packed.tobytes().decode().split(_SEPARATOR) if count else []
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms; compound identifiers are kept whole and also split into their parts"""
+    terms = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        term = match.group()
+        terms.append(term)
+        if not term.isalnum():
+            terms.extend(_TOKEN_PART_PATTERN.findall(term))
+    return terms
+
+
+class BM25Index:
+    """Incremental Okapi BM25 inverted index over chunk content, keyed by vector ID.
+
+    Postings are parallel array('I') columns of internal document numbers and
+    term frequencies. Deleted chunks are tombstoned and the postings compacted
+    once enough of them pile up. The index is saved to disk as a plain numpy
+    .npz archive at most every save_interval seconds and on close, so a crash
+    loses the changes of at most that window. Stale entries left behind are
+    harmless because search results are joined against the chunks table, but
+    missing ones would silently hide chunks from lexical search; saved_at
+    records when the archive was written so the startup backfill can re-index
+    every chunk created since.
+    """
+
+    def __init__(self, path: str, save_interval: float = 30.0, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.save_interval = save_interval
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+        self._postings_docs: Dict[str, array] = {}
+        self._postings_freqs: Dict[str, array] = {}
+        self._doc_ids: List[Optional[str]] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._doc_lengths = array('I')
+        self._total_length = 0
+        self._deleted = 0
+        # Wall-clock time the archive on disk was written, None before the first save
+        self.saved_at: Optional[datetime] = None
+
+        if os.path.exists(path):
+            try:
+                self._load()
+            except Exception as e:
+                logger.error(f"Could not load BM25 index from {path}, starting empty: {e}")
+
+    def _load(self):
+        # Arrays only, so loading never runs code from the file
+        with np.load(self.path, allow_pickle=False) as state:
+            offsets = state['offsets']
+            terms = _unpack_strings(state['terms'], len(offsets) - 1)
+            docs = state['postings_docs'].astype(np.uint32)
+            freqs = state['postings_freqs'].astype(np.uint32)
+            doc_lengths = state['doc_lengths'].astype(np.uint32)
+            # Tombstoned documents are saved with an empty ID
+            doc_ids = _unpack_strings(state['doc_ids'], len(doc_lengths))
+            saved_at = float(state['saved_at'])
+
+        self._postings_docs = {}
+        self._postings_freqs = {}
+        for term, start, end in zip(terms, offsets[:-1], offsets[1:]):
+            self._postings_docs[term] = array('I', docs[start:end].tobytes())
+            self._postings_freqs[term] = array('I', freqs[start:end].tobytes())
+        self._doc_ids = [vector_id or None for vector_id in doc_ids]
+        self._doc_lengths = array('I', doc_lengths.tobytes())
+        self.saved_at = datetime.fromtimestamp(saved_at, timezone.utc)
+        self._doc_numbers = {vector_id: i for i, vector_id in enumerate(self._doc_ids) if vector_id is not None}
+        self._total_length = sum(self._doc_lengths)
+        self._deleted = len(self._doc_ids) - len(self._doc_numbers)
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        saved_at = time.time()
+        # Postings of all terms concatenated, term i owning offsets[i]:offsets[i + 1]
+        terms = list(self._postings_docs)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(self._postings_docs[term]) for term in terms])
+        docs = np.concatenate([np.frombuffer(self._postings_docs[term], dtype=np.uint32) for term in terms]) \
+            if terms else np.zeros(0, dtype=np.uint32)
+        freqs = np.concatenate([np.frombuffer(self._postings_freqs[term], dtype=np.uint32) for term in terms]) \
+            if terms else np.zeros(0, dtype=np.uint32)
+
+        tmp_path = f"{self.path}.tmp"
+        # A file object, since np.savez appends .npz to a path without it
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                terms=_pack_strings(terms),
+                offsets=offsets,
+                postings_docs=docs,
+                postings_freqs=freqs,
+                doc_ids=_pack_strings([vector_id or "" for vector_id in self._doc_ids]),
+                doc_lengths=np.frombuffer(self._doc_lengths, dtype=np.uint32),
+                saved_at=np.float64(saved_at)
+            )
+        os.replace(tmp_path, self.path)
+        self.saved_at = datetime.fromtimestamp(saved_at, timezone.utc)
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _maybe_save(self):
+        if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self._save()
+
+    def _remove(self, vector_id: str):
+        number = self._doc_numbers.pop(vector_id, None)
+        if number is None:
+            return
+        self._doc_ids[number] = None
+        self._total_length -= self._doc_lengths[number]
+        self._doc_lengths[number] = 0
+        self._deleted += 1
+
+    def add_many(self, documents: Iterable[Tuple[str, str]]):
+        """Index (vector_id, content) pairs, replacing any existing entry for the same ID"""
+        with self._lock:
+            for vector_id, content in documents:
+                self._remove(vector_id)
+                terms = Counter(tokenize(content))
+                number = len(self._doc_ids)
+                self._doc_ids.append(vector_id)
+                self._doc_numbers[vector_id] = number
+                length = sum(terms.values())
+                self._doc_lengths.append(length)
+                self._total_length += length
+                for term, freq in terms.items():
+                    if term not in self._postings_docs:
+                        self._postings_docs[term] = array('I')
+                        self._postings_freqs[term] = array('I')
+                    self._postings_docs[term].append(number)
+                    self._postings_freqs[term].append(freq)
+            self._compact_if_needed()
+            self._dirty = True
+            self._maybe_save()
+
+    def remove_many(self, vector_ids: Iterable[str]):
+        with self._lock:
+            for vector_id in vector_ids:
+                self._remove(vector_id)
+            self._compact_if_needed()
+            self._dirty = True
+            self._maybe_save()
+
+    def _compact_if_needed(self):
+        if not self._doc_ids or self._deleted / len(self._doc_ids) < _COMPACT_RATIO:
+            return
+
+        # Renumber live documents densely and drop postings of deleted ones
+        live = [number for number, vector_id in enumerate(self._doc_ids) if vector_id is not None]
+        remap = np.full(len(self._doc_ids), -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+
+        postings_docs = {}
+        postings_freqs = {}
+        for term, docs in self._postings_docs.items():
+            new_docs = remap[np.frombuffer(docs, dtype=np.uint32)]
+            keep = new_docs >= 0
+            if keep.any():
+                postings_docs[term] = array('I', new_docs[keep].astype(np.uint32).tobytes())
+                postings_freqs[term] = array('I', np.frombuffer(self._postings_freqs[term], dtype=np.uint32)[keep].tobytes())
+
+        self._postings_docs = postings_docs
+        self._postings_freqs = postings_freqs
+        self._doc_ids = [self._doc_ids[number] for number in live]
+        self._doc_lengths = array('I', (self._doc_lengths[number] for number in live))
+        self._doc_numbers = {vector_id: i for i, vector_id in enumerate(self._doc_ids)}
+        self._deleted = 0
+
+    @staticmethod
+    def _idf(df: int, live: int) -> float:
+        return math.log(1 + (live - df + 0.5) / (df + 0.5))
+
+    def query_weight(self, query: str) -> float:
+        """Sum of the query terms' IDFs, about the score of a chunk of average length containing each once.
+
+        Terms absent from the index count too, so a score divided by this is the
+        IDF-weighted share of the query a chunk covers.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            live = len(self._doc_numbers)
+            return sum(self._idf(len(self._postings_docs.get(term, ())), live) for term in terms)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """Top-k (vector_id, bm25 score) for the query"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            live = len(self._doc_numbers)
+            if not terms or not live:
+                return []
+
+            average_length = max(self._total_length / live, 1.0)
+            lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32).astype(np.float32)
+            norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+
+            for term in terms:
+                docs = self._postings_docs.get(term)
+                if docs is None:
+                    continue
+                doc_numbers = np.frombuffer(docs, dtype=np.uint32)
+                freqs = np.frombuffer(self._postings_freqs[term], dtype=np.uint32).astype(np.float32)
+                # Tombstoned postings still count towards df until compaction; the skew is bounded by _COMPACT_RATIO
+                df = len(doc_numbers)
+                idf = self._idf(df, live)
+                scores[doc_numbers] += idf * freqs * (self.k1 + 1) / (freqs + norms[doc_numbers])
+
+            # Deleted chunks have zero length; drop their scores until compaction removes the postings
+            scores[lengths == 0] = 0
+            k = min(top_k, int(np.count_nonzero(scores)))
+            if k == 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._doc_ids[i], float(scores[i])) for i in top]
+
+    def is_empty(self) -> bool:
+        return not self._doc_numbers
+
+    def stats(self) -> dict:
+        return {
+            "chunks": len(self._doc_numbers),
+            "terms": len(self._postings_docs),
+            "postings": sum(len(docs) for docs in self._postings_docs.values()),
+            "tombstones": self._deleted
+        }
+
+    def close(self):
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+
+_bm25_index: Optional[BM25Index] = None
+_bm25_index_lock = threading.Lock()
+
+
+def get_bm25_index() -> Optional[BM25Index]:
+    """Return the process-wide BM25 index, or None when hybrid search is disabled"""
+    global _bm25_index
+    if not settings.HYBRID_SEARCH_ENABLED:
+        return None
+    with _bm25_index_lock:
+        if _bm25_index is None:
+            _bm25_index = BM25Index(settings.BM25_INDEX_PATH, save_interval=settings.BM25_SAVE_INTERVAL)
+        return _bm25_index
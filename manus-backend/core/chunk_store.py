@@ -0,0 +1,127 @@
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from agent.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of bound parameters per statement
+_SQL_BATCH_SIZE = 500
+
+_COLUMNS = ("vector_id", "id", "document_id", "chunk_index", "content", "start_char_index", "end_char_index")
+
+
+class ChunkContentStore:
+    """Local SQLite copy of the chunk columns retrieval needs, keyed by vector ID.
+
+    Lets search resolve vector matches to chunk text without a Supabase round
+    trip. Rows are plain dicts with the same keys as the chunks table.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "vector_id TEXT PRIMARY KEY, "
+            "id TEXT NOT NULL, "
+            "document_id TEXT NOT NULL, "
+            "chunk_index INTEGER NOT NULL, "
+            "content TEXT NOT NULL, "
+            "start_char_index INTEGER NOT NULL, "
+            "end_char_index INTEGER NOT NULL)"
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def get_many(self, vector_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Rows for the vector IDs that are present, keyed by vector ID"""
+        found = {}
+        with self._lock:
+            for i in range(0, len(vector_ids), _SQL_BATCH_SIZE):
+                batch = vector_ids[i:i + _SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM chunks WHERE vector_id IN ({placeholders})", batch
+                ).fetchall()
+                for row in rows:
+                    found[row[0]] = dict(zip(_COLUMNS, row))
+            self.hits += len(found)
+            self.misses += len(set(vector_ids)) - len(found)
+        return found
+
+    def put_many(self, chunks: Iterable[Dict[str, Any]]):
+        rows = [tuple(chunk[column] for column in _COLUMNS) for chunk in chunks]
+        if not rows:
+            return
+        vector_ids = list({row[0] for row in rows})
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                # A replaced row counts as a change too, so the running size is kept from the new keys
+                existing = 0
+                for i in range(0, len(vector_ids), _SQL_BATCH_SIZE):
+                    batch = vector_ids[i:i + _SQL_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    existing += self._conn.execute(
+                        f"SELECT COUNT(*) FROM chunks WHERE vector_id IN ({placeholders})", batch
+                    ).fetchone()[0]
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO chunks ({', '.join(_COLUMNS)}) VALUES ({','.join('?' * len(_COLUMNS))})",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._size += len(vector_ids) - existing
+
+    def delete_many(self, vector_ids: List[str]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany("DELETE FROM chunks WHERE vector_id = ?", [(vector_id,) for vector_id in vector_ids])
+                deleted = self._conn.total_changes - before
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._size -= deleted
+
+    def is_empty(self) -> bool:
+        return self._size == 0
+
+    def stats(self) -> dict:
+        return {"chunks": self._size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_chunk_store: Optional[ChunkContentStore] = None
+_chunk_store_lock = threading.Lock()
+
+
+def get_chunk_store() -> Optional[ChunkContentStore]:
+    """Return the process-wide chunk content store, or None unless CHUNK_CONTENT_SOURCE is local"""
+    global _chunk_store
+    if settings.CHUNK_CONTENT_SOURCE != "local":
+        return None
+    with _chunk_store_lock:
+        if _chunk_store is None:
+            _chunk_store = ChunkContentStore(settings.LOCAL_CHUNK_STORE_PATH)
+        return _chunk_store
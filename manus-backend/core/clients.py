@@ -0,0 +1,158 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from pinecone import Pinecone
+from supabase import create_client, Client
+
+from agent.settings import settings
+from core.answer_cache import AnswerCache, get_answer_cache
+from core.bm25_index import BM25Index, get_bm25_index
+from core.chunk_store import ChunkContentStore, get_chunk_store
+from core.concurrency import blocking_executor_stats
+from core.document_cache import DocumentCache
+from core.embedding_cache import EmbeddingCache, get_embedding_cache
+from core.ingest_journal import IngestJournal, get_ingest_journal
+from core.query_embedder import QueryEmbeddingBatcher, create_query_embedder
+from core.reranker import Reranker, get_reranker
+from core.vector_store import VectorStore, create_vector_store
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def _httpx_pool_stats(client: Any) -> Dict[str, Any]:
+    """Best-effort connection counts for an httpx client's underlying httpcore pool"""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return {}
+    return {
+        "connections": len(connections),
+        "idle_connections": sum(1 for connection in connections if connection.is_idle()),
+        "max_connections": getattr(pool, "_max_connections", None),
+        "max_keepalive_connections": getattr(pool, "_max_keepalive_connections", None)
+    }
+
+
+class ClientRegistry:
+    """Application-scoped API clients sharing keep-alive connection pools"""
+
+    def __init__(
+            self,
+            openai_client: Optional[AsyncOpenAI] = None,
+            supabase_client: Optional[Client] = None,
+            pinecone_client: Optional[Pinecone] = None,
+            embedding_cache: Optional[EmbeddingCache] = None,
+            vector_store: Optional[VectorStore] = None,
+            bm25_index: Optional[BM25Index] = None,
+            answer_cache: Optional[AnswerCache] = None,
+            chunk_store: Optional[ChunkContentStore] = None,
+            reranker: Optional[Reranker] = None,
+            ingest_journal: Optional[IngestJournal] = None,
+            query_embedder: Optional[QueryEmbeddingBatcher] = None,
+            document_cache: Optional[DocumentCache] = None
+    ):
+        self.openai = openai_client or AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=DefaultAsyncHttpxClient(limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+            ))
+        )
+        self.supabase = supabase_client or create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'))
+        # The PostgREST client is created lazily; build it now so worker threads never race on it
+        _ = self.supabase.postgrest
+        # Air-gapped deployments run on the local vector store and never talk to Pinecone
+        self.pinecone = pinecone_client
+        if self.pinecone is None and settings.VECTOR_STORE_BACKEND == "pinecone":
+            self.pinecone = Pinecone(
+                api_key=settings.PINECONE_API_KEY,
+                pool_threads=settings.PINECONE_POOL_THREADS
+            )
+        self.embedding_cache = embedding_cache or get_embedding_cache()
+        self.bm25_index = bm25_index or get_bm25_index()
+        self.answer_cache = answer_cache or get_answer_cache()
+        self.chunk_store = chunk_store or get_chunk_store()
+        self.reranker = reranker or get_reranker()
+        self.ingest_journal = ingest_journal or get_ingest_journal()
+        # Shared so questions from every chat worker land in the same batches
+        self.query_embedder = query_embedder or create_query_embedder(self.openai)
+        # Shared so ingest can drop a document that search has cached
+        self.document_cache = document_cache or DocumentCache()
+
+        self._vector_store = vector_store
+        self._vector_store_lock = threading.Lock()
+
+    @property
+    def vector_store(self) -> VectorStore:
+        """Shared vector store for the configured backend, created on first use"""
+        with self._vector_store_lock:
+            if self._vector_store is None:
+                self._vector_store = create_vector_store(self.pinecone)
+            return self._vector_store
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "openai": _httpx_pool_stats(getattr(self.openai, "_client", None)),
+            "supabase": _httpx_pool_stats(getattr(self.supabase.postgrest, "session", None)),
+            "vector_store": self._vector_store.stats() if self._vector_store else None,
+            "blocking_executor": blocking_executor_stats(),
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
+            "bm25_index": self.bm25_index.stats() if self.bm25_index else None,
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+            "chunk_store": self.chunk_store.stats() if self.chunk_store else None,
+            "reranker": self.reranker.stats() if self.reranker else None,
+            "ingest_journal": self.ingest_journal.stats() if self.ingest_journal else None,
+            "query_embedder": self.query_embedder.stats(),
+            "document_cache": self.document_cache.stats()
+        }
+
+    async def aclose(self):
+        await self.openai.close()
+        self.supabase.postgrest.session.close()
+        if self.embedding_cache:
+            self.embedding_cache.close()
+        if self._vector_store:
+            self._vector_store.close()
+        if self.bm25_index:
+            self.bm25_index.close()
+        if self.chunk_store:
+            self.chunk_store.close()
+        if self.ingest_journal:
+            self.ingest_journal.close()
+
+
+_clients: Optional[ClientRegistry] = None
+_clients_lock = threading.Lock()
+
+
+def init_clients(registry: Optional[ClientRegistry] = None) -> ClientRegistry:
+    """Install the application-wide client registry"""
+    global _clients
+    with _clients_lock:
+        _clients = registry or ClientRegistry()
+        return _clients
+
+
+def get_clients() -> ClientRegistry:
+    """Return the application-wide client registry, creating it on first use"""
+    global _clients
+    with _clients_lock:
+        if _clients is None:
+            _clients = ClientRegistry()
+        return _clients
+
+
+async def close_clients():
+    global _clients
+    with _clients_lock:
+        registry, _clients = _clients, None
+    if registry:
+        await registry.aclose()
@@ -0,0 +1,52 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from agent.settings import settings
+
+# The Supabase and Pinecone SDKs only expose blocking calls. They are run on a
+# dedicated, bounded thread pool so a slow request never stalls the event loop
+# and a burst of traffic cannot spawn an unbounded number of threads.
+_executor: Optional[ThreadPoolExecutor] = None
+_in_flight = 0
+_peak_in_flight = 0
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BLOCKING_IO_WORKERS,
+            thread_name_prefix="blocking-io"
+        )
+    return _executor
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking call on the I/O thread pool and await its result"""
+    global _in_flight, _peak_in_flight
+    loop = asyncio.get_running_loop()
+    _in_flight += 1
+    _peak_in_flight = max(_peak_in_flight, _in_flight)
+    try:
+        return await loop.run_in_executor(get_blocking_executor(), functools.partial(func, *args, **kwargs))
+    finally:
+        _in_flight -= 1
+
+
+def blocking_executor_stats() -> dict:
+    """Pool size and usage of the blocking I/O thread pool"""
+    return {
+        "max_workers": settings.BLOCKING_IO_WORKERS,
+        "threads": len(_executor._threads) if _executor else 0,
+        "in_flight": _in_flight,
+        "peak_in_flight": _peak_in_flight
+    }
+
+
+def shutdown_blocking_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
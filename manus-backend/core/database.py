@@ -1,14 +1,12 @@
-import os
-from dotenv import load_dotenv
 from fastapi import Depends
-from supabase import create_client, Client
+from supabase import Client
+from core.clients import get_clients
 from services.chat import ChatService
 from services.message import MessageService
 
-load_dotenv()
 
 def get_supabase_client() -> Client:
-    return create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'))
+    return get_clients().supabase
 
 def get_chat_service(db: Client = Depends(get_supabase_client)) -> ChatService:
     return ChatService(db)
@@ -0,0 +1,45 @@
+import threading
+import time
+from typing import Any, Dict, Iterable, Tuple
+
+# Search cites each chunk's document by name and path. Those rows are cached
+# briefly so a question does not re-read them, and shared through the client
+# registry so the ingest pipeline can drop a document the moment it is moved,
+# modified or deleted.
+_DOCUMENT_CACHE_TTL = 300
+
+
+class DocumentCache:
+    """In-process TTL cache of documents rows keyed by document ID"""
+
+    def __init__(self, ttl: float = _DOCUMENT_CACHE_TTL):
+        self.ttl = ttl
+        self._documents: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, document_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """The cached, unexpired rows among document_ids"""
+        now = time.monotonic()
+        documents = {}
+        with self._lock:
+            for document_id in document_ids:
+                cached = self._documents.get(document_id)
+                if cached is None:
+                    continue
+                if cached[0] > now:
+                    documents[document_id] = cached[1]
+                else:
+                    del self._documents[document_id]
+        return documents
+
+    def put(self, document_id: str, document: Dict[str, Any]):
+        with self._lock:
+            self._documents[document_id] = (time.monotonic() + self.ttl, document)
+
+    def invalidate(self, document_ids: Iterable[str]):
+        with self._lock:
+            for document_id in document_ids:
+                self._documents.pop(document_id, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._documents)}
@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional, Sequence
+
+from agent.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of bound parameters per statement
+_SQL_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    """Persistent, size-bounded LRU cache of embeddings keyed on (model, dimensions, sha256 of text)"""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, "
+            "embedding BLOB NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, dimensions: int, text: str) -> str:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return f"{model}:{dimensions}:{digest}"
+
+    def get_many(self, model: str, dimensions: int, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Look up embeddings for texts, returning None for every miss"""
+        keys = [self.make_key(model, dimensions, text) for text in texts]
+        found = {}
+
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH_SIZE):
+                batch = list(set(keys[i:i + _SQL_BATCH_SIZE]))
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = blob
+
+            if found:
+                self._touch(found)
+
+            results = []
+            for key in keys:
+                blob = found.get(key)
+                if blob is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(array('f', blob).tolist())
+
+        return results
+
+    def put_many(self, model: str, dimensions: int, texts: Sequence[str], embeddings: Sequence[List[float]]):
+        """Store embeddings for texts and evict the least recently used entries beyond max_entries"""
+        now = time.time()
+        rows = [
+            (self.make_key(model, dimensions, text), array('f', embedding).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, embedding, last_access) VALUES (?, ?, ?)", rows
+                )
+                self._size += self._conn.total_changes - before
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            if self._size > self.max_entries:
+                self._evict()
+
+    def get(self, model: str, dimensions: int, text: str) -> Optional[List[float]]:
+        return self.get_many(model, dimensions, [text])[0]
+
+    def put(self, model: str, dimensions: int, text: str, embedding: List[float]):
+        self.put_many(model, dimensions, [text], [embedding])
+
+    def _touch(self, keys):
+        """Mark keys as used now, in one transaction rather than one autocommitted write per key"""
+        now = time.time()
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in keys])
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self):
+        """Drop the least recently used entries, leaving 10% headroom to amortise evictions"""
+        target = int(self.max_entries * 0.9)
+        excess = self._size - target
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+            (excess,)
+        )
+        self.evictions += excess
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Evicted {excess} embeddings from cache")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide embedding cache, or None when caching is disabled"""
+    global _embedding_cache
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+        return _embedding_cache
@@ -17,4 +17,26 @@ class MessageStatus(Enum):
     PENDING = "pending"
     COMPLETED = "completed"
     FAILED = "failed"
-    IN_PROGRESS = "in_progress"
\ No newline at end of file
+    IN_PROGRESS = "in_progress"
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class DocumentStatus(Enum):
+    PENDING = "pending"
+    EMBEDDED = "embedded"
+    INDEXED = "indexed"
+    COMMITTED = "committed"
+    # A committed document whose chunks are being replaced by those of its modified file
+    UPDATING = "updating"
+
+
+class IngestStatus(Enum):
+    INGESTING = "ingesting"
+    DONE = "done"
+    FAILED = "failed"
@@ -1,13 +1,48 @@
 import asyncio
 import logging
+import os
+import time
+import weakref
+import zlib
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Set, Callable, Optional
+from typing import AsyncIterator, Dict, List, Set, Callable, Optional
 
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
+from core.concurrency import run_blocking
+from core.enums import IngestStatus
+from core.ingest_journal import IngestJournal
+from core.metrics import FILE_MONITOR_EVENT_LAG_SECONDS, FILE_MONITOR_EVENT_SECONDS, FILE_MONITOR_QUEUE_DEPTH, timed
+
 logger = logging.getLogger(__name__)
 
+# Result of a new event on a path that already has one pending; None cancels both
+_COALESCE = {
+    ('created', 'created'): 'created',
+    ('created', 'modified'): 'created',
+    ('created', 'deleted'): None,
+    ('modified', 'created'): 'modified',
+    ('modified', 'modified'): 'modified',
+    ('modified', 'deleted'): 'deleted',
+    # Editors that save by deleting and re-creating the file
+    ('deleted', 'created'): 'modified',
+    ('deleted', 'modified'): 'modified',
+    ('deleted', 'deleted'): 'deleted',
+}
+
+
+@dataclass
+class _PendingEvent:
+    event_type: str
+    src_path: Optional[str] = None
+    size: Optional[int] = None
+    timer: Optional[asyncio.TimerHandle] = None
+    # When the first of the coalesced events was seen, for the event lag metric
+    observed_at: float = field(default_factory=time.monotonic)
+
 
 class FileMonitor:
     """File system monitoring service with async queue processing"""
@@ -17,18 +52,32 @@ class FileMonitor:
             monitor_folder: str,
             allowed_extensions: Set[str] = None,
             recursive: bool = True,
-            file_processor: Optional[Callable] = None
+            file_processor: Optional[Callable] = None,
+            num_workers: int = 1,
+            journal: Optional[IngestJournal] = None,
+            debounce_seconds: float = 0.0
     ):
         self.monitor_folder = Path(monitor_folder)
         self.allowed_extensions = allowed_extensions or {'.pdf', '.docx', '.txt'}
         self.recursive = recursive
         self.file_processor = file_processor
+        self.num_workers = max(1, num_workers)
+        self.journal = journal
+        self.debounce_seconds = debounce_seconds
 
         # Internal state
         self.observer: Optional[Observer] = None
-        self.processing_task: Optional[asyncio.Task] = None
-        self.file_queue: Optional[asyncio.Queue] = None
+        # One queue per worker; a path always hashes to the same queue so its
+        # events are handled in the order they were observed
+        self.processing_tasks: List[asyncio.Task] = []
+        self.file_queues: List[asyncio.Queue] = []
         self.event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.backlog_task: Optional[asyncio.Task] = None
+        # Watcher events wait here, one per path, until the path has been quiet for debounce_seconds
+        self._pending: Dict[str, _PendingEvent] = {}
+        # A move is queued on its destination's worker but also touches the source path, which
+        # another worker may be ingesting; events hold the lock of every path they touch
+        self._path_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
         self.is_running = False
 
     async def start(self):
@@ -46,19 +95,17 @@ class FileMonitor:
             # Store event loop reference
             self.event_loop = asyncio.get_running_loop()
 
-            # Initialize queue
-            self.file_queue = asyncio.Queue()
-
-            # Start background processor
-            self.processing_task = asyncio.create_task(self._process_file_queue())
-
-            # Process all existing files first
-            await self._process_existing_files()
+            # Initialize queues and start background workers
+            self.file_queues = [asyncio.Queue() for _ in range(self.num_workers)]
+            self.processing_tasks = [
+                asyncio.create_task(self._process_file_queue(queue, worker_id))
+                for worker_id, queue in enumerate(self.file_queues)
+            ]
 
-            # Start file system monitoring
+            # Start file system monitoring before scanning so no change slips in between
             event_handler = FileEventHandler(
                 event_loop=self.event_loop,
-                file_queue=self.file_queue,
+                submit=self.submit_file_event,
                 allowed_extensions=self.allowed_extensions
             )
 
@@ -70,10 +117,14 @@ class FileMonitor:
             )
             self.observer.start()
 
+            # The backlog is worked through in the background so the app serves requests meanwhile
+            self.backlog_task = asyncio.create_task(self._process_existing_files())
+
             self.is_running = True
             logger.info(f"File monitor started for: {self.monitor_folder}")
             logger.info(f"Recursive monitoring: {self.recursive}")
             logger.info(f"Allowed extensions: {self.allowed_extensions}")
+            logger.info(f"Ingestion workers: {self.num_workers}")
 
             return True
 
@@ -95,14 +146,21 @@ class FileMonitor:
             self.observer.join()
             self.observer = None
 
-        # Cancel processing task
-        if self.processing_task:
-            self.processing_task.cancel()
-            try:
-                await self.processing_task
-            except asyncio.CancelledError:
-                pass
-            self.processing_task = None
+        # Events still being debounced are dropped; the journal diff picks them up on the next start
+        for path in list(self._pending):
+            self._discard(path)
+
+        # Cancel the startup backlog and processing tasks
+        if self.backlog_task:
+            self.backlog_task.cancel()
+            await asyncio.gather(self.backlog_task, return_exceptions=True)
+            self.backlog_task = None
+        for task in self.processing_tasks:
+            task.cancel()
+        await asyncio.gather(*self.processing_tasks, return_exceptions=True)
+        self.processing_tasks = []
+        # Whatever was still queued is dropped with the workers
+        FILE_MONITOR_QUEUE_DEPTH.labels().set(0)
 
         self.is_running = False
         logger.info("File monitor stopped")
@@ -111,36 +169,149 @@ class FileMonitor:
         """Set or update the file processor function"""
         self.file_processor = processor
 
-    async def _process_file_queue(self):
+    def _queue_for(self, file_path: str) -> asyncio.Queue:
+        return self.file_queues[zlib.crc32(file_path.encode()) % len(self.file_queues)]
+
+    def _put(self, event_type: str, file_path: str, src_path: Optional[str], observed_at: float):
+        self._queue_for(file_path).put_nowait((event_type, file_path, src_path, observed_at))
+        FILE_MONITOR_QUEUE_DEPTH.labels().inc()
+
+    async def enqueue_file_event(self, event_type: str, file_path: str, src_path: Optional[str] = None):
+        """Queue a file event on the worker that owns its path"""
+        self._put(event_type, file_path, src_path, time.monotonic())
+
+    def submit_file_event(self, event_type: str, file_path: str, src_path: Optional[str] = None):
+        """Coalesce a watcher event with whatever is pending for the path and restart its debounce timer.
+
+        Runs on the event loop. A move is keyed by its destination and carries
+        the source path along.
+        """
+        if event_type == 'moved':
+            self._submit_move(src_path, file_path)
+            return
+
+        pending = self._pending.get(file_path)
+        if pending is not None and pending.event_type == 'moved':
+            # Apply the rename first so what follows acts on the renamed document
+            self._emit(file_path)
+            pending = None
+
+        if pending is None:
+            pending = _PendingEvent(event_type)
+        else:
+            combined = _COALESCE[(pending.event_type, event_type)]
+            if combined is None:
+                logger.info(f"Ignoring {file_path}, created and deleted within the debounce window")
+                self._discard(file_path)
+                return
+            pending.event_type = combined
+        self._schedule(file_path, pending)
+
+    def _submit_move(self, src_path: str, dest_path: str):
+        pending = self._discard(src_path)
+        if pending is not None and pending.event_type == 'created':
+            # Never ingested under its old name
+            self.submit_file_event('created', dest_path)
+            return
+        if pending is not None and pending.event_type == 'moved':
+            src_path = pending.src_path
+
+        # The move replaces whatever was at the destination
+        self._discard(dest_path)
+        self._schedule(dest_path, _PendingEvent('moved', src_path))
+        if pending is not None and pending.event_type == 'modified':
+            self.submit_file_event('modified', dest_path)
+
+    def _schedule(self, file_path: str, pending: _PendingEvent):
+        if pending.timer:
+            pending.timer.cancel()
+        if pending.event_type in ('created', 'modified'):
+            pending.size = self._file_size(file_path)
+        pending.timer = self.event_loop.call_later(self.debounce_seconds, self._flush, file_path)
+        self._pending[file_path] = pending
+
+    def _discard(self, file_path: str) -> Optional[_PendingEvent]:
+        pending = self._pending.pop(file_path, None)
+        if pending is not None and pending.timer:
+            pending.timer.cancel()
+        return pending
+
+    @staticmethod
+    def _file_size(file_path: str) -> Optional[int]:
+        try:
+            return os.stat(file_path).st_size
+        except FileNotFoundError:
+            return None
+
+    def _flush(self, file_path: str):
+        """Debounce window elapsed; queue the event unless the file is still being written"""
+        pending = self._pending.get(file_path)
+        if pending is None:
+            return
+        if pending.event_type in ('created', 'modified'):
+            size = self._file_size(file_path)
+            if size is None:
+                # Gone again; its deletion event is on the way
+                self._discard(file_path)
+                return
+            if size != pending.size:
+                logger.debug(f"{file_path} is still growing, waiting another {self.debounce_seconds}s")
+                self._schedule(file_path, pending)
+                return
+        self._emit(file_path)
+
+    def _emit(self, file_path: str):
+        pending = self._discard(file_path)
+        self._put(pending.event_type, file_path, pending.src_path, pending.observed_at)
+
+    @asynccontextmanager
+    async def _lock_paths(self, *paths: Optional[str]) -> AsyncIterator[None]:
+        """Hold the locks of the given paths, taken in sorted order so two events can never deadlock"""
+        async with AsyncExitStack() as stack:
+            for path in sorted({path for path in paths if path}):
+                lock = self._path_locks.get(path)
+                if lock is None:
+                    lock = self._path_locks[path] = asyncio.Lock()
+                await stack.enter_async_context(lock)
+            yield
+
+    async def _process_file_queue(self, file_queue: asyncio.Queue, worker_id: int):
         """Background task to process files from the queue"""
-        logger.info("File queue processor started")
+        logger.info(f"File queue processor {worker_id} started")
 
         while True:
             try:
                 # Wait for a file event
-                event_type, file_path = await self.file_queue.get()
+                event_type, file_path, src_path, observed_at = await file_queue.get()
+                FILE_MONITOR_QUEUE_DEPTH.labels().dec()
+                FILE_MONITOR_EVENT_LAG_SECONDS.labels(event_type=event_type).observe(time.monotonic() - observed_at)
 
                 # Process the file event
-                await self._handle_file_event(event_type, file_path)
+                async with self._lock_paths(file_path, src_path):
+                    with timed(FILE_MONITOR_EVENT_SECONDS, event_type=event_type):
+                        await self._handle_file_event(event_type, file_path, src_path)
 
                 # Mark task as done
-                self.file_queue.task_done()
+                file_queue.task_done()
 
             except asyncio.CancelledError:
-                logger.info("File queue processor cancelled")
+                logger.info(f"File queue processor {worker_id} cancelled")
                 break
             except Exception as e:
                 logger.error(f"Error in file queue processor: {e}")
                 await asyncio.sleep(1)
 
-    async def _handle_file_event(self, event_type: str, file_path: str):
+    async def _handle_file_event(self, event_type: str, file_path: str, src_path: Optional[str] = None):
         """Handle different types of file events"""
         try:
             logger.info(f"Handling {event_type} event for: {file_path}")
 
             if self.file_processor:
                 # Call the registered file processor
-                result = await self.file_processor(event_type, file_path)
+                if src_path:
+                    result = await self.file_processor(event_type, file_path, src_path)
+                else:
+                    result = await self.file_processor(event_type, file_path)
                 if result:
                     logger.info(f"Successfully processed {event_type} event for: {file_path}")
                 else:
@@ -151,8 +322,24 @@ class FileMonitor:
         except Exception as e:
             logger.error(f"Error handling {event_type} event for {file_path}: {e}")
 
+    def _startup_event(self, file_path: Path, journal_entries: dict) -> Optional[str]:
+        """Event to queue for a file found at startup, or None when the journal says it is unchanged"""
+        entry = journal_entries.pop(str(file_path), None)
+        if entry is None:
+            return 'startup'
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            return None
+        if entry.matches(stat.st_size, stat.st_mtime_ns):
+            return None
+        if entry.status == IngestStatus.DONE:
+            return 'modified'
+        # Interrupted or failed; resume into the document it was being stored as, if it got that far
+        return 'resume' if entry.document_id else 'startup'
+
     async def _process_existing_files(self):
-        """Process all existing files in the monitored folder"""
+        """Queue the files that are new or changed since the last run, and deletions made while stopped"""
         logger.info("Scanning for existing files to process...")
 
         try:
@@ -173,20 +360,22 @@ class FileMonitor:
             # Remove duplicates and sort for consistent processing order
             existing_files = sorted(set(existing_files))
 
-            if not existing_files:
-                logger.info("No existing files found to process")
-                return
+            journal_entries = await run_blocking(self.journal.entries) if self.journal else {}
 
-            logger.info(f"Found {len(existing_files)} existing files to process")
+            logger.info(f"Found {len(existing_files)} existing files, {len(journal_entries)} in the ingest journal")
 
             # Process each file
             processed_count = 0
+            skipped_count = 0
             failed_count = 0
 
             for file_path in existing_files:
                 try:
-                    # Queue the file for processing as 'startup' event
-                    await self.file_queue.put(('startup', str(file_path)))
+                    event_type = self._startup_event(file_path, journal_entries)
+                    if event_type is None:
+                        skipped_count += 1
+                        continue
+                    await self.enqueue_file_event(event_type, str(file_path))
                     processed_count += 1
 
                     # Add small delay to prevent overwhelming the system
@@ -197,26 +386,28 @@ class FileMonitor:
                     logger.error(f"Error queuing existing file {file_path}: {e}")
                     failed_count += 1
 
-            logger.info(f"Queued {processed_count} existing files for processing")
+            # Whatever the journal still lists is gone from disk
+            for file_path in journal_entries:
+                await self.enqueue_file_event('deleted', file_path)
+
+            logger.info(f"Queued {processed_count} existing files for processing, skipped {skipped_count} unchanged, "
+                        f"{len(journal_entries)} deleted while stopped")
             if failed_count > 0:
                 logger.warning(f"Failed to queue {failed_count} files")
 
-            # Wait for all existing files to be processed before starting monitoring
-            logger.info("Waiting for existing files to be processed...")
-            await self.file_queue.join()
+            await asyncio.gather(*(queue.join() for queue in self.file_queues))
             logger.info("All existing files have been processed")
 
         except Exception as e:
             logger.error(f"Error processing existing files: {e}")
-            raise
 
 
 class FileEventHandler(FileSystemEventHandler):
     """Handle file system events and queue them for processing"""
 
-    def __init__(self, event_loop: asyncio.AbstractEventLoop, file_queue: asyncio.Queue, allowed_extensions: Set[str]):
+    def __init__(self, event_loop: asyncio.AbstractEventLoop, submit: Callable, allowed_extensions: Set[str]):
         self.event_loop = event_loop
-        self.file_queue = file_queue
+        self.submit = submit
         self.allowed_extensions = allowed_extensions
 
     def _should_process_file(self, file_path: str) -> bool:
@@ -224,14 +415,11 @@ class FileEventHandler(FileSystemEventHandler):
         file_ext = Path(file_path).suffix.lower()
         return file_ext in self.allowed_extensions
 
-    def _queue_file_event(self, event_type: str, file_path: str):
-        """Queue a file event for processing"""
+    def _queue_file_event(self, event_type: str, file_path: str, src_path: Optional[str] = None):
+        """Hand a file event to the monitor on its event loop"""
         if self._should_process_file(file_path):
             logger.debug(f"Queuing {event_type} event for: {file_path}")
-            asyncio.run_coroutine_threadsafe(
-                self.file_queue.put((event_type, file_path)),
-                self.event_loop
-            )
+            self.event_loop.call_soon_threadsafe(self.submit, event_type, file_path, src_path)
 
     def on_created(self, event):
         if not event.is_directory:
@@ -246,4 +434,17 @@ class FileEventHandler(FileSystemEventHandler):
     def on_deleted(self, event):
         if not event.is_directory:
             logger.info(f"File deleted: {event.src_path}")
-            self._queue_file_event('deleted', event.src_path)
\ No newline at end of file
+            self._queue_file_event('deleted', event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        logger.info(f"File moved: {event.src_path} -> {event.dest_path}")
+        if self._should_process_file(event.src_path):
+            if self._should_process_file(event.dest_path):
+                self._queue_file_event('moved', event.dest_path, event.src_path)
+            else:
+                self._queue_file_event('deleted', event.src_path)
+        else:
+            # e.g. an editor's temporary file renamed over the document
+            self._queue_file_event('created', event.dest_path)
\ No newline at end of file
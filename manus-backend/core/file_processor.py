@@ -1,20 +1,29 @@
 import logging
 from pathlib import Path
+from typing import Optional
 from agent.document_processor import DocumentProcessor
+from core.clients import ClientRegistry
 
 logger = logging.getLogger(__name__)
 
 
 class FileProcessor:
-    def __init__(self):
-        self.document_processor = DocumentProcessor()
+    def __init__(self, clients: Optional[ClientRegistry] = None):
+        self.document_processor = DocumentProcessor(clients)
 
-    async def process_file_event(self, event_type: str, file_path: str) -> bool:
-        """Process different types of file events"""
+    def close(self):
+        """Release resources held by the document processor"""
+        self.document_processor.close()
+
+    async def process_file_event(self, event_type: str, file_path: str, src_path: Optional[str] = None) -> bool:
+        """Process different types of file events; for 'moved', src_path is where the file came from"""
         try:
             if event_type == 'deleted':
                 return await self._handle_file_deletion(file_path)
-            elif event_type in ['created', 'modified', 'startup']:
+            elif event_type == 'moved':
+                await self.document_processor.rename_document(src_path, file_path)
+                return True
+            elif event_type in ['created', 'modified', 'startup', 'resume']:
                 return await self._post_process_content(file_path, event_type)
             else:
                 logger.warning(f"Unknown event type: {event_type}")
@@ -59,8 +68,9 @@ class FileProcessor:
             if event_type == 'startup' or event_type == 'created':
                 await self.document_processor.process_document(file_path)
             elif event_type == 'modified':
-                # todo
-                pass
+                await self.document_processor.update_document(file_path)
+            elif event_type == 'resume':
+                await self.document_processor.resume_document(file_path)
 
             logger.info(f"Successfully processed {event_type} file: {file_path}")
             return True
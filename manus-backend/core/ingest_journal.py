@@ -0,0 +1,137 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from agent.settings import settings
+from core.enums import IngestStatus
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JournalEntry:
+    path: str
+    size: int
+    mtime_ns: int
+    status: IngestStatus
+    file_hash: Optional[str] = None
+    document_id: Optional[str] = None
+
+    def matches(self, size: int, mtime_ns: int) -> bool:
+        """True when the file on disk still looks like the one that was ingested"""
+        return self.status == IngestStatus.DONE and (self.size, self.mtime_ns) == (size, mtime_ns)
+
+
+class IngestJournal:
+    """Local record of every file ingested from the data room.
+
+    Keyed by path with the size and mtime seen when ingestion started, so a
+    restart can tell unchanged files apart without opening them. An entry stays
+    'ingesting' until the document is fully stored; one left in that state (or
+    'failed') was interrupted and is picked up again on the next start.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, "
+            "size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, "
+            "status TEXT NOT NULL, "
+            "file_hash TEXT, "
+            "document_id TEXT, "
+            "updated_at REAL NOT NULL)"
+        )
+
+    def get(self, path: str) -> Optional[JournalEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, size, mtime_ns, status, file_hash, document_id FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        return self._entry(row) if row else None
+
+    def entries(self) -> Dict[str, JournalEntry]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns, status, file_hash, document_id FROM files"
+            ).fetchall()
+        return {row[0]: self._entry(row) for row in rows}
+
+    @staticmethod
+    def _entry(row) -> JournalEntry:
+        path, size, mtime_ns, status, file_hash, document_id = row
+        return JournalEntry(path, size, mtime_ns, IngestStatus(status), file_hash, document_id)
+
+    def record(self, path: str, size: int, mtime_ns: int, status: IngestStatus,
+               file_hash: Optional[str] = None, document_id: Optional[str] = None):
+        """Insert or update the entry for path; a None hash or document ID keeps the stored one"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO files (path, size, mtime_ns, status, file_hash, document_id, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                "status = excluded.status, file_hash = COALESCE(excluded.file_hash, files.file_hash), "
+                "document_id = COALESCE(excluded.document_id, files.document_id), updated_at = excluded.updated_at",
+                (path, size, mtime_ns, status.value, file_hash, document_id, time.time())
+            )
+
+    def set_status(self, path: str, status: IngestStatus):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE files SET status = ?, updated_at = ? WHERE path = ?", (status.value, time.time(), path)
+            )
+
+    def rename(self, src_path: str, dest_path: str):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM files WHERE path = ?", (dest_path,))
+                self._conn.execute(
+                    "UPDATE files SET path = ?, updated_at = ? WHERE path = ?", (dest_path, time.time(), src_path)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove(self, path: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall()
+        return {"files": sum(count for _, count in rows), **{status: count for status, count in rows}}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_ingest_journal: Optional[IngestJournal] = None
+_ingest_journal_lock = threading.Lock()
+
+
+def get_ingest_journal() -> Optional[IngestJournal]:
+    """Return the process-wide ingest journal, or None when it is disabled"""
+    global _ingest_journal
+    if not settings.INGEST_JOURNAL_ENABLED:
+        return None
+    with _ingest_journal_lock:
+        if _ingest_journal is None:
+            _ingest_journal = IngestJournal(settings.INGEST_JOURNAL_PATH)
+        return _ingest_journal
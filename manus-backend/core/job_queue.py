@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from core.enums import JobStatus
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+@dataclass
+class Job:
+    chat_id: str
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: JobStatus = JobStatus.QUEUED
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class ChatJobQueue:
+    """Bounded in-process queue that answers chats on a fixed pool of worker tasks"""
+
+    def __init__(
+            self,
+            handler: Callable[[str], Awaitable],
+            num_workers: int = 4,
+            max_size: int = 100,
+            max_finished_jobs: int = 1000
+    ):
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        self.max_size = max_size
+        self.max_finished_jobs = max_finished_jobs
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # A chat with a job still waiting in the queue reuses it, since one run
+        # answers every pending message of the chat
+        self.queued_by_chat: Dict[str, Job] = {}
+        self.accepting = False
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self.workers = [asyncio.create_task(self._worker(worker_id)) for worker_id in range(self.num_workers)]
+        self.accepting = True
+        logger.info(f"Chat job queue started with {self.num_workers} workers (capacity {self.max_size})")
+
+    def is_full(self) -> bool:
+        return not self.accepting or self.queue.full()
+
+    def submit(self, chat_id: str) -> Job:
+        """Queue a job for the chat, raising QueueFullError when there is no capacity left"""
+        if not self.accepting:
+            raise QueueFullError("Job queue is shutting down")
+
+        queued = self.queued_by_chat.get(chat_id)
+        if queued:
+            return queued
+
+        job = Job(chat_id=chat_id)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError("Job queue is full")
+
+        self.jobs[job.id] = job
+        self.queued_by_chat[chat_id] = job
+        self._prune()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished_jobs"""
+        finished = [job_id for job_id, job in self.jobs.items()
+                    if job.status in (JobStatus.COMPLETED, JobStatus.FAILED)]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self.queue.get()
+            try:
+                if self.queued_by_chat.get(job.chat_id) is job:
+                    del self.queued_by_chat[job.chat_id]
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.now(timezone.utc)
+                await self.handler(job.chat_id)
+                job.status = JobStatus.COMPLETED
+            except asyncio.CancelledError:
+                job.status = JobStatus.FAILED
+                job.error = "Cancelled during shutdown"
+                raise
+            except Exception as e:
+                logger.error(f"Chat job {job.id} for chat {job.chat_id} failed on worker {worker_id}: {e}")
+                job.status = JobStatus.FAILED
+                job.error = str(e)
+            finally:
+                job.finished_at = datetime.now(timezone.utc)
+                self.queue.task_done()
+
+    async def drain(self, timeout: float):
+        """Stop accepting jobs, let queued ones finish for up to timeout seconds, then cancel the rest"""
+        self.accepting = False
+        if self.queue is None:
+            return
+
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=timeout)
+            logger.info("Chat job queue drained")
+        except asyncio.TimeoutError:
+            logger.warning(f"Chat job queue did not drain within {timeout}s, cancelling remaining jobs")
+
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+        # Jobs no worker reached are failed too; their chats' messages are still pending
+        # and are answered after the next start
+        now = datetime.now(timezone.utc)
+        for job in self.queued_by_chat.values():
+            job.status = JobStatus.FAILED
+            job.error = "Cancelled during shutdown"
+            job.finished_at = now
+        self.queued_by_chat.clear()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.num_workers,
+            "capacity": self.max_size,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "running": sum(1 for job in self.jobs.values() if job.status == JobStatus.RUNNING),
+            "accepting": self.accepting
+        }
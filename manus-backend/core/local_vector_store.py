@@ -0,0 +1,397 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+_INITIAL_CAPACITY = 1024
+# Faiss rule of thumb: k-means needs ~39 points per centroid to be meaningful
+_MIN_POINTS_PER_LIST = 39
+_TRAINING_POINTS_PER_LIST = 256
+_KMEANS_ITERATIONS = 10
+_ASSIGN_BATCH_SIZE = 65536
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store for air-gapped and test deployments.
+
+    Vectors are L2-normalised and kept in a memory-mapped float32 matrix
+    (vectors.f32) so cosine similarity is a single matrix-vector product. Slot
+    assignments and metadata live in SQLite next to it. With ivf_lists > 0 an
+    inverted-file index is trained by the write that makes the corpus large
+    enough, and retrained once it doubles; its centroids and each vector's list
+    are persisted in SQLite too. Queries only scan the ivf_probes lists whose
+    centroids are closest, and scan without holding the store lock.
+    """
+
+    def __init__(self, path: str, dimensions: int, ivf_lists: int = 0, ivf_probes: int = 8):
+        self.path = path
+        self.dimensions = dimensions
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self._lock = threading.RLock()
+        # Held for a whole training run, so two writers never train at once
+        self._train_lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.f32")
+
+        self._conn = sqlite3.connect(os.path.join(path, "index.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "slot INTEGER PRIMARY KEY, "
+            "id TEXT NOT NULL UNIQUE, "
+            "metadata TEXT NOT NULL, "
+            "list INTEGER NOT NULL DEFAULT -1)"
+        )
+        if "list" not in {column[1] for column in self._conn.execute("PRAGMA table_info(vectors)")}:
+            # Stores created before the IVF state was persisted
+            self._conn.execute("ALTER TABLE vectors ADD COLUMN list INTEGER NOT NULL DEFAULT -1")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ivf ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), "
+            "lists INTEGER NOT NULL, "
+            "trained_size INTEGER NOT NULL, "
+            "centroids BLOB NOT NULL)"
+        )
+
+        rows = self._conn.execute("SELECT slot, id, metadata, list FROM vectors").fetchall()
+        self._count = max((row[0] for row in rows), default=-1) + 1
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = [None] * self._count
+        self._metadata: List[Optional[Dict[str, Any]]] = [None] * self._count
+        for slot, vector_id, metadata, _ in rows:
+            self._slots[vector_id] = slot
+            self._ids[slot] = vector_id
+            self._metadata[slot] = json.loads(metadata)
+        self._free = [slot for slot in range(self._count) if self._ids[slot] is None]
+
+        row_bytes = 4 * dimensions
+        existing_rows = os.path.getsize(self._vectors_path) // row_bytes if os.path.exists(self._vectors_path) else 0
+        self._capacity = max(_INITIAL_CAPACITY, existing_rows, self._count)
+        self._vectors = self._open_matrix(self._capacity)
+        self._valid = np.zeros(self._capacity, dtype=bool)
+        self._valid[[self._slots[vector_id] for vector_id in self._slots]] = True
+
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.full(self._capacity, -1, dtype=np.int32)
+        self._trained_size = 0
+        # Inverted lists are derived from the assignments on the first query after a write;
+        # the version tells a query whether the lists it built are still current
+        self._lists: Optional[List[np.ndarray]] = None
+        self._version = 0
+        # Slots written while a training run is in progress, assigned again when it finishes
+        self._written_during_training: Optional[set] = None
+
+        self._load_ivf(rows)
+        # A store that outgrew its persisted centroids, or never had any, is trained when
+        # opened rather than left to brute-force scans until the next write
+        self._train()
+
+    def _load_ivf(self, rows: List[Tuple[int, str, str, int]]):
+        row = self._conn.execute("SELECT lists, trained_size, centroids FROM ivf").fetchone()
+        if row is None or row[0] != self.ivf_lists or len(row[2]) != 4 * self.ivf_lists * self.dimensions:
+            # Trained for another ivf_lists, if at all; retrained when large enough
+            return
+        self._centroids = np.frombuffer(row[2], dtype=np.float32).reshape(self.ivf_lists, self.dimensions).copy()
+        self._trained_size = row[1]
+        for slot, _, _, assigned in rows:
+            self._assignments[slot] = assigned
+
+        # Vectors written while IVF was switched off have no list yet
+        missing = np.flatnonzero(self._valid[:self._count] & (self._assignments[:self._count] < 0))
+        if len(missing):
+            self._assignments[missing] = np.argmax(self._vectors[missing] @ self._centroids.T, axis=1)
+            self._write_rows(missing.tolist())
+
+    def _open_matrix(self, capacity: int) -> np.memmap:
+        size = capacity * self.dimensions * 4
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimensions))
+
+    def _ensure_capacity(self, rows: int):
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2)
+        self._vectors.flush()
+        del self._vectors
+        self._vectors = self._open_matrix(capacity)
+        self._valid = np.concatenate([self._valid, np.zeros(capacity - self._capacity, dtype=bool)])
+        self._assignments = np.concatenate([self._assignments, np.full(capacity - self._capacity, -1, dtype=np.int32)])
+        self._capacity = capacity
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        if not vectors:
+            return
+        matrix = self._normalize(np.asarray([vector['values'] for vector in vectors], dtype=np.float32))
+        if matrix.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {matrix.shape[1]}")
+
+        with self._lock:
+            slots = []
+            for vector in vectors:
+                slot = self._slots.get(vector['id'])
+                if slot is None:
+                    slot = self._free.pop() if self._free else self._count
+                    self._count = max(self._count, slot + 1)
+                    self._slots[vector['id']] = slot
+                slots.append(slot)
+
+            self._ensure_capacity(self._count)
+            if len(self._ids) < self._count:
+                grow = self._count - len(self._ids)
+                self._ids.extend([None] * grow)
+                self._metadata.extend([None] * grow)
+
+            slot_array = np.asarray(slots)
+            self._vectors[slot_array] = matrix
+            self._vectors.flush()
+            self._valid[slot_array] = True
+            for slot, vector in zip(slots, vectors):
+                self._ids[slot] = vector['id']
+                self._metadata[slot] = vector.get('metadata') or {}
+
+            if self._centroids is not None:
+                self._assignments[slot_array] = np.argmax(matrix @ self._centroids.T, axis=1)
+                self._invalidate_lists()
+            if self._written_during_training is not None:
+                self._written_during_training.update(slots)
+
+            # Vectors are flushed first so a committed row always has its embedding on disk
+            self._write_rows(slots)
+
+        self._train()
+
+    def _write_rows(self, slots: List[int]):
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (slot, id, metadata, list) VALUES (?, ?, ?, ?)",
+                [(slot, self._ids[slot], json.dumps(self._metadata[slot]), int(self._assignments[slot]))
+                 for slot in slots]
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def update_metadata(self, vector_id: str, metadata: Dict[str, Any]):
+        with self._lock:
+            slot = self._slots.get(vector_id)
+            if slot is None:
+                return
+            self._metadata[slot] = {**self._metadata[slot], **metadata}
+            self._write_rows([slot])
+
+    def update_metadata_many(self, updates: List[Tuple[str, Dict[str, Any]]]):
+        with self._lock:
+            slots = []
+            for vector_id, metadata in updates:
+                slot = self._slots.get(vector_id)
+                if slot is not None:
+                    self._metadata[slot] = {**self._metadata[slot], **metadata}
+                    slots.append(slot)
+            if slots:
+                self._write_rows(slots)
+
+    def delete(self, vector_ids: List[str]):
+        with self._lock:
+            slots = [self._slots.pop(vector_id) for vector_id in vector_ids if vector_id in self._slots]
+            if not slots:
+                return
+            for slot in slots:
+                self._ids[slot] = None
+                self._metadata[slot] = None
+            self._valid[slots] = False
+            self._assignments[slots] = -1
+            self._free.extend(slots)
+            self._invalidate_lists()
+            self._conn.executemany("DELETE FROM vectors WHERE slot = ?", [(slot,) for slot in slots])
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            self.delete([vector_id for vector_id in self._slots if vector_id.startswith(prefix)])
+
+    def _invalidate_lists(self):
+        self._lists = None
+        self._version += 1
+
+    def _needs_training(self) -> bool:
+        """Whether there is enough data for IVF, and the corpus has doubled since it was last trained"""
+        live = len(self._slots)
+        if self.ivf_lists <= 0 or live < self.ivf_lists * _MIN_POINTS_PER_LIST:
+            return False
+        return self._centroids is None or live >= 2 * self._trained_size
+
+    def _train(self):
+        """Train the IVF centroids if needed and persist them with every vector's list.
+
+        k-means and assigning the corpus run outside the store lock, so queries
+        and writes carry on meanwhile.
+        """
+        if not self._train_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                if not self._needs_training():
+                    return
+                live_slots = np.flatnonzero(self._valid[:self._count])
+                vectors = self._vectors
+                self._written_during_training = set()
+
+            try:
+                centroids, assignments = self._kmeans(vectors, live_slots)
+            except Exception:
+                with self._lock:
+                    self._written_during_training = None
+                raise
+
+            with self._lock:
+                self._assignments[live_slots] = assignments
+                written = np.asarray(sorted(self._written_during_training), dtype=np.int64)
+                self._written_during_training = None
+                if len(written):
+                    self._assignments[written] = np.argmax(self._vectors[written] @ centroids.T, axis=1)
+                # Deleted during training
+                self._assignments[~self._valid] = -1
+
+                self._centroids = centroids
+                self._trained_size = len(live_slots)
+                self._invalidate_lists()
+                self._write_ivf()
+            logger.info(f"Trained IVF index with {self.ivf_lists} lists on {len(live_slots)} vectors")
+        finally:
+            self._train_lock.release()
+
+    def _kmeans(self, vectors: np.ndarray, live_slots: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Centroids trained on a sample of live_slots, and the list of each of live_slots"""
+        rng = np.random.default_rng(0)
+        sample_size = min(len(live_slots), self.ivf_lists * _TRAINING_POINTS_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(live_slots, sample_size, replace=False))])
+
+        # Spherical k-means: vectors are unit length, so the nearest centroid is the largest dot product
+        centroids = sample[rng.choice(sample_size, self.ivf_lists, replace=False)].copy()
+        for _ in range(_KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=self.ivf_lists) == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = self._normalize(sums)
+
+        assignments = np.empty(len(live_slots), dtype=np.int32)
+        for i in range(0, len(live_slots), _ASSIGN_BATCH_SIZE):
+            batch = live_slots[i:i + _ASSIGN_BATCH_SIZE]
+            assignments[i:i + _ASSIGN_BATCH_SIZE] = np.argmax(vectors[batch] @ centroids.T, axis=1)
+        return centroids, assignments
+
+    def _write_ivf(self):
+        """Persist the centroids and every live vector's list in one transaction"""
+        live_slots = np.flatnonzero(self._valid[:self._count])
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ivf (id, lists, trained_size, centroids) VALUES (0, ?, ?, ?)",
+                (self.ivf_lists, self._trained_size, self._centroids.astype(np.float32).tobytes())
+            )
+            self._conn.executemany(
+                "UPDATE vectors SET list = ? WHERE slot = ?",
+                zip(self._assignments[live_slots].tolist(), live_slots.tolist())
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _build_lists(self, assignments: np.ndarray) -> List[np.ndarray]:
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(self.ivf_lists + 1))
+        return [order[bounds[i]:bounds[i + 1]] for i in range(self.ivf_lists)]
+
+    def query(self, vector: List[float], top_k: int) -> List[Dict[str, Any]]:
+        query = self._normalize(np.asarray(vector, dtype=np.float32))
+
+        # Only references and small copies are taken under the lock. Writers replace the
+        # centroids and lists rather than mutate them, and results are checked against the
+        # current slots afterwards, so the scan itself does not block writes or other queries
+        with self._lock:
+            if not self._slots or top_k <= 0:
+                return []
+            count = self._count
+            vectors = self._vectors
+            centroids = self._centroids
+            lists = self._lists
+            version = self._version
+            if centroids is None:
+                valid = self._valid[:count].copy()
+            elif lists is None:
+                assignments = self._assignments[:count].copy()
+
+        if centroids is not None:
+            if lists is None:
+                lists = self._build_lists(assignments)
+                with self._lock:
+                    if self._version == version:
+                        self._lists = lists
+            probes = min(self.ivf_probes, self.ivf_lists)
+            nearest = np.argpartition(-(centroids @ query), probes - 1)[:probes]
+            candidates = np.concatenate([lists[i] for i in nearest])
+            scores = vectors[candidates] @ query
+        else:
+            candidates = None
+            scores = np.asarray(vectors[:count] @ query)
+            scores[~valid] = -np.inf
+
+        k = min(top_k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        with self._lock:
+            for i in top:
+                if not np.isfinite(scores[i]):
+                    break
+                slot = int(candidates[i]) if candidates is not None else int(i)
+                # Deleted since the scan
+                if self._ids[slot] is None:
+                    continue
+                results.append({
+                    'id': self._ids[slot],
+                    'score': float(scores[i]),
+                    'metadata': dict(self._metadata[slot])
+                })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "local",
+            "path": self.path,
+            "vectors": len(self._slots),
+            "capacity": self._capacity,
+            "ivf_lists": self.ivf_lists if self._centroids is not None else 0,
+            "ivf_probes": self.ivf_probes
+        }
+
+    def close(self):
+        with self._train_lock, self._lock:
+            self._vectors.flush()
+            self._conn.close()
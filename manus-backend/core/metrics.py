@@ -0,0 +1,287 @@
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Process-wide counters, gauges and histograms rendered in the Prometheus text
+# format by GET /metrics. Metrics are declared once at the bottom of this
+# module and updated from the code they measure, e.g.
+#
+#     with timed(VECTOR_STORE_SECONDS, operation="query"):
+#         ...
+#
+# Label values should come from small fixed sets (stage, file type, route
+# template), never from file names or IDs.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_string(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    """Monotonically increasing value"""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name: str, labels: Sequence[Tuple[str, str]]) -> List[str]:
+        return [f"{name}{_label_string(labels)} {_format_value(self.value)}"]
+
+
+class Gauge:
+    """Value that goes up and down"""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def samples(self, name: str, labels: Sequence[Tuple[str, str]]) -> List[str]:
+        return [f"{name}{_label_string(labels)} {_format_value(self.value)}"]
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram, cumulative like a Prometheus histogram"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = sorted(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def _cumulative(self) -> Tuple[List[Tuple[float, int]], int, float]:
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self.count, self.sum
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + [math.inf], counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return cumulative, count, total
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Count, sum, mean and the cumulative count at or below each bucket bound"""
+        cumulative, count, total = self._cumulative()
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "mean": round(total / count, 6) if count else 0.0,
+            "buckets": {_format_value(float(bound)): running for bound, running in cumulative}
+        }
+
+    def samples(self, name: str, labels: Sequence[Tuple[str, str]]) -> List[str]:
+        cumulative, count, total = self._cumulative()
+        lines = [
+            f"{name}_bucket{_label_string(list(labels) + [('le', _format_value(float(bound)))])} {running}"
+            for bound, running in cumulative
+        ]
+        lines.append(f"{name}_sum{_label_string(labels)} {_format_value(float(total))}")
+        lines.append(f"{name}_count{_label_string(labels)} {count}")
+        return lines
+
+
+class MetricFamily:
+    """A named metric with one child per combination of label values"""
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames: Sequence[str], factory: Callable):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels) -> Any:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._factory()
+            return child
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Each child's value, or histogram snapshot, keyed by its comma-joined label values"""
+        with self._lock:
+            children = sorted(self._children.items())
+        return {",".join(key): child.snapshot() if self.kind == "histogram" else child.value
+                for key, child in children}
+
+    def render(self) -> List[str]:
+        # Counters are exposed with the conventional _total suffix
+        name = f"{self.name}_total" if self.kind == "counter" else self.name
+        lines = [f"# HELP {name} {self.documentation}", f"# TYPE {name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(child.samples(name, list(zip(self.labelnames, key))))
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        with self._lock:
+            if family.name in self._families:
+                raise ValueError(f"Metric {family.name} is already registered")
+            self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily("counter", name, documentation, labelnames, Counter))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily("gauge", name, documentation, labelnames, Gauge))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> MetricFamily:
+        return self._register(MetricFamily("histogram", name, documentation, labelnames,
+                                           functools.partial(Histogram, buckets)))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            families = list(self._families.values())
+        return "\n".join(line for family in families for line in family.render()) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timed(histogram: MetricFamily, **labels) -> Iterator[None]:
+    """Observe the wall time of the block, including time spent awaiting, in seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+
+
+def instrument_service(service: str) -> Callable[[type], type]:
+    """Class decorator timing every public coroutine method of a Supabase service"""
+    def decorate(cls: type) -> type:
+        for method_name, method in list(vars(cls).items()):
+            if method_name.startswith("_") or not inspect.iscoroutinefunction(method):
+                continue
+            setattr(cls, method_name, _instrumented(service, method_name, method))
+        return cls
+    return decorate
+
+
+def _instrumented(service: str, method_name: str, method: Callable) -> Callable:
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        except Exception:
+            SUPABASE_ERRORS.labels(service=service, method=method_name).inc()
+            raise
+        finally:
+            SUPABASE_REQUEST_SECONDS.labels(service=service, method=method_name).observe(time.perf_counter() - start)
+    return wrapper
+
+
+# Ingestion
+INGEST_STAGE_SECONDS = registry.histogram(
+    "ingest_stage_seconds", "Time spent per document in each ingest stage", ("stage", "file_type"))
+INGEST_DOCUMENTS = registry.counter(
+    "ingest_documents", "Documents handled by the ingest pipeline", ("file_type", "outcome"))
+INGEST_CHUNKS = registry.counter(
+    "ingest_chunks", "Chunks produced by parsing documents", ("file_type",))
+
+# Embeddings; source is ingest for document chunks and query for questions
+EMBEDDING_REQUEST_SECONDS = registry.histogram(
+    "embedding_request_seconds", "Latency of embeddings API requests", ("source",))
+EMBEDDING_REQUESTS = registry.counter(
+    "embedding_requests", "Embeddings API requests", ("source", "outcome"))
+EMBEDDING_INPUTS = registry.counter(
+    "embedding_inputs", "Texts sent to the embeddings API", ("source",))
+EMBEDDING_TOKENS = registry.counter(
+    "embedding_tokens", "Tokens billed by the embeddings API", ("source",))
+QUERY_EMBEDDING_BATCH_SIZE = registry.histogram(
+    "query_embedding_batch_size", "Distinct questions per batched query embedding request",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+QUERY_EMBEDDING_QUEUE_DELAY_SECONDS = registry.histogram(
+    "query_embedding_queue_delay_seconds", "Time a question waited for its embedding batch to be sent",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1))
+
+# Storage
+VECTOR_STORE_SECONDS = registry.histogram(
+    "vector_store_seconds", "Latency of vector store operations", ("operation",))
+SUPABASE_REQUEST_SECONDS = registry.histogram(
+    "supabase_request_seconds", "Latency of Supabase service methods", ("service", "method"))
+SUPABASE_ERRORS = registry.counter(
+    "supabase_errors", "Supabase service methods that raised", ("service", "method"))
+
+# Question answering
+RAG_STAGE_SECONDS = registry.histogram(
+    "rag_stage_seconds", "Time spent per question in each retrieval stage", ("stage",))
+LLM_COMPLETION_SECONDS = registry.histogram(
+    "llm_completion_seconds", "Latency of chat completions, to the last token when streaming", ("model", "mode"))
+LLM_FIRST_TOKEN_SECONDS = registry.histogram(
+    "llm_first_token_seconds", "Time to the first streamed completion token", ("model",))
+LLM_PROMPT_TOKENS = registry.counter(
+    "llm_prompt_tokens", "Prompt tokens sent to the chat model", ("model",))
+LLM_COMPLETION_TOKENS = registry.counter(
+    "llm_completion_tokens", "Completion tokens generated by the chat model", ("model",))
+
+# File monitor
+FILE_MONITOR_QUEUE_DEPTH = registry.gauge(
+    "file_monitor_queue_depth", "File events queued and not yet picked up by a worker")
+FILE_MONITOR_EVENT_LAG_SECONDS = registry.histogram(
+    "file_monitor_event_lag_seconds", "Time from a file event being observed to a worker picking it up",
+    ("event_type",))
+FILE_MONITOR_EVENT_SECONDS = registry.histogram(
+    "file_monitor_event_seconds", "Time to handle a file event", ("event_type",))
+
+# HTTP
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_seconds", "Latency of HTTP requests by route template", ("method", "route", "status"))
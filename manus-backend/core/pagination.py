@@ -0,0 +1,55 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple, Union
+
+# Paging by the (created_at, id) of the last row seen costs the same on every page, where an
+# offset makes Postgres walk and discard every earlier row first. id breaks created_at ties.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: Union[datetime, str], row_id: str) -> str:
+    """Opaque cursor pointing just past the row with this created_at and id"""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    payload = json.dumps([created_at, str(row_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """The created_at and id a cursor points past, validated so they are safe to put in a filter"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(payload)
+        return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(row_id))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def paginate(query: Any, skip: int, limit: int, cursor: Optional[str] = None, desc: bool = False) -> Any:
+    """Order a PostgREST select by (created_at, id) and restrict it to one page.
+
+    With a cursor the page starts after the row it points to and skip is ignored.
+    """
+    query = query.order("created_at", desc=desc).order("id", desc=desc)
+    if cursor is None:
+        return query.range(skip, skip + limit - 1)
+
+    created_at, row_id = decode_cursor(cursor)
+    op = "lt" if desc else "gt"
+    # Row comparison spelled out, since PostgREST has no (a, b) > (x, y) filter
+    return query.or_(
+        f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{row_id})'
+    ).limit(limit)
+
+
+def next_cursor(rows: Sequence[Any], limit: int) -> Optional[str]:
+    """Cursor for the page after rows, or None when rows was the last page"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    if isinstance(last, dict):
+        return encode_cursor(last["created_at"], last["id"])
+    return encode_cursor(last.created_at, last.id)
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError, RateLimitError
+
+from agent.settings import settings
+from core.metrics import (
+    EMBEDDING_INPUTS, EMBEDDING_REQUEST_SECONDS, EMBEDDING_REQUESTS, EMBEDDING_TOKENS,
+    QUERY_EMBEDDING_BATCH_SIZE, QUERY_EMBEDDING_QUEUE_DELAY_SECONDS, timed
+)
+
+logger = logging.getLogger(__name__)
+
+# Embedding request failures worth retrying; anything else is a problem with the input
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+def retry_delay(error: Exception, attempt: int, max_delay: float = 60.0) -> float:
+    """Backoff delay for a failed embedding request, honouring Retry-After when present"""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(max_delay, 2 ** attempt) + random.uniform(0, 1)
+
+
+class QueryEmbeddingBatcher:
+    """Coalesces concurrent single-query embeddings into batched requests.
+
+    A question waits at most max_wait_ms for others to join it, or less once
+    max_batch_size questions are queued; the batch is embedded in one
+    embeddings request and each waiter gets its own vector back. Identical
+    questions in a batch are sent once.
+
+    Rate limits and transient errors are retried with backoff. A batch the API
+    rejects outright is re-sent one question at a time, so only the question
+    at fault fails rather than everyone who shared its batch.
+    """
+
+    def __init__(self, openai_client: AsyncOpenAI, model: str, dimensions: int,
+                 max_wait_ms: float, max_batch_size: int, max_retries: int = 3):
+        self.openai_client = openai_client
+        self.model = model
+        self.dimensions = dimensions
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_retries = max_retries
+        self.requests = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.batch_size = QUERY_EMBEDDING_BATCH_SIZE.labels()
+        self.queue_delay = QUERY_EMBEDDING_QUEUE_DELAY_SECONDS.labels()
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        sent_at = time.perf_counter()
+        for _, _, queued_at in batch:
+            self.queue_delay.observe(sent_at - queued_at)
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batch_size.observe(len(texts))
+        self.batches += 1
+
+        results: Dict[str, Any] = {}
+        try:
+            results = dict(zip(texts, await self._request(texts)))
+        except Exception as e:
+            self.failed_batches += 1
+            if len(texts) > 1 and not isinstance(e, RETRYABLE_ERRORS):
+                logger.warning(f"Query embedding batch of {len(texts)} rejected ({e}), sending its questions one at a time")
+                singles = await asyncio.gather(*(self._request([text]) for text in texts), return_exceptions=True)
+                for text, single in zip(texts, singles):
+                    results[text] = single if isinstance(single, BaseException) else single[0]
+            else:
+                logger.error(f"Query embedding batch of {len(texts)} failed: {e}")
+                results = dict.fromkeys(texts, e)
+
+        for text, future, _ in batch:
+            # A waiter that was cancelled meanwhile no longer wants its vector
+            if future.done():
+                continue
+            if isinstance(results[text], BaseException):
+                future.set_exception(results[text])
+            else:
+                future.set_result(results[text])
+
+    async def _request(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in one request, retrying rate limits and transient errors with backoff"""
+        attempt = 0
+        while True:
+            EMBEDDING_INPUTS.labels(source="query").inc(len(texts))
+            try:
+                with timed(EMBEDDING_REQUEST_SECONDS, source="query"):
+                    response = await self.openai_client.embeddings.create(
+                        model=self.model,
+                        input=texts,
+                        dimensions=self.dimensions
+                    )
+            except RETRYABLE_ERRORS as e:
+                EMBEDDING_REQUESTS.labels(source="query", outcome="error").inc()
+                if attempt >= self.max_retries:
+                    raise
+                # Questions are waiting on this, so back off for at most a few seconds
+                delay = retry_delay(e, attempt, max_delay=4.0)
+                logger.warning(f"Query embedding request of {len(texts)} failed ({e.__class__.__name__}), "
+                               f"retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except Exception:
+                EMBEDDING_REQUESTS.labels(source="query", outcome="error").inc()
+                raise
+
+            EMBEDDING_REQUESTS.labels(source="query", outcome="ok").inc()
+            if getattr(response, "usage", None):
+                EMBEDDING_TOKENS.labels(source="query").inc(response.usage.total_tokens)
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch_size": self.max_batch_size,
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "pending": len(self._pending),
+            "batch_size": self.batch_size.snapshot(),
+            "queue_delay_seconds": self.queue_delay.snapshot()
+        }
+
+
+def create_query_embedder(openai_client: AsyncOpenAI) -> QueryEmbeddingBatcher:
+    return QueryEmbeddingBatcher(
+        openai_client,
+        settings.EMBEDDING_MODEL,
+        settings.EMBEDDING_DIMENSIONS,
+        settings.QUERY_EMBEDDING_MAX_WAIT_MS,
+        settings.QUERY_EMBEDDING_MAX_BATCH_SIZE,
+        settings.QUERY_EMBEDDING_MAX_RETRIES
+    )
@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from agent.settings import settings
+from core.bm25_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class RerankTimeout(Exception):
+    """Scoring ran past its deadline"""
+
+
+class Reranker(ABC):
+    """Rescores retrieved candidates against the query.
+
+    Candidates are search results as returned by
+    AnalysingProcessor.search_similar_chunks. Scoring blocks and is meant to be
+    called through run_blocking; it raises RerankTimeout once the monotonic
+    deadline has passed so a late run stops early instead of finishing unused.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.fallbacks = 0
+        self.candidates_scored = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._stats_lock = threading.Lock()
+
+    @abstractmethod
+    def score(self, query: str, candidates: List[Dict[str, Any]], deadline: float) -> List[float]:
+        ...
+
+    def record(self, candidates: int, elapsed_ms: float, fell_back: bool):
+        with self._stats_lock:
+            self.calls += 1
+            self.fallbacks += fell_back
+            self.candidates_scored += 0 if fell_back else candidates
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "candidates_scored": self.candidates_scored,
+            "mean_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 2)
+        }
+
+
+class LexicalReranker(Reranker):
+    """Vectorized query-term overlap scorer blended with the retrieval score.
+
+    Each candidate gets a BM25 score over the query terms, with document
+    frequencies taken from the candidate set itself, scaled by the share of
+    query terms it contains. The result is normalized to [0, 1] and averaged
+    with the retrieval similarity so semantic matches without shared words are
+    not pushed out entirely.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        super().__init__()
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query: str, candidates: List[Dict[str, Any]], deadline: float) -> List[float]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        similarity = np.array([candidate['similarity_score'] for candidate in candidates], dtype=np.float32)
+        if not terms:
+            return similarity.tolist()
+
+        counts = [Counter(tokenize(candidate['content'])) for candidate in candidates]
+        if time.monotonic() > deadline:
+            raise RerankTimeout()
+
+        freqs = np.array([[count[term] for term in terms] for count in counts], dtype=np.float32)
+        lengths = np.array([sum(count.values()) for count in counts], dtype=np.float32)
+        average_length = max(float(lengths.mean()), 1.0)
+
+        df = np.count_nonzero(freqs, axis=0)
+        idf = np.log(1 + (len(candidates) - df + 0.5) / (df + 0.5))
+        norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+        bm25 = (idf * freqs * (self.k1 + 1) / (freqs + norms[:, None])).sum(axis=1)
+        coverage = np.count_nonzero(freqs, axis=1) / len(terms)
+
+        lexical = bm25 * coverage
+        top = float(lexical.max())
+        if top > 0:
+            lexical /= top
+        return (0.5 * similarity + 0.5 * lexical).tolist()
+
+
+class CrossEncoderReranker(Reranker):
+    """Local CPU cross-encoder from sentence-transformers, scored in batches"""
+
+    def __init__(self, model_name: str, batch_size: int, max_chars: int = 2000):
+        from sentence_transformers import CrossEncoder
+
+        super().__init__()
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def score(self, query: str, candidates: List[Dict[str, Any]], deadline: float) -> List[float]:
+        pairs = [(query, candidate['content'][:self.max_chars]) for candidate in candidates]
+        scores = []
+        for i in range(0, len(pairs), self.batch_size):
+            if time.monotonic() > deadline:
+                raise RerankTimeout()
+            batch_scores = self.model.predict(pairs[i:i + self.batch_size], batch_size=self.batch_size)
+            scores.extend(float(score) for score in batch_scores)
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "model": self.model_name}
+
+
+def create_reranker() -> Optional[Reranker]:
+    """Build the reranker selected by RERANK_BACKEND, or None when reranking is off"""
+    backend = settings.RERANK_BACKEND
+    if backend == "none":
+        return None
+    if backend == "lexical":
+        return LexicalReranker()
+    if backend == "cross_encoder":
+        try:
+            return CrossEncoderReranker(settings.RERANK_MODEL, settings.RERANK_BATCH_SIZE)
+        except ImportError:
+            logger.error("RERANK_BACKEND=cross_encoder needs sentence-transformers, using the lexical reranker")
+            return LexicalReranker()
+    raise ValueError(f"Unsupported rerank backend: {backend}")
+
+
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[Reranker]:
+    """Return the process-wide reranker, or None when reranking is off"""
+    global _reranker
+    if settings.RERANK_BACKEND == "none":
+        return None
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = create_reranker()
+        return _reranker
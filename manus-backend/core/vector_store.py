@@ -0,0 +1,137 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStore(ABC):
+    """Backend-agnostic store of embeddings with cosine top-k search.
+
+    Vectors are dicts of {'id', 'values', 'metadata'}; query results are dicts of
+    {'id', 'score', 'metadata'} ordered by descending score. All methods block and
+    are meant to be called through run_blocking.
+    """
+
+    @abstractmethod
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        ...
+
+    @abstractmethod
+    def query(self, vector: List[float], top_k: int) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update_metadata(self, vector_id: str, metadata: Dict[str, Any]):
+        ...
+
+    def update_metadata_many(self, updates: List[Tuple[str, Dict[str, Any]]]):
+        """Merge metadata into several vectors; backends with a bulk write override this"""
+        for vector_id, metadata in updates:
+            self.update_metadata(vector_id, metadata)
+
+    @abstractmethod
+    def delete(self, vector_ids: List[str]):
+        ...
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str):
+        """Delete every vector whose ID starts with prefix"""
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self):
+        pass
+
+
+class PineconeVectorStore(VectorStore):
+    """Vector store backed by a Pinecone serverless index"""
+
+    def __init__(self, pinecone_client, index_name: str, dimensions: int):
+        from pinecone import ServerlessSpec
+
+        self.index_name = index_name
+        existing_indexes = [index.name for index in pinecone_client.list_indexes()]
+
+        if index_name not in existing_indexes:
+            pinecone_client.create_index(
+                name=index_name,
+                dimension=dimensions,
+                metric="cosine",
+                spec=ServerlessSpec(
+                    cloud=settings.PINECONE_CLOUD,
+                    region=settings.PINECONE_REGION
+                )
+            )
+
+        self.index = pinecone_client.Index(index_name)
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        self.index.upsert(vectors=vectors)
+
+    def query(self, vector: List[float], top_k: int) -> List[Dict[str, Any]]:
+        response = self.index.query(vector=vector, top_k=top_k, include_metadata=True)
+        return [
+            {'id': match['id'], 'score': match['score'], 'metadata': match.get('metadata') or {}}
+            for match in response['matches']
+        ]
+
+    def update_metadata(self, vector_id: str, metadata: Dict[str, Any]):
+        self.index.update(id=vector_id, set_metadata=metadata)
+
+    def update_metadata_many(self, updates: List[Tuple[str, Dict[str, Any]]]):
+        """Merge metadata into several vectors with one fetch and one upsert.
+
+        Pinecone only updates one vector per request, so the vectors are read
+        and written back whole instead. Callers keep batches within the 1000 IDs
+        a fetch allows and must not race other writes to the same vectors.
+        """
+        if not updates:
+            return
+        fetched = self.index.fetch(ids=[vector_id for vector_id, _ in updates]).vectors
+        vectors = []
+        for vector_id, metadata in updates:
+            vector = fetched.get(vector_id)
+            if vector is None:
+                # Deleted since, nothing to update
+                continue
+            vectors.append({
+                'id': vector_id,
+                'values': list(vector.values),
+                'metadata': {**(vector.metadata or {}), **metadata}
+            })
+        if vectors:
+            self.upsert(vectors)
+
+    def delete(self, vector_ids: List[str]):
+        if vector_ids:
+            self.index.delete(ids=vector_ids)
+
+    def delete_prefix(self, prefix: str):
+        for vector_ids in self.index.list(prefix=prefix):
+            self.delete(vector_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "pinecone", "index": self.index_name, "pool_threads": settings.PINECONE_POOL_THREADS}
+
+
+def create_vector_store(pinecone_client: Optional[Any] = None) -> VectorStore:
+    """Build the vector store selected by VECTOR_STORE_BACKEND"""
+    backend = settings.VECTOR_STORE_BACKEND
+    if backend == "local":
+        from core.local_vector_store import LocalVectorStore
+
+        logger.info(f"Using local vector store at {settings.LOCAL_VECTOR_STORE_PATH}")
+        return LocalVectorStore(
+            settings.LOCAL_VECTOR_STORE_PATH,
+            settings.EMBEDDING_DIMENSIONS,
+            ivf_lists=settings.LOCAL_VECTOR_STORE_IVF_LISTS,
+            ivf_probes=settings.LOCAL_VECTOR_STORE_IVF_PROBES
+        )
+    if backend == "pinecone":
+        return PineconeVectorStore(pinecone_client, settings.PINECONE_INDEX_NAME, settings.EMBEDDING_DIMENSIONS)
+    raise ValueError(f"Unknown vector store backend: {backend}")
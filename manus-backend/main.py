@@ -1,13 +1,22 @@
+import asyncio
 import logging
 import os
+import time
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from api import health, chat, message
+from agent.chat_processor import ChatProcessor
+from agent.settings import settings
+from api import health, chat, message, metrics
 from fastapi.responses import JSONResponse
+from core.clients import init_clients, close_clients
+from core.concurrency import shutdown_blocking_executor
+from core.metrics import HTTP_REQUEST_SECONDS
+from core.pagination import NEXT_CURSOR_HEADER
+from core.job_queue import ChatJobQueue, QueueFullError
 from core.file_monitor import FileMonitor
 from core.file_processor import FileProcessor
 
@@ -29,15 +38,47 @@ file_monitor: FileMonitor = None
 file_processor: FileProcessor = None
 
 
+async def resume_pending_chats(chat_processor: ChatProcessor, chat_jobs: ChatJobQueue):
+    """Queue the chats whose messages were left pending, e.g. by the previous shutdown"""
+    try:
+        chat_ids = await chat_processor.message_service.get_chat_ids_with_pending_messages()
+        for chat_id in chat_ids:
+            chat_jobs.submit(chat_id)
+        if chat_ids:
+            logger.info(f"Queued {len(chat_ids)} chat(s) with pending messages")
+    except QueueFullError:
+        logger.warning("Chat job queue filled up while queueing chats with pending messages")
+    except Exception as e:
+        logger.error(f"Error queueing chats with pending messages: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global file_monitor, file_processor
     try:
-        file_processor = FileProcessor()
+        clients = init_clients()
+        app.state.clients = clients
+        app.state.chat_processor = ChatProcessor(clients)
+        app.state.chat_jobs = ChatJobQueue(
+            handler=app.state.chat_processor.process_chat,
+            num_workers=settings.CHAT_WORKERS,
+            max_size=settings.CHAT_QUEUE_MAX_SIZE
+        )
+        await app.state.chat_jobs.start()
+        await resume_pending_chats(app.state.chat_processor, app.state.chat_jobs)
+
+        file_processor = FileProcessor(clients)
         file_monitor = FileMonitor(
             monitor_folder=MONITOR_FOLDER,
             allowed_extensions=ALLOWED_EXTENSIONS,
-            recursive=RECURSIVE_MONITORING
+            recursive=RECURSIVE_MONITORING,
+            num_workers=settings.INGEST_WORKERS,
+            journal=clients.ingest_journal,
+            debounce_seconds=settings.INGEST_DEBOUNCE_SECONDS
+        )
+        # Chunks ingested before the local indexes existed, or lost from them in a crash, are indexed in the background
+        app.state.local_index_backfill = asyncio.create_task(
+            file_processor.document_processor.backfill_local_indexes()
         )
         file_monitor.set_file_processor(file_processor.process_file_event)
         success = await file_monitor.start()
@@ -54,9 +95,21 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down application...")
 
     try:
+        chat_jobs = getattr(app.state, "chat_jobs", None)
+        if chat_jobs:
+            await chat_jobs.drain(timeout=settings.CHAT_DRAIN_TIMEOUT)
+            logger.info("Chat job queue stopped")
         if file_monitor:
             await file_monitor.stop()
             logger.info("File monitoring stopped")
+        if file_processor:
+            file_processor.close()
+        backfill = getattr(app.state, "local_index_backfill", None)
+        if backfill:
+            backfill.cancel()
+            await asyncio.gather(backfill, return_exceptions=True)
+        await close_clients()
+        shutdown_blocking_executor()
     except Exception as e:
         logger.error(f"Error during shutdown: {e}")
 
@@ -74,8 +127,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # So the browser lets the frontend read the cursor of the next page
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, not the raw path, so IDs do not become label values
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=status
+        ).observe(time.perf_counter() - start)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global exception: {exc}", exc_info=True)
@@ -92,6 +164,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 app.include_router(health.router, tags=["Health"])
 app.include_router(chat.router, prefix="/chats", tags=["Chats"])
 app.include_router(message.router, prefix="/messages", tags=["Messages"])
+app.include_router(metrics.router, tags=["Metrics"])
 
 
 
@@ -1,10 +1,12 @@
 from datetime import datetime, timezone
 import uuid
+from core.enums import DocumentStatus
 
 class Document:
     def __init__(self, id: str = None, filename: str = None,
                  file_path: str = None, file_type: str = None,
                  file_hash: str = None, total_chunks: int = 0,
+                 status: DocumentStatus = DocumentStatus.COMMITTED,
                  created_at: datetime = None, updated_at: datetime = None):
         self.id = id or str(uuid.uuid4())
         self.filename = filename
@@ -12,6 +14,7 @@ class Document:
         self.file_type = file_type
         self.file_hash = file_hash
         self.total_chunks = total_chunks
+        self.status = status
         self.created_at = created_at or datetime.now(timezone.utc)
         self.updated_at = updated_at or datetime.now(timezone.utc)
 
@@ -23,6 +26,7 @@ class Document:
             "file_type": self.file_type,
             "file_hash": self.file_hash,
             "total_chunks": self.total_chunks,
+            "status": self.status.value,
             "created_at": self.created_at.isoformat() if isinstance(self.created_at, datetime) else self.created_at,
             "updated_at": self.updated_at.isoformat() if isinstance(self.updated_at, datetime) else self.updated_at
         }
\ No newline at end of file
@@ -12,7 +12,7 @@ class ChunkBase(BaseModel):
     vector_id: str = Field(..., min_length=1, max_length=255, description="Unique vector identifier")
 
 class ChunkCreate(ChunkBase):
-    pass
+    id: Optional[str] = Field(None, description="Chunk ID, generated when not provided")
 
 class ChunkUpdate(BaseModel):
     document_id: Optional[str] = Field(None, description="Reference to parent document")
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
+from core.enums import DocumentStatus
 
 class DocumentBase(BaseModel):
     filename: str = Field(..., min_length=1, max_length=255, description="Document filename")
@@ -8,6 +9,7 @@ class DocumentBase(BaseModel):
     file_type: str = Field(..., min_length=1, max_length=50, description="File type/extension")
     file_hash: str = Field(..., min_length=1, max_length=128, description="Unique file hash")
     total_chunks: int = Field(default=0, ge=0, description="Total number of chunks")
+    status: DocumentStatus = Field(default=DocumentStatus.COMMITTED, description="Ingest state; only committed documents are complete")
 
 class DocumentCreate(DocumentBase):
     pass
@@ -18,6 +20,7 @@ class DocumentUpdate(BaseModel):
     file_type: Optional[str] = Field(None, min_length=1, max_length=50, description="File type/extension")
     file_hash: Optional[str] = Field(None, min_length=1, max_length=128, description="Unique file hash")
     total_chunks: Optional[int] = Field(None, ge=0, description="Total number of chunks")
+    status: Optional[DocumentStatus] = Field(None, description="Ingest state")
 
 class DocumentInDB(DocumentBase):
     id: str
@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+from core.enums import JobStatus
+
+
+class JobResponse(BaseModel):
+    id: str = Field(..., description="Job ID")
+    chat_id: str = Field(..., description="Chat whose pending messages the job answers")
+    status: JobStatus = Field(..., description="Current status of the job")
+    error: Optional[str] = Field(None, description="Failure reason, if the job failed")
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
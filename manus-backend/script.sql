@@ -8,7 +8,15 @@ CREATE TABLE chat (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Existing databases: ALTER TYPE document_status ADD VALUE 'updating';
+CREATE TYPE document_status AS ENUM ('pending', 'embedded', 'indexed', 'committed', 'updating');
+
 -- Documents table
+-- Ingest moves status through pending -> embedded -> indexed -> committed; anything short of
+-- committed is a partial ingest that is resumed or cleaned up on the next attempt.
+-- An update moves a committed document to updating while its chunks are diffed, and back to
+-- committed in the same write that records the new file_hash; an interrupted update is resumed.
+-- Existing databases: ALTER TABLE documents ADD COLUMN status document_status NOT NULL DEFAULT 'committed';
 CREATE TABLE documents (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     filename TEXT NOT NULL,
@@ -16,6 +24,7 @@ CREATE TABLE documents (
     file_type TEXT NOT NULL,
     file_hash TEXT UNIQUE NOT NULL,
     total_chunks INTEGER DEFAULT 0,
+    status document_status NOT NULL DEFAULT 'committed',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -59,6 +68,14 @@ CREATE INDEX idx_chat_id ON chat(id);
 CREATE INDEX idx_chunks_document_id ON chunks(document_id);
 CREATE INDEX idx_chunks_vector_id ON chunks(vector_id);
 CREATE INDEX idx_message_id ON messages(id);
+-- Keyset pagination reads pages in (created_at, id) order, within a chat for messages
+CREATE INDEX idx_messages_chat_id_created_at ON messages(chat_id, created_at, id);
+CREATE INDEX idx_messages_created_at ON messages(created_at, id);
+CREATE INDEX idx_chat_created_at ON chat(created_at, id);
+CREATE INDEX idx_chunks_created_at ON chunks(created_at, id);
+-- Only the user messages waiting for or being answered, so claiming one never scans a chat's history
+CREATE INDEX idx_messages_pending ON messages(chat_id, created_at, id)
+    WHERE role = 'user' AND status IN ('pending', 'in_progress');
 
 -- Function to update the updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -91,4 +108,26 @@ CREATE TRIGGER update_chunks_updated_at
 CREATE TRIGGER update_messages_updated_at
     BEFORE UPDATE ON messages
     FOR EACH ROW
-    EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Atomically move the oldest pending user message of a chat to in_progress and return it.
+-- SKIP LOCKED lets concurrent workers each claim a different message instead of waiting on,
+-- or answering, the same one. Returns no row when nothing is pending.
+-- A claim is a lease: a message still in_progress p_lease_seconds after it was claimed (the
+-- updated_at trigger stamps the claim) belonged to a worker that died, and is claimed again.
+-- Existing databases: DROP FUNCTION IF EXISTS claim_next_pending_message(UUID);
+CREATE OR REPLACE FUNCTION claim_next_pending_message(p_chat_id UUID, p_lease_seconds INTEGER DEFAULT 600)
+RETURNS SETOF messages AS $$
+    UPDATE messages
+    SET status = 'in_progress'
+    WHERE id = (
+        SELECT id FROM messages
+        WHERE chat_id = p_chat_id AND role = 'user'
+            AND (status = 'pending'
+                 OR (status = 'in_progress' AND updated_at < NOW() - make_interval(secs => p_lease_seconds)))
+        ORDER BY created_at, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+$$ LANGUAGE sql;
@@ -5,8 +5,12 @@ import uuid
 
 from schemas.chat import ChatCreate, ChatUpdate, ChatResponse
 from models.chat import Chat
+from core.concurrency import run_blocking
+from core.metrics import instrument_service
+from core.pagination import paginate
 
 
+@instrument_service("chat")
 class ChatService:
     def __init__(self, db: Client):
         self.db = db
@@ -16,17 +20,17 @@ class ChatService:
         """Create a new chat."""
         chat = Chat(title=chat_data.title)
 
-        result = self.db.table(self.table_name).insert(chat.to_dict()).execute()
+        result = await run_blocking(self.db.table(self.table_name).insert(chat.to_dict()).execute)
 
         if not result.data:
             raise ValueError("Failed to create chat")
 
         return ChatResponse(**result.data[0])
 
-    async def get_chats(self, skip: int = 0, limit: int = 100) -> List[ChatResponse]:
-        """Get all chats with pagination."""
-        result = self.db.table(self.table_name).select("*").range(skip, skip + limit - 1).order("created_at",
-                                                                                                desc=True).execute()
+    async def get_chats(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[ChatResponse]:
+        """Get all chats with pagination, newest first."""
+        query = paginate(self.db.table(self.table_name).select("*"), skip, limit, cursor, desc=True)
+        result = await run_blocking(query.execute)
 
         return [ChatResponse(**chat) for chat in result.data]
 
@@ -37,7 +41,7 @@ class ChatService:
         except ValueError:
             raise ValueError("Invalid chat ID format")
 
-        result = self.db.table(self.table_name).select("*").eq("id", chat_id).execute()
+        result = await run_blocking(self.db.table(self.table_name).select("*").eq("id", chat_id).execute)
 
         if not result.data:
             return None
@@ -60,7 +64,7 @@ class ChatService:
         if chat_update.title is not None:
             update_data["title"] = chat_update.title
 
-        result = self.db.table(self.table_name).update(update_data).eq("id", chat_id).execute()
+        result = await run_blocking(self.db.table(self.table_name).update(update_data).eq("id", chat_id).execute)
 
         if not result.data:
             raise ValueError("Failed to update chat")
@@ -78,5 +82,5 @@ class ChatService:
         if not existing:
             return False
 
-        self.db.table(self.table_name).delete().eq("id", chat_id).execute()
+        await run_blocking(self.db.table(self.table_name).delete().eq("id", chat_id).execute)
         return True
\ No newline at end of file
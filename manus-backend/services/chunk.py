@@ -1,4 +1,5 @@
-from typing import List, Optional, Tuple
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
 from supabase import Client
 from datetime import datetime, timezone
 import uuid
@@ -6,8 +7,12 @@ import uuid
 from models.chunk import Chunk
 from schemas.chunk import ChunkCreate, ChunkResponse, ChunkUpdate
 from schemas.document import DocumentResponse
+from core.concurrency import run_blocking
+from core.metrics import instrument_service
+from core.pagination import paginate
 
 
+@instrument_service("chunks")
 class ChunkService:
     def __init__(self, db: Client):
         self.db = db
@@ -16,6 +21,7 @@ class ChunkService:
     async def create_chunk(self, chunk_data: ChunkCreate) -> ChunkResponse:
         """Create a new chunk."""
         chunk = Chunk(
+            id=chunk_data.id,
             document_id=chunk_data.document_id,
             chunk_index=chunk_data.chunk_index,
             content=chunk_data.content,
@@ -25,20 +31,58 @@ class ChunkService:
             vector_id=chunk_data.vector_id
         )
 
-        result = self.db.table(self.table_name).insert(chunk.to_dict()).execute()
+        result = await run_blocking(self.db.table(self.table_name).insert(chunk.to_dict()).execute)
 
         if not result.data:
             raise ValueError("Failed to create chunk")
 
         return ChunkResponse(**result.data[0])
 
-    async def get_chunks(self, skip: int = 0, limit: int = 100) -> List[ChunkResponse]:
-        """Get all chunks with pagination."""
-        result = self.db.table(self.table_name).select("*").range(skip, skip + limit - 1).order("created_at",
-                                                                                                desc=True).execute()
+    async def create_chunks(self, chunks_data: List[ChunkCreate], batch_size: int = 500) -> List[ChunkResponse]:
+        """Create chunks with one multi-row upsert per batch, so retrying a batch with the same chunk IDs is harmless."""
+        rows = []
+        for chunk_data in chunks_data:
+            row = Chunk(
+                id=chunk_data.id,
+                document_id=chunk_data.document_id,
+                chunk_index=chunk_data.chunk_index,
+                content=chunk_data.content,
+                token_count=chunk_data.token_count,
+                start_char_index=chunk_data.start_char_index,
+                end_char_index=chunk_data.end_char_index,
+                vector_id=chunk_data.vector_id
+            ).to_dict()
+            # Left to the column defaults and the update trigger, so re-upserting a chunk keeps its created_at
+            del row["created_at"], row["updated_at"]
+            rows.append(row)
+
+        created = []
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            result = await run_blocking(self.db.table(self.table_name).upsert(batch).execute)
+
+            if len(result.data) != len(batch):
+                raise ValueError("Failed to create chunks")
+
+            created.extend(ChunkResponse(**chunk) for chunk in result.data)
+
+        return created
+
+    async def get_chunks(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                         created_since: Optional[datetime] = None) -> List[ChunkResponse]:
+        """Get all chunks with pagination, newest first, optionally only those created since a time."""
+        query = self.db.table(self.table_name).select("*")
+        if created_since is not None:
+            query = query.gte("created_at", created_since.isoformat())
+        result = await run_blocking(paginate(query, skip, limit, cursor, desc=True).execute)
 
         return [ChunkResponse(**chunk) for chunk in result.data]
 
+    async def count_chunks(self) -> int:
+        """Number of chunk rows"""
+        result = await run_blocking(self.db.table(self.table_name).select("id", count="exact").limit(1).execute)
+        return result.count or 0
+
     async def get_chunk_by_id(self, chunk_id: str) -> Optional[ChunkResponse]:
         """Get a chunk by ID."""
         try:
@@ -46,7 +90,7 @@ class ChunkService:
         except ValueError:
             raise ValueError("Invalid chunk ID format")
 
-        result = self.db.table(self.table_name).select("*").eq("id", chunk_id).execute()
+        result = await run_blocking(self.db.table(self.table_name).select("*").eq("id", chunk_id).execute)
 
         if not result.data:
             return None
@@ -57,11 +101,11 @@ class ChunkService:
         List[Tuple[ChunkResponse, DocumentResponse]]]:
         """Get chunks and their associated documents by vector IDs."""
 
-        result = (
+        result = await run_blocking(
             self.db.table(self.table_name)
             .select('*, documents(*)')  # fetch all document columns
             .in_('vector_id', vector_ids)
-            .execute()
+            .execute
         )
 
         if not result.data:
@@ -79,6 +123,25 @@ class ChunkService:
 
         return combined_results
 
+    async def get_chunk_contexts_by_vector_ids(self, vector_ids: List[str], batch_size: int = 100) -> List[Dict[str, Any]]:
+        """Get the columns retrieval needs for chunks, with their document's name, type and path.
+
+        Vector IDs are queried in concurrent batches to keep request URLs short.
+        """
+        columns = ("id, vector_id, document_id, chunk_index, content, start_char_index, end_char_index, "
+                   "documents(filename, file_type, file_path)")
+        results = await asyncio.gather(*(
+            run_blocking(
+                self.db.table(self.table_name)
+                .select(columns)
+                .in_('vector_id', vector_ids[i:i + batch_size])
+                .execute
+            )
+            for i in range(0, len(vector_ids), batch_size)
+        ))
+
+        return [row for result in results for row in result.data]
+
     async def get_chunks_by_document_id(self, document_id: str) -> List[ChunkResponse]:
         """Get all chunks for a specific document."""
         try:
@@ -86,13 +149,13 @@ class ChunkService:
         except ValueError:
             raise ValueError("Invalid document ID format")
 
-        result = self.db.table(self.table_name).select("*").eq("document_id", document_id).order("chunk_index").execute()
+        result = await run_blocking(self.db.table(self.table_name).select("*").eq("document_id", document_id).order("chunk_index").execute)
 
         return [ChunkResponse(**chunk) for chunk in result.data]
 
     async def get_chunk_by_vector_id(self, vector_id: str) -> Optional[ChunkResponse]:
         """Get a chunk by vector ID."""
-        result = self.db.table(self.table_name).select("*").eq("vector_id", vector_id).execute()
+        result = await run_blocking(self.db.table(self.table_name).select("*").eq("vector_id", vector_id).execute)
 
         if not result.data:
             return None
@@ -127,7 +190,7 @@ class ChunkService:
         if chunk_update.vector_id is not None:
             update_data["vector_id"] = chunk_update.vector_id
 
-        result = self.db.table(self.table_name).update(update_data).eq("id", chunk_id).execute()
+        result = await run_blocking(self.db.table(self.table_name).update(update_data).eq("id", chunk_id).execute)
 
         if not result.data:
             raise ValueError("Failed to update chunk")
@@ -145,7 +208,7 @@ class ChunkService:
         if not existing:
             return False
 
-        self.db.table(self.table_name).delete().eq("id", chunk_id).execute()
+        await run_blocking(self.db.table(self.table_name).delete().eq("id", chunk_id).execute)
         return True
 
     async def delete_chunks_by_document_id(self, document_id: str) -> bool:
@@ -155,5 +218,17 @@ class ChunkService:
         except ValueError:
             raise ValueError("Invalid document ID format")
 
-        self.db.table(self.table_name).delete().eq("document_id", document_id).execute()
+        await run_blocking(self.db.table(self.table_name).delete().eq("document_id", document_id).execute)
+        return True
+
+    async def delete_chunks_by_ids(self, chunk_ids: List[str]) -> bool:
+        """Delete chunks by their IDs."""
+        for chunk_id in chunk_ids:
+            try:
+                uuid.UUID(chunk_id)
+            except ValueError:
+                raise ValueError("Invalid chunk ID format")
+
+        if chunk_ids:
+            await run_blocking(self.db.table(self.table_name).delete().in_("id", chunk_ids).execute)
         return True
\ No newline at end of file
@@ -1,11 +1,14 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from supabase import Client
 from datetime import datetime, timezone
 import uuid
 from schemas.document import DocumentCreate, DocumentUpdate, DocumentResponse
 from models.document import Document
+from core.concurrency import run_blocking
+from core.metrics import instrument_service
 
 
+@instrument_service("documents")
 class DocumentService:
     def __init__(self, db: Client):
         self.db = db
@@ -18,10 +21,11 @@ class DocumentService:
             file_path=document_data.file_path,
             file_type=document_data.file_type,
             file_hash=document_data.file_hash,
-            total_chunks=document_data.total_chunks
+            total_chunks=document_data.total_chunks,
+            status=document_data.status
         )
 
-        result = self.db.table(self.table_name).insert(document.to_dict()).execute()
+        result = await run_blocking(self.db.table(self.table_name).insert(document.to_dict()).execute)
 
         if not result.data:
             raise ValueError("Failed to create document")
@@ -30,8 +34,9 @@ class DocumentService:
 
     async def get_documents(self, skip: int = 0, limit: int = 100) -> List[DocumentResponse]:
         """Get all documents with pagination."""
-        result = self.db.table(self.table_name).select("*").range(skip, skip + limit - 1).order("created_at",
-                                                                                                 desc=True).execute()
+        result = await run_blocking(
+            self.db.table(self.table_name).select("*").range(skip, skip + limit - 1).order("created_at", desc=True).execute
+        )
 
         return [DocumentResponse(**document) for document in result.data]
 
@@ -42,16 +47,36 @@ class DocumentService:
         except ValueError:
             raise ValueError("Invalid document ID format")
 
-        result = self.db.table(self.table_name).select("*").eq("id", document_id).execute()
+        result = await run_blocking(self.db.table(self.table_name).select("*").eq("id", document_id).execute)
 
         if not result.data:
             return None
 
         return DocumentResponse(**result.data[0])
 
+    async def get_documents_by_ids(self, document_ids: List[str]) -> List[Dict[str, Any]]:
+        """Get the ID, name, type and path of several documents."""
+        if not document_ids:
+            return []
+
+        result = await run_blocking(
+            self.db.table(self.table_name).select("id, filename, file_type, file_path").in_("id", document_ids).execute
+        )
+
+        return result.data
+
     async def get_document_by_filename(self, filename: str) -> Optional[DocumentResponse]:
         """Get a document by file path."""
-        result = self.db.table(self.table_name).select("*").eq("filename", filename).execute()
+        result = await run_blocking(self.db.table(self.table_name).select("*").eq("filename", filename).execute)
+
+        if not result.data:
+            return None
+
+        return DocumentResponse(**result.data[0])
+
+    async def get_document_by_file_path(self, file_path: str) -> Optional[DocumentResponse]:
+        """Get a document by file path."""
+        result = await run_blocking(self.db.table(self.table_name).select("*").eq("file_path", file_path).execute)
 
         if not result.data:
             return None
@@ -60,7 +85,7 @@ class DocumentService:
 
     async def get_document_by_hash(self, file_hash: str) -> Optional[DocumentResponse]:
         """Get a document by file hash."""
-        result = self.db.table(self.table_name).select("*").eq("file_hash", file_hash).execute()
+        result = await run_blocking(self.db.table(self.table_name).select("*").eq("file_hash", file_hash).execute)
 
         if not result.data:
             return None
@@ -90,8 +115,10 @@ class DocumentService:
             update_data["file_hash"] = document_update.file_hash
         if document_update.total_chunks is not None:
             update_data["total_chunks"] = document_update.total_chunks
+        if document_update.status is not None:
+            update_data["status"] = document_update.status.value
 
-        result = self.db.table(self.table_name).update(update_data).eq("id", document_id).execute()
+        result = await run_blocking(self.db.table(self.table_name).update(update_data).eq("id", document_id).execute)
 
         if not result.data:
             raise ValueError("Failed to update document")
@@ -109,5 +136,5 @@ class DocumentService:
         if not existing:
             return False
 
-        self.db.table(self.table_name).delete().eq("id", document_id).execute()
+        await run_blocking(self.db.table(self.table_name).delete().eq("id", document_id).execute)
         return True
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence
 from supabase import Client
 from datetime import datetime, timezone
 import uuid
@@ -8,8 +8,17 @@ from schemas.message import (
     MessageResponse
 )
 from models.message import Message
+from core.concurrency import run_blocking
+from core.enums import MessageRole, MessageStatus, MessageTask
+from core.metrics import instrument_service
+from core.pagination import paginate
 
+# Always selected with a projection, since the next page's cursor is built from them
+CURSOR_COLUMNS = ("id", "created_at")
+MESSAGE_COLUMNS = tuple(MessageResponse.model_fields)
 
+
+@instrument_service("messages")
 class MessageService:
     def __init__(self, db: Client):
         self.db = db
@@ -26,25 +35,105 @@ class MessageService:
             status=message_data.status,
         )
 
-        result = self.db.table(self.table_name).insert(message.to_dict()).execute()
+        result = await run_blocking(self.db.table(self.table_name).insert(message.to_dict()).execute)
 
         if not result.data:
             raise ValueError("Failed to create message")
 
         return MessageResponse(**result.data[0])
 
-    async def get_messages(self, skip: int = 0, limit: int = 100) -> List[MessageResponse]:
-        """Get all messages with pagination."""
-        result = self.db.table(self.table_name).select("*").range(skip, skip + limit - 1).order("created_at", desc=True).execute()
+    async def create_messages(self, messages_data: List[MessageCreate], batch_size: int = 500) -> List[MessageResponse]:
+        """Create messages with one multi-row insert per batch."""
+        rows = [
+            Message(
+                chat_id=message_data.chat_id,
+                chunk_id=message_data.chunk_id,
+                content=message_data.content,
+                role=message_data.role,
+                task=message_data.task,
+                status=message_data.status,
+            ).to_dict()
+            for message_data in messages_data
+        ]
+
+        created = []
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            result = await run_blocking(self.db.table(self.table_name).insert(batch).execute)
+
+            if len(result.data) != len(batch):
+                raise ValueError("Failed to create messages")
+
+            created.extend(MessageResponse(**msg) for msg in result.data)
+
+        return created
+
+    async def get_messages(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[MessageResponse]:
+        """Get all messages with pagination, newest first."""
+        query = paginate(self.db.table(self.table_name).select("*"), skip, limit, cursor, desc=True)
+        result = await run_blocking(query.execute)
 
         return [MessageResponse(**msg) for msg in result.data]
 
-    async def get_messages_by_chat_id(self, chat_id: str, skip: int = 0, limit: int = 100) -> List[MessageResponse]:
-        """Get all messages by chat id with pagination."""
-        result = self.db.table(self.table_name).select("*").eq("chat_id", chat_id).range(skip, skip + limit - 1).order("created_at", desc=False).execute()
+    def _chat_messages_query(self, chat_id: str, columns: str, skip: int, limit: int, cursor: Optional[str],
+                             tasks: Optional[Sequence[MessageTask]], roles: Optional[Sequence[MessageRole]]):
+        query = self.db.table(self.table_name).select(columns).eq("chat_id", chat_id)
+        if tasks:
+            query = query.in_("task", [task.value for task in tasks])
+        if roles:
+            query = query.in_("role", [role.value for role in roles])
+        return paginate(query, skip, limit, cursor)
+
+    async def get_messages_by_chat_id(self, chat_id: str, skip: int = 0, limit: int = 100,
+                                      cursor: Optional[str] = None,
+                                      tasks: Optional[Sequence[MessageTask]] = None,
+                                      roles: Optional[Sequence[MessageRole]] = None) -> List[MessageResponse]:
+        """Get the messages of a chat, oldest first, optionally only those of some tasks or roles."""
+        query = self._chat_messages_query(chat_id, "*", skip, limit, cursor, tasks, roles)
+        result = await run_blocking(query.execute)
 
         return [MessageResponse(**msg) for msg in result.data]
 
+    async def get_message_fields_by_chat_id(self, chat_id: str, fields: Sequence[str], skip: int = 0,
+                                            limit: int = 100, cursor: Optional[str] = None,
+                                            tasks: Optional[Sequence[MessageTask]] = None,
+                                            roles: Optional[Sequence[MessageRole]] = None) -> List[Dict[str, Any]]:
+        """Like get_messages_by_chat_id, but only the given columns of each message, plus id and created_at."""
+        unknown = set(fields) - set(MESSAGE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown message fields: {', '.join(sorted(unknown))}")
+
+        columns = ",".join(dict.fromkeys([*CURSOR_COLUMNS, *fields]))
+        query = self._chat_messages_query(chat_id, columns, skip, limit, cursor, tasks, roles)
+        result = await run_blocking(query.execute)
+
+        return result.data
+
+    async def claim_next_pending_message(self, chat_id: str, lease_seconds: int = 600) -> Optional[MessageResponse]:
+        """Atomically mark the oldest pending user message of a chat in progress and return it, if any.
+
+        Messages whose claim is older than lease_seconds are claimed again.
+        """
+        result = await run_blocking(self.db.rpc(
+            "claim_next_pending_message", {"p_chat_id": chat_id, "p_lease_seconds": lease_seconds}
+        ).execute)
+
+        if not result.data:
+            return None
+
+        return MessageResponse(**result.data[0])
+
+    async def get_chat_ids_with_pending_messages(self) -> List[str]:
+        """IDs of the chats with user messages waiting to be answered."""
+        result = await run_blocking(
+            self.db.table(self.table_name).select("chat_id")
+            .eq("role", MessageRole.USER.value)
+            .eq("status", MessageStatus.PENDING.value)
+            .execute
+        )
+
+        return list(dict.fromkeys(row["chat_id"] for row in result.data))
+
     async def get_message_by_id(self, message_id: str) -> Optional[MessageResponse]:
         """Get a message by ID."""
         try:
@@ -52,7 +141,7 @@ class MessageService:
         except ValueError:
             raise ValueError("Invalid message ID format")
 
-        result = self.db.table(self.table_name).select("*").eq("id", message_id).execute()
+        result = await run_blocking(self.db.table(self.table_name).select("*").eq("id", message_id).execute)
 
         if not result.data:
             return None
@@ -81,7 +170,7 @@ class MessageService:
         if message_update.chunk_id is not None:
             update_data["chunk_id"] = message_update.chunk_id
 
-        result = self.db.table(self.table_name).update(update_data).eq("id", message_id).execute()
+        result = await run_blocking(self.db.table(self.table_name).update(update_data).eq("id", message_id).execute)
 
         if not result.data:
             raise ValueError("Failed to update message")
@@ -99,5 +188,5 @@ class MessageService:
         if not existing:
             return False
 
-        self.db.table(self.table_name).delete().eq("id", message_id).execute()
+        await run_blocking(self.db.table(self.table_name).delete().eq("id", message_id).execute)
         return True
@@ -0,0 +1,23 @@
+import os
+import sys
+
+# Tests import modules the way main.py does, from the backend root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# agent.settings reads these at import time; no test talks to the real services
+_TEST_ENV = {
+    "OPENAI_API_KEY": "test",
+    "OPENAI_MODEL": "gpt-4o-mini",
+    "EMBEDDING_MODEL": "text-embedding-3-small",
+    "EMBEDDING_DIMENSIONS": "8",
+    "PINECONE_API_KEY": "test",
+    "PINECONE_INDEX_NAME": "test",
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "test",
+    "MAX_TOKENS_PER_CHUNK": "512",
+    "OVERLAPPING_TOKEN": "50",
+    "DATA_ROOM_PATH": "data_room",
+}
+
+for name, value in _TEST_ENV.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,110 @@
+import types
+
+import pytest
+
+from core import answer_cache
+from core.answer_cache import AnswerCache, normalize_question
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replace the cache's clock with one the test advances by hand"""
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(answer_cache, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def answer(text):
+    return {"answer": text}
+
+
+def test_questions_are_normalized():
+    assert normalize_question("  What is the RENT?? ") == normalize_question("what is the rent")
+    assert normalize_question("what's\tthe\nrent") == "what s the rent"
+
+
+def test_exact_hit_ignores_case_and_punctuation(clock):
+    cache = AnswerCache(max_entries=10, ttl=60)
+    cache.put("What is the rent?", answer("£10k"), ["doc-1"], cache.generation)
+
+    assert cache.get("what is the rent") == answer("£10k")
+    assert cache.get("what is the deposit") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(max_entries=10, ttl=60)
+    cache.put("rent", answer("£10k"), ["doc-1"], cache.generation)
+
+    clock.now += 59
+    assert cache.get("rent") == answer("£10k")
+    clock.now += 1
+    assert cache.get("rent") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = AnswerCache(max_entries=2, ttl=60)
+    cache.put("first", answer("1"), [], cache.generation)
+    cache.put("second", answer("2"), [], cache.generation)
+
+    # Reading first makes second the least recently used
+    cache.get("first")
+    cache.put("third", answer("3"), [], cache.generation)
+
+    assert cache.get("second") is None
+    assert cache.get("first") == answer("1")
+    assert cache.get("third") == answer("3")
+
+
+def test_invalidating_a_document_drops_answers_citing_it(clock):
+    cache = AnswerCache(max_entries=10, ttl=60)
+    cache.put("rent", answer("£10k"), ["lease", "schedule"], cache.generation)
+    cache.put("insurance", answer("landlord"), ["policy"], cache.generation)
+
+    assert cache.invalidate_documents(["schedule"]) == 1
+
+    assert cache.get("rent") is None
+    assert cache.get("insurance") == answer("landlord")
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_answer_computed_across_an_invalidation_is_not_cached(clock):
+    cache = AnswerCache(max_entries=10, ttl=60)
+    generation = cache.generation
+
+    # A document changes while the answer is being generated
+    cache.invalidate_documents(["lease"])
+    cache.put("rent", answer("stale"), ["lease"], generation)
+
+    assert cache.get("rent") is None
+    cache.put("rent", answer("fresh"), ["lease"], cache.generation)
+    assert cache.get("rent") == answer("fresh")
+
+
+def test_similar_question_is_served_above_threshold(clock):
+    cache = AnswerCache(max_entries=10, ttl=60, similarity_threshold=0.9)
+    cache.put("what is the rent", answer("£10k"), [], cache.generation, embedding=[1.0, 0.0, 0.0])
+
+    assert cache.get_similar([0.99, 0.05, 0.0]) == answer("£10k")
+    assert cache.get_similar([0.0, 1.0, 0.0]) is None
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_similar_lookup_is_off_without_threshold(clock):
+    cache = AnswerCache(max_entries=10, ttl=60)
+    cache.put("what is the rent", answer("£10k"), [], cache.generation, embedding=[1.0, 0.0])
+
+    assert cache.get_similar([1.0, 0.0]) is None
+
+
+def test_expired_best_match_does_not_hide_a_live_one(clock):
+    cache = AnswerCache(max_entries=10, ttl=60, similarity_threshold=0.9)
+    cache.put("what is the rent", answer("old"), [], cache.generation, embedding=[1.0, 0.0, 0.0])
+    clock.now += 30
+    cache.put("how much is the rent", answer("new"), [], cache.generation, embedding=[0.98, 0.1, 0.0])
+
+    clock.now += 30
+    assert cache.get_similar([1.0, 0.0, 0.0]) == answer("new")
+    assert cache.stats()["entries"] == 1
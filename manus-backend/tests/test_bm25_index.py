@@ -0,0 +1,123 @@
+import pytest
+
+from core.bm25_index import BM25Index, tokenize
+
+DOCUMENTS = [
+    ("doc_0", "The lease term is ten years with an option to renew."),
+    ("doc_1", "Rent is payable quarterly in advance."),
+    ("doc_2", "Section s.47 notices must be served in writing."),
+    ("doc_3", "The tenant may assign the lease with consent."),
+    ("doc_4", "Service charge is capped at covid-19 levels."),
+    ("doc_5", "Insurance is arranged by the landlord."),
+    ("doc_6", "Break clause exercisable on six months notice."),
+    ("doc_7", "Repairs are the tenant's responsibility."),
+]
+
+
+def make_index(tmp_path, documents=DOCUMENTS) -> BM25Index:
+    index = BM25Index(str(tmp_path / "bm25.npz"), save_interval=3600)
+    index.add_many(documents)
+    return index
+
+
+def ids(results):
+    return [vector_id for vector_id, _ in results]
+
+
+def test_tokenize_keeps_compound_identifiers_and_their_parts():
+    assert tokenize("See s.47 and COVID-19.") == ["see", "s.47", "s", "47", "and", "covid-19", "covid", "19"]
+
+
+def test_search_ranks_matching_chunks(tmp_path):
+    index = make_index(tmp_path)
+
+    assert set(ids(index.search("lease", 5))) == {"doc_0", "doc_3"}
+    assert ids(index.search("s.47 notices", 1)) == ["doc_2"]
+    assert index.search("nonexistent", 5) == []
+
+
+def test_removed_chunks_are_tombstoned_and_never_returned(tmp_path):
+    index = make_index(tmp_path)
+
+    index.remove_many(["doc_0"])
+
+    assert index.stats()["tombstones"] == 1
+    assert index.stats()["chunks"] == len(DOCUMENTS) - 1
+    assert ids(index.search("lease", 5)) == ["doc_3"]
+
+
+def test_re_adding_a_chunk_replaces_its_content(tmp_path):
+    index = make_index(tmp_path)
+
+    index.add_many([("doc_1", "Rent is reviewed every five years.")])
+
+    assert "doc_1" not in ids(index.search("quarterly", 5))
+    assert ids(index.search("reviewed", 5)) == ["doc_1"]
+    assert index.stats()["chunks"] == len(DOCUMENTS)
+
+
+def test_compaction_drops_tombstones_and_matches_a_fresh_index(tmp_path):
+    index = make_index(tmp_path)
+    removed = {"doc_0", "doc_4"}
+
+    # A quarter of the chunks deleted triggers compaction
+    index.remove_many(sorted(removed))
+
+    live = [(vector_id, content) for vector_id, content in DOCUMENTS if vector_id not in removed]
+    fresh = make_index(tmp_path / "fresh", live)
+    assert index.stats() == fresh.stats()
+    assert index.stats()["tombstones"] == 0
+    for query in ("lease", "tenant", "notice", "covid-19 service"):
+        results, expected = index.search(query, 10), fresh.search(query, 10)
+        assert ids(results) == ids(expected)
+        assert [score for _, score in results] == pytest.approx([score for _, score in expected])
+
+
+def test_remove_unknown_chunk_is_harmless(tmp_path):
+    index = make_index(tmp_path)
+
+    index.remove_many(["missing"])
+
+    assert index.stats()["tombstones"] == 0
+
+
+def test_index_round_trips_through_disk_with_tombstones(tmp_path):
+    index = make_index(tmp_path)
+    index.remove_many(["doc_7"])
+    index.close()
+
+    reloaded = BM25Index(index.path)
+
+    assert reloaded.stats() == index.stats()
+    assert reloaded.stats()["tombstones"] == 1
+    for query in ("lease", "tenant", "s.47"):
+        assert reloaded.search(query, 10) == index.search(query, 10)
+    reloaded.add_many([("doc_8", "Tenant pays the lease costs.")])
+    assert "doc_8" in ids(reloaded.search("lease", 10))
+
+
+def test_unreadable_index_file_starts_empty(tmp_path):
+    path = tmp_path / "bm25.npz"
+    path.write_bytes(b"not an archive")
+
+    index = BM25Index(str(path))
+
+    assert index.is_empty()
+
+
+def test_query_weight_counts_unknown_terms(tmp_path):
+    index = make_index(tmp_path)
+
+    known = index.query_weight("lease")
+    assert index.query_weight("lease zebra") > known > 0
+    assert index.query_weight("lease lease") == known
+
+
+def test_save_time_is_persisted_for_crash_recovery(tmp_path):
+    index = make_index(tmp_path)
+    assert index.saved_at is None
+
+    index.close()
+
+    assert index.saved_at is not None
+    assert BM25Index(index.path).saved_at == index.saved_at
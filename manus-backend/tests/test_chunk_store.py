@@ -0,0 +1,32 @@
+from core.chunk_store import ChunkContentStore
+
+
+def chunk(vector_id, content="text"):
+    return {"vector_id": vector_id, "id": f"id-{vector_id}", "document_id": "doc", "chunk_index": 0,
+            "content": content, "start_char_index": 0, "end_char_index": len(content)}
+
+
+def make_store(tmp_path) -> ChunkContentStore:
+    return ChunkContentStore(str(tmp_path / "chunks.db"))
+
+
+def test_size_counts_distinct_chunks_through_replaces_and_deletes(tmp_path):
+    store = make_store(tmp_path)
+
+    store.put_many([chunk("a"), chunk("b"), chunk("b", "twice")])
+    store.put_many([chunk("b", "replaced"), chunk("c")])
+    store.delete_many(["a", "missing", "a"])
+
+    assert store.stats()["chunks"] == 2
+    assert store.get_many(["a", "b", "c"])["b"]["content"] == "replaced"
+    assert set(store.get_many(["a", "b", "c"])) == {"b", "c"}
+
+
+def test_size_survives_reopening(tmp_path):
+    store = make_store(tmp_path)
+    store.put_many([chunk(str(i)) for i in range(1200)])
+    store.delete_many([str(i) for i in range(100)])
+    store.close()
+
+    assert make_store(tmp_path).stats()["chunks"] == 1100
+    assert store.stats()["chunks"] == 1100
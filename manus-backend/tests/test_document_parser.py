@@ -0,0 +1,86 @@
+import hashlib
+
+import pytest
+
+from agent.document_parser import chunk_text, iter_chunks, parse_document, read_chunks
+
+MAX_TOKENS = 64
+OVERLAP_TOKENS = 8
+
+
+def sample_text() -> str:
+    short = "Short clause number {i} applies to the buyer."
+    long = " ".join(f"word{i} café naïve ünïcode" for i in range(120))
+    sections = []
+    for section in range(4):
+        sections.append(f"SECTION {section}")
+        sections.extend(short.format(i=i) for i in range(6))
+        sections.append("")
+        sections.append(long)
+        # Repeated paragraphs must still get their own offsets
+        sections.append("Repeated paragraph.")
+        sections.append("Repeated paragraph.")
+        sections.append("   ")
+    return "\n".join(sections) + "\n"
+
+
+def split_every(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_chunk_text_is_exact_slice_of_source():
+    text = sample_text()
+    chunks = chunk_text(text, MAX_TOKENS, OVERLAP_TOKENS)
+
+    assert chunks
+    for chunk in chunks:
+        assert chunk['text'] == text[chunk['start_char']:chunk['end_char']]
+        assert chunk['text'] == chunk['text'].strip()
+        assert 0 < chunk['token_count'] <= MAX_TOKENS
+
+
+def test_chunks_are_in_document_order():
+    chunks = chunk_text(sample_text(), MAX_TOKENS, OVERLAP_TOKENS)
+
+    starts = [chunk['start_char'] for chunk in chunks]
+    assert starts == sorted(starts)
+
+
+def test_repeated_paragraphs_get_distinct_offsets():
+    text = "\n".join(["Repeated paragraph."] * 3 + [" ".join(["filler"] * 200)] + ["Repeated paragraph."] * 3)
+    chunks = chunk_text(text, MAX_TOKENS, OVERLAP_TOKENS)
+
+    repeated = [chunk for chunk in chunks if chunk['text'].startswith("Repeated paragraph.")]
+    assert repeated[0]['start_char'] == 0
+    assert repeated[-1]['end_char'] == len(text)
+    assert len({chunk['start_char'] for chunk in repeated}) == len(repeated)
+    for chunk in chunks:
+        assert chunk['text'] == text[chunk['start_char']:chunk['end_char']]
+
+
+@pytest.mark.parametrize("piece_size", [1, 7, 100, 4096])
+def test_streamed_chunks_match_in_memory_chunks(piece_size):
+    text = sample_text()
+
+    streamed = list(iter_chunks(split_every(text, piece_size), MAX_TOKENS, OVERLAP_TOKENS))
+
+    assert streamed == chunk_text(text, MAX_TOKENS, OVERLAP_TOKENS)
+
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("", MAX_TOKENS, OVERLAP_TOKENS) == []
+    assert chunk_text("\n \n\t\n", MAX_TOKENS, OVERLAP_TOKENS) == []
+
+
+def test_parse_document_spills_the_same_chunks(tmp_path):
+    text = sample_text()
+    path = tmp_path / "contract.txt"
+    path.write_text(text, encoding="utf-8")
+
+    parsed = parse_document(str(path), MAX_TOKENS, OVERLAP_TOKENS, spill_dir=str(tmp_path))
+    spilled = [chunk for window in read_chunks(parsed['chunks_path'], window_size=5) for chunk in window]
+
+    assert parsed['file_type'] == 'txt'
+    assert parsed['file_hash'] == hashlib.md5(text.encode()).hexdigest()
+    assert parsed['total_chunks'] == len(spilled)
+    assert spilled == chunk_text(text, MAX_TOKENS, OVERLAP_TOKENS)
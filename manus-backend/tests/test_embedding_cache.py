@@ -0,0 +1,44 @@
+from core.embedding_cache import EmbeddingCache
+
+
+def make_cache(tmp_path, max_entries=100) -> EmbeddingCache:
+    return EmbeddingCache(str(tmp_path / "embeddings.db"), max_entries)
+
+
+def test_round_trip_and_misses(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put_many("model", 2, ["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+
+    assert cache.get_many("model", 2, ["a", "c", "b"]) == [[1.0, 0.0], None, [0.0, 1.0]]
+    assert cache.get("model", 3, "a") is None
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_hits_are_touched_in_one_transaction(tmp_path):
+    cache = make_cache(tmp_path)
+    texts = [str(i) for i in range(50)]
+    cache.put_many("model", 1, texts, [[float(i)] for i in range(50)])
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+
+    cache.get_many("model", 1, texts)
+
+    assert statements.count("COMMIT") == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_entries=10)
+    texts = [str(i) for i in range(10)]
+    for text in texts:
+        cache.put("model", 1, text, [float(text)])
+    # Insertion order as access times, then reading the oldest entry makes it the most recently used
+    cache._conn.execute("UPDATE embeddings SET last_access = rowid")
+    cache.get("model", 1, "0")
+
+    cache.put("model", 1, "new", [10.0])
+
+    assert cache.stats()["entries"] == 9
+    assert cache.get("model", 1, "0") == [0.0]
+    assert cache.get("model", 1, "new") == [10.0]
+    assert cache.get("model", 1, "1") is None
@@ -0,0 +1,178 @@
+import asyncio
+import itertools
+
+import pytest
+
+from core.file_monitor import _COALESCE, FileMonitor
+
+DEBOUNCE = 0.02
+
+
+def make_monitor(tmp_path, num_workers: int = 1) -> FileMonitor:
+    """A monitor with its queues set up on the running loop but no watcher or workers"""
+    monitor = FileMonitor(str(tmp_path), num_workers=num_workers, debounce_seconds=DEBOUNCE)
+    monitor.event_loop = asyncio.get_running_loop()
+    monitor.file_queues = [asyncio.Queue() for _ in range(monitor.num_workers)]
+    return monitor
+
+
+def queued(monitor: FileMonitor):
+    events = []
+    for file_queue in monitor.file_queues:
+        while not file_queue.empty():
+            event_type, file_path, src_path, _ = file_queue.get_nowait()
+            events.append((event_type, file_path, src_path))
+    return events
+
+
+async def settle():
+    await asyncio.sleep(DEBOUNCE * 4)
+
+
+def test_coalesce_table_covers_every_pair():
+    event_types = ('created', 'modified', 'deleted')
+    assert set(_COALESCE) == set(itertools.product(event_types, repeat=2))
+
+
+@pytest.mark.parametrize("first, second", sorted(_COALESCE))
+def test_two_events_on_a_path_coalesce(tmp_path, first, second):
+    path = tmp_path / "report.txt"
+    path.write_text("contents")
+
+    async def scenario():
+        monitor = make_monitor(tmp_path)
+        monitor.submit_file_event(first, str(path))
+        monitor.submit_file_event(second, str(path))
+        await settle()
+        return queued(monitor)
+
+    combined = _COALESCE[(first, second)]
+    expected = [] if combined is None else [(combined, str(path), None)]
+    assert asyncio.run(scenario()) == expected
+
+
+def test_burst_of_modifications_is_one_event(tmp_path):
+    path = tmp_path / "report.txt"
+    path.write_text("contents")
+
+    async def scenario():
+        monitor = make_monitor(tmp_path)
+        for _ in range(10):
+            monitor.submit_file_event('modified', str(path))
+        await settle()
+        return queued(monitor)
+
+    assert asyncio.run(scenario()) == [('modified', str(path), None)]
+
+
+def test_growing_file_waits_until_size_settles(tmp_path):
+    path = tmp_path / "upload.txt"
+    path.write_text("partial")
+
+    async def scenario():
+        monitor = make_monitor(tmp_path)
+        monitor.submit_file_event('created', str(path))
+        # Written to without a new event, as when the watcher only reports the first write
+        path.write_text("partial upload, now complete")
+        await asyncio.sleep(DEBOUNCE * 1.5)
+        still_pending = queued(monitor)
+        await settle()
+        return still_pending, queued(monitor)
+
+    still_pending, emitted = asyncio.run(scenario())
+
+    assert still_pending == []
+    assert emitted == [('created', str(path), None)]
+
+
+def test_vanished_file_is_dropped(tmp_path):
+    path = tmp_path / "temp.txt"
+    path.write_text("contents")
+
+    async def scenario():
+        monitor = make_monitor(tmp_path)
+        monitor.submit_file_event('modified', str(path))
+        path.unlink()
+        await settle()
+        return queued(monitor)
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_move_of_new_file_is_created_at_destination(tmp_path):
+    src = tmp_path / "draft.tmp.txt"
+    dest = tmp_path / "final.txt"
+    dest.write_text("contents")
+
+    async def scenario():
+        monitor = make_monitor(tmp_path)
+        monitor.submit_file_event('created', str(src))
+        monitor.submit_file_event('moved', str(dest), str(src))
+        await settle()
+        return queued(monitor)
+
+    assert asyncio.run(scenario()) == [('created', str(dest), None)]
+
+
+def test_move_is_applied_before_later_changes_to_destination(tmp_path):
+    src = tmp_path / "old.txt"
+    dest = tmp_path / "new.txt"
+    dest.write_text("contents")
+
+    async def scenario():
+        monitor = make_monitor(tmp_path)
+        monitor.submit_file_event('moved', str(dest), str(src))
+        monitor.submit_file_event('modified', str(dest))
+        await settle()
+        return queued(monitor)
+
+    assert asyncio.run(scenario()) == [('moved', str(dest), str(src)), ('modified', str(dest), None)]
+
+
+def test_chained_moves_keep_original_source(tmp_path):
+    first = tmp_path / "a.txt"
+    second = tmp_path / "b.txt"
+    third = tmp_path / "c.txt"
+    third.write_text("contents")
+
+    async def scenario():
+        monitor = make_monitor(tmp_path)
+        monitor.submit_file_event('moved', str(second), str(first))
+        monitor.submit_file_event('moved', str(third), str(second))
+        await settle()
+        return queued(monitor)
+
+    assert asyncio.run(scenario()) == [('moved', str(third), str(first))]
+
+
+def test_move_waits_for_event_on_its_source(tmp_path):
+    async def scenario():
+        monitor = make_monitor(tmp_path, num_workers=2)
+        src = str(tmp_path / "a.txt")
+        # A destination owned by the other worker
+        dest = next(path for path in (str(tmp_path / f"b{i}.txt") for i in range(100))
+                    if monitor._queue_for(path) is not monitor._queue_for(src))
+        handled = []
+
+        async def processor(event_type, file_path, src_path=None):
+            handled.append(('start', event_type))
+            await asyncio.sleep(DEBOUNCE)
+            handled.append(('end', event_type))
+            return True
+
+        monitor.set_file_processor(processor)
+        workers = [asyncio.create_task(monitor._process_file_queue(file_queue, worker_id))
+                   for worker_id, file_queue in enumerate(monitor.file_queues)]
+        await monitor.enqueue_file_event('modified', src)
+        await asyncio.sleep(0)
+        await monitor.enqueue_file_event('moved', dest, src)
+        await asyncio.gather(*(file_queue.join() for file_queue in monitor.file_queues))
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        return handled, len(monitor._path_locks)
+
+    handled, locks_left = asyncio.run(scenario())
+
+    assert handled == [('start', 'modified'), ('end', 'modified'), ('start', 'moved'), ('end', 'moved')]
+    assert locks_left == 0
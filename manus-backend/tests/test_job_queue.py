@@ -0,0 +1,189 @@
+import asyncio
+
+import pytest
+
+from core.enums import JobStatus
+from core.job_queue import ChatJobQueue, QueueFullError
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_submitted_job_runs_handler_and_completes():
+    async def scenario():
+        answered = []
+
+        async def handler(chat_id):
+            answered.append(chat_id)
+
+        jobs = ChatJobQueue(handler, num_workers=2)
+        await jobs.start()
+        job = jobs.submit("chat-1")
+        assert job.status == JobStatus.QUEUED
+        await jobs.drain(timeout=1)
+        return job, answered, jobs
+
+    job, answered, jobs = run(scenario())
+
+    assert answered == ["chat-1"]
+    assert job.status == JobStatus.COMPLETED
+    assert job.started_at <= job.finished_at
+    assert jobs.get_job(job.id) is job
+
+
+def test_chat_with_queued_job_reuses_it():
+    async def scenario():
+        release = asyncio.Event()
+        calls = []
+
+        async def handler(chat_id):
+            calls.append(chat_id)
+            await release.wait()
+
+        jobs = ChatJobQueue(handler, num_workers=1)
+        await jobs.start()
+        running = jobs.submit("busy")
+        await asyncio.sleep(0)
+        first = jobs.submit("chat-1")
+        second = jobs.submit("chat-1")
+        release.set()
+        await jobs.drain(timeout=1)
+        return running, first, second, calls
+
+    running, first, second, calls = run(scenario())
+
+    assert first is second
+    assert running is not first
+    assert calls == ["busy", "chat-1"]
+
+
+def test_chat_gets_new_job_once_its_job_started():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(chat_id):
+            await release.wait()
+
+        jobs = ChatJobQueue(handler, num_workers=1)
+        await jobs.start()
+        first = jobs.submit("chat-1")
+        await asyncio.sleep(0)
+        # The running job may already have read the chat, so a new message needs another run
+        second = jobs.submit("chat-1")
+        release.set()
+        await jobs.drain(timeout=1)
+        return first, second
+
+    first, second = run(scenario())
+
+    assert first is not second
+    assert first.status == second.status == JobStatus.COMPLETED
+
+
+def test_full_queue_rejects_jobs():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(chat_id):
+            await release.wait()
+
+        jobs = ChatJobQueue(handler, num_workers=1, max_size=2)
+        await jobs.start()
+        jobs.submit("running")
+        await asyncio.sleep(0)
+        jobs.submit("queued-1")
+        jobs.submit("queued-2")
+        assert jobs.is_full()
+        with pytest.raises(QueueFullError):
+            jobs.submit("rejected")
+        release.set()
+        await jobs.drain(timeout=1)
+
+    run(scenario())
+
+
+def test_failed_handler_marks_job_failed_and_worker_carries_on():
+    async def scenario():
+        async def handler(chat_id):
+            if chat_id == "broken":
+                raise RuntimeError("model unavailable")
+
+        jobs = ChatJobQueue(handler, num_workers=1)
+        await jobs.start()
+        failed = jobs.submit("broken")
+        ok = jobs.submit("fine")
+        await jobs.drain(timeout=1)
+        return failed, ok
+
+    failed, ok = run(scenario())
+
+    assert failed.status == JobStatus.FAILED
+    assert failed.error == "model unavailable"
+    assert ok.status == JobStatus.COMPLETED
+
+
+def test_drain_stops_accepting_and_cancels_jobs_past_timeout():
+    async def scenario():
+        async def handler(chat_id):
+            await asyncio.sleep(60)
+
+        jobs = ChatJobQueue(handler, num_workers=1)
+        await jobs.start()
+        job = jobs.submit("slow")
+        await asyncio.sleep(0)
+        await jobs.drain(timeout=0.01)
+        with pytest.raises(QueueFullError):
+            jobs.submit("late")
+        return job, jobs
+
+    job, jobs = run(scenario())
+
+    assert job.status == JobStatus.FAILED
+    assert job.error == "Cancelled during shutdown"
+    assert jobs.workers == []
+    assert jobs.is_full()
+
+
+def test_drain_fails_jobs_no_worker_reached():
+    async def scenario():
+        async def handler(chat_id):
+            await asyncio.sleep(60)
+
+        jobs = ChatJobQueue(handler, num_workers=1)
+        await jobs.start()
+        running = jobs.submit("slow")
+        waiting = jobs.submit("waiting")
+        await asyncio.sleep(0)
+        await jobs.drain(timeout=0.01)
+        return running, waiting, jobs
+
+    running, waiting, jobs = run(scenario())
+
+    assert running.status == JobStatus.FAILED
+    assert waiting.status == JobStatus.FAILED
+    assert waiting.error == "Cancelled during shutdown"
+    assert waiting.finished_at is not None
+    assert jobs.queued_by_chat == {}
+
+
+def test_finished_jobs_are_pruned_oldest_first():
+    async def scenario():
+        async def handler(chat_id):
+            pass
+
+        jobs = ChatJobQueue(handler, num_workers=1, max_finished_jobs=2)
+        await jobs.start()
+        submitted = []
+        for i in range(4):
+            submitted.append(jobs.submit(f"chat-{i}"))
+            await asyncio.sleep(0)
+        await jobs.queue.join()
+        # Pruning happens on submit
+        submitted.append(jobs.submit("last"))
+        await jobs.drain(timeout=1)
+        return submitted, jobs
+
+    submitted, jobs = run(scenario())
+
+    assert [job.id for job in jobs.jobs.values()] == [job.id for job in submitted[2:]]
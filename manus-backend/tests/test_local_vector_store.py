@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from core.local_vector_store import LocalVectorStore
+
+DIMENSIONS = 8
+IVF_LISTS = 4
+# Enough vectors for LocalVectorStore to train IVF_LISTS lists
+TRAINABLE = IVF_LISTS * 39
+
+
+def vectors(count, start=0, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{'id': str(start + i), 'values': rng.standard_normal(DIMENSIONS).tolist(), 'metadata': {'n': start + i}}
+            for i in range(count)]
+
+
+def make_store(tmp_path, ivf_lists=IVF_LISTS) -> LocalVectorStore:
+    return LocalVectorStore(str(tmp_path / "vectors"), DIMENSIONS, ivf_lists=ivf_lists, ivf_probes=IVF_LISTS)
+
+
+def test_brute_force_query_returns_nearest_and_skips_deleted(tmp_path):
+    store = make_store(tmp_path, ivf_lists=0)
+    data = vectors(20)
+    store.upsert(data)
+    store.delete(["3"])
+
+    assert [match['id'] for match in store.query(data[5]['values'], 1)] == ["5"]
+    assert "3" not in {match['id'] for match in store.query(data[3]['values'], 20)}
+    assert store.query(data[5]['values'], 1)[0]['metadata'] == {'n': 5}
+
+
+def test_ivf_is_trained_by_the_write_not_a_query(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert(vectors(TRAINABLE - 1))
+    assert store.stats()["ivf_lists"] == 0
+
+    store.upsert(vectors(1, start=TRAINABLE - 1))
+
+    assert store.stats()["ivf_lists"] == IVF_LISTS
+    assert (store._assignments[:TRAINABLE] >= 0).all()
+
+
+def test_ivf_state_is_reloaded_instead_of_retrained(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    store.upsert(vectors(TRAINABLE))
+    store.upsert(vectors(10, start=TRAINABLE, seed=1))
+    data = vectors(1, seed=2)
+    expected = store.query(data[0]['values'], 5)
+    centroids, assignments = store._centroids, store._assignments[:store._count].copy()
+    store.close()
+
+    monkeypatch.setattr(LocalVectorStore, "_kmeans", lambda *args: pytest.fail("retrained on open"))
+    reopened = make_store(tmp_path)
+
+    assert np.array_equal(reopened._centroids, centroids)
+    assert np.array_equal(reopened._assignments[:reopened._count], assignments)
+    assert reopened.query(data[0]['values'], 5) == expected
+
+
+def test_vectors_written_during_training_get_a_list(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    store.upsert(vectors(TRAINABLE - 1))
+    kmeans = LocalVectorStore._kmeans
+
+    def kmeans_with_concurrent_write(self, *args):
+        result = kmeans(self, *args)
+        self.upsert(vectors(1, start=TRAINABLE, seed=1))
+        return result
+
+    monkeypatch.setattr(LocalVectorStore, "_kmeans", kmeans_with_concurrent_write)
+    store.upsert(vectors(1, start=TRAINABLE - 1))
+
+    assert (store._assignments[:store._count] >= 0).all()
+    assert store._slots.keys() == {str(i) for i in range(TRAINABLE + 1)}
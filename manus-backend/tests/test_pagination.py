@@ -0,0 +1,102 @@
+import base64
+import string
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fakes import FakeSupabase
+from core.pagination import decode_cursor, encode_cursor, next_cursor, paginate
+
+ROW_ID = "6f1c8a52-3d4e-4b7a-9a0e-2f5b8c9d1e3a"
+
+
+def test_cursor_round_trips_datetime_and_id():
+    created_at = datetime(2024, 5, 17, 9, 30, 15, 123456, tzinfo=timezone.utc)
+
+    assert decode_cursor(encode_cursor(created_at, ROW_ID)) == (created_at.isoformat(), ROW_ID)
+
+
+def test_cursor_round_trips_timestamp_string():
+    created_at = "2024-05-17T09:30:15.123456+02:00"
+
+    assert decode_cursor(encode_cursor(created_at, uuid.UUID(ROW_ID))) == (created_at, ROW_ID)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(datetime(2024, 5, 17, tzinfo=timezone.utc), ROW_ID)
+
+    assert set(cursor) <= set(string.ascii_letters + string.digits + "-_")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b"42").decode(),
+    base64.urlsafe_b64encode(b'["2024-05-17T09:30:15+00:00"]').decode(),
+    base64.urlsafe_b64encode(b'["yesterday", "6f1c8a52-3d4e-4b7a-9a0e-2f5b8c9d1e3a"]').decode(),
+    # Would otherwise be spliced into the PostgREST filter
+    base64.urlsafe_b64encode(b'["2024-05-17T09:30:15+00:00", "x,id.neq.0"]').decode(),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_next_cursor_is_none_on_a_short_page():
+    rows = [{"created_at": "2024-05-17T09:30:15+00:00", "id": ROW_ID}]
+
+    assert next_cursor([], 10) is None
+    assert next_cursor(rows, 10) is None
+    assert decode_cursor(next_cursor(rows, 1)) == (rows[0]["created_at"], ROW_ID)
+
+
+def test_next_cursor_reads_models():
+    created_at = datetime(2024, 5, 17, tzinfo=timezone.utc)
+    rows = [SimpleNamespace(created_at=created_at, id=uuid.UUID(ROW_ID))]
+
+    assert decode_cursor(next_cursor(rows, 1)) == (created_at.isoformat(), ROW_ID)
+
+
+@pytest.fixture
+def db():
+    db = FakeSupabase(latency_ms=0)
+    start = datetime(2024, 5, 17, tzinfo=timezone.utc)
+    # Pairs of rows share a created_at, so pages must break ties on id
+    db.tables["messages"] = {}
+    for i in range(11):
+        row_id = str(uuid.uuid4())
+        db.tables["messages"][row_id] = {"id": row_id, "created_at": (start + timedelta(seconds=i // 2)).isoformat()}
+    return db
+
+
+def walk(db, limit, desc):
+    pages, cursor = [], None
+    while True:
+        rows = paginate(db.table("messages").select("*"), 0, limit, cursor, desc=desc).execute().data
+        pages.append(rows)
+        cursor = next_cursor(rows, limit)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("desc", [False, True])
+@pytest.mark.parametrize("limit", [1, 2, 3, 11, 20])
+def test_keyset_pages_visit_every_row_once_in_order(db, limit, desc):
+    expected = sorted(db.tables["messages"].values(), key=lambda row: (row["created_at"], row["id"]), reverse=desc)
+
+    pages = walk(db, limit, desc)
+
+    assert [row for page in pages for row in page] == expected
+    assert all(len(page) <= limit for page in pages)
+
+
+def test_offset_page_matches_keyset_page(db):
+    first = paginate(db.table("messages").select("*"), 0, 4, desc=True).execute().data
+    second = paginate(db.table("messages").select("*"), 4, 4, desc=True).execute().data
+
+    after_first = paginate(db.table("messages").select("*"), 0, 4, next_cursor(first, 4), desc=True).execute().data
+
+    assert after_first == second
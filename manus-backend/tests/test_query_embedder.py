@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import BadRequestError, RateLimitError
+
+from core import query_embedder
+from core.query_embedder import QueryEmbeddingBatcher
+
+
+def api_error(error_class, status_code):
+    response = httpx.Response(status_code, request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+    return error_class("error", response=response, body=None)
+
+
+class FakeEmbeddings:
+    """Embeddings endpoint that rejects inputs containing "bad" and can be rate limited"""
+
+    def __init__(self, rate_limited: int = 0):
+        self.rate_limited = rate_limited
+        self.requests = []
+
+    async def create(self, model, input, dimensions):
+        self.requests.append(list(input))
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise api_error(RateLimitError, 429)
+        if any("bad" in text for text in input):
+            raise api_error(BadRequestError, 400)
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)],
+            usage=SimpleNamespace(total_tokens=len(input))
+        )
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(query_embedder, "retry_delay", lambda error, attempt, max_delay=60.0: 0)
+
+
+def make_batcher(embeddings: FakeEmbeddings, max_retries: int = 3) -> QueryEmbeddingBatcher:
+    client = SimpleNamespace(embeddings=embeddings)
+    return QueryEmbeddingBatcher(client, "model", 1, max_wait_ms=5, max_batch_size=64, max_retries=max_retries)
+
+
+async def embed_all(batcher, texts):
+    return await asyncio.gather(*(batcher.embed(text) for text in texts), return_exceptions=True)
+
+
+def test_concurrent_questions_share_one_request():
+    embeddings = FakeEmbeddings()
+    batcher = make_batcher(embeddings)
+
+    results = asyncio.run(embed_all(batcher, ["a", "bb", "a", "ccc"]))
+
+    assert results == [[1.0], [2.0], [1.0], [3.0]]
+    assert embeddings.requests == [["a", "bb", "ccc"]]
+
+
+def test_rate_limited_batch_is_retried():
+    embeddings = FakeEmbeddings(rate_limited=2)
+    batcher = make_batcher(embeddings)
+
+    results = asyncio.run(embed_all(batcher, ["a", "bb"]))
+
+    assert results == [[1.0], [2.0]]
+    assert len(embeddings.requests) == 3
+
+
+def test_rate_limit_past_retries_fails_the_batch():
+    embeddings = FakeEmbeddings(rate_limited=10)
+    batcher = make_batcher(embeddings, max_retries=1)
+
+    results = asyncio.run(embed_all(batcher, ["a", "bb"]))
+
+    assert all(isinstance(result, RateLimitError) for result in results)
+    assert len(embeddings.requests) == 2
+
+
+def test_rejected_input_only_fails_its_own_question():
+    embeddings = FakeEmbeddings()
+    batcher = make_batcher(embeddings)
+
+    results = asyncio.run(embed_all(batcher, ["a", "bad", "ccc"]))
+
+    assert results[0] == [1.0]
+    assert isinstance(results[1], BadRequestError)
+    assert results[2] == [3.0]
+    assert sorted(map(tuple, embeddings.requests[1:])) == [("a",), ("bad",), ("ccc",)]